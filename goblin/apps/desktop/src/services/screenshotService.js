@@ -16,6 +16,7 @@ class ScreenshotService {
     this.currentProject = null;
     this.isCapturing = false;
     this.frequency = 60; // Default frequency in seconds
+    this.baseFrequency = this.frequency; // Frequency to return to after backpressure
     this.messageHandler = new MainMessageHandler()
     
     // Connect immediately
@@ -59,6 +60,8 @@ class ScreenshotService {
               if (message.type === 'screenshot_analysis') {
                   console.log('Received screenshot analysis:', message.analysis);
                   this.handleMessage(message);
+              } else if (message.type === 'backpressure') {
+                  this.handleBackpressure(message);
               }
           } catch (error) {
               console.error('Error parsing screenshot message:', error);
@@ -94,6 +97,18 @@ class ScreenshotService {
       }
   }
 
+  handleBackpressure(message) {
+      // The server drops stale screenshots when analysis can't keep up;
+      // capture less often instead of sending frames that get discarded
+      console.log('Screenshot backpressure:', message);
+      if (message.state === 'overloaded' && message.suggested_interval > this.frequency) {
+          this.setCaptureInterval(message.suggested_interval);
+      } else if (message.state === 'ok' && this.frequency !== this.baseFrequency) {
+          // Analysis caught up: go back to the configured frequency
+          this.setCaptureInterval(this.baseFrequency);
+      }
+  }
+
   handleReconnect() {
     if (this.reconnectAttempts < this.maxReconnectAttempts) {
       this.reconnectAttempts++;
@@ -130,6 +145,11 @@ class ScreenshotService {
   }
 
   updateFrequency(newFrequency) {
+      this.baseFrequency = newFrequency;
+      this.setCaptureInterval(newFrequency);
+  }
+
+  setCaptureInterval(newFrequency) {
       if (newFrequency !== this.frequency) {
           this.frequency = newFrequency;
           console.log(`Updating screenshot frequency to ${newFrequency} seconds`);
@@ -164,19 +184,22 @@ class ScreenshotService {
       console.log('Got screen sources:', sources.length);
 
       if (sources && sources[0]) {
-        console.log('Converting screenshot to data URL...');
-        const screenshot = sources[0].thumbnail.toDataURL();
-        
-        const message = JSON.stringify({
+        // Binary frame: 4-byte header length, JSON header, raw PNG bytes.
+        // Avoids the base64 data URL (+33%) and JSON-escaping the image.
+        const image = sources[0].thumbnail.toPNG();
+        const header = Buffer.from(JSON.stringify({
           type: 'screenshot',
-          data: screenshot,
+          format: 'png',
           project: this.currentProject,
           timestamp: new Date().toISOString()
-        });
+        }));
+        const headerLength = Buffer.alloc(4);
+        headerLength.writeUInt32BE(header.length, 0);
+        const frame = Buffer.concat([headerLength, header, image]);
 
         if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-          console.log(`Sending screenshot (${(screenshot.length / 1024).toFixed(2)} KB) for project:`, this.currentProject);
-          this.ws.send(message);
+          console.log(`Sending screenshot (${(image.length / 1024).toFixed(2)} KB) for project:`, this.currentProject);
+          this.ws.send(frame, { binary: true });
         } else {
           console.log('WebSocket not ready. Status:', this.ws ? this.ws.readyState : 'no websocket');
           this.connect();
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from brain.metrics import LATENCY_BUCKETS_MS, LatencyHistogram
+
+try:
+    from langsmith import trace
+except ImportError:  # tracing is optional; timings are always recorded locally
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+# Stages recorded per chat message
+TIME_TO_FIRST_TOKEN = "time_to_first_token"
+PROVIDER_STREAM = "provider_stream"
+TOOL_EXECUTION = "tool_execution"
+DB_QUERY = "db_query"
+WEBSOCKET_SEND = "websocket_send"
+MESSAGE_TOTAL = "message_total"
+
+STAGES = (
+    TIME_TO_FIRST_TOKEN,
+    PROVIDER_STREAM,
+    TOOL_EXECUTION,
+    DB_QUERY,
+    WEBSOCKET_SEND,
+    MESSAGE_TOTAL,
+)
+
+_current_timings: ContextVar[Optional["MessageTimings"]] = ContextVar(
+    "message_timings", default=None
+)
+_trace_sampled: ContextVar[Optional[bool]] = ContextVar("trace_sampled", default=None)
+
+
+class MessageTimings:
+    """Seconds spent in each stage while handling one chat message"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def mark_first_token(self):
+        if TIME_TO_FIRST_TOKEN not in self.seconds:
+            self.add(TIME_TO_FIRST_TOKEN, time.perf_counter() - self.started)
+
+    def as_log_fields(self) -> Dict[str, Any]:
+        fields = {
+            f"{stage}_ms": round(seconds * 1000, 3)
+            for stage, seconds in self.seconds.items()
+        }
+        fields.update(
+            {f"{stage}_count": count for stage, count in self.counts.items()}
+        )
+        return fields
+
+
+class StageMetrics:
+    """
+    Process-wide per-stage latency histograms. Each message contributes one
+    observation per stage it went through (the sum of that stage's time).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        with self._lock:
+            histogram = self._histograms.setdefault(stage, LatencyHistogram())
+            histogram.observe(seconds, error=error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                stage: histogram.as_dict()
+                for stage, histogram in self._histograms.items()
+            }
+
+    def prometheus(self) -> str:
+        """Histograms in the Prometheus text exposition format (seconds)"""
+        name = "goblin_chat_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each chat pipeline stage per message",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, histogram in self._histograms.items():
+                running = 0
+                bounds = [str(ms / 1000) for ms in LATENCY_BUCKETS_MS] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.counts):
+                    running += count
+                    lines.append(
+                        f'{name}_bucket{{stage="{stage}",le="{bound}"}} {running}'
+                    )
+                lines.append(
+                    f'{name}_sum{{stage="{stage}"}} {histogram.total_ms / 1000}'
+                )
+                lines.append(
+                    f'{name}_count{{stage="{stage}"}} {histogram.observations}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+stage_metrics = StageMetrics()
+
+
+def record_stage(stage: str, seconds: float):
+    """Add time to the current message's stage; a no-op outside a message"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def mark_first_token():
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.mark_first_token()
+
+
+@contextmanager
+def timed_stage(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def message_timing(**log_fields):
+    """
+    Collect stage timings for one chat message. On exit every stage is
+    observed in ``stage_metrics`` and one structured log line is written.
+    Whether the message is traced is decided once here, so a sampled
+    message gets its complete trace tree.
+    """
+    timings = MessageTimings()
+    timings_token = _current_timings.set(timings)
+    sampled_token = _trace_sampled.set(_sample_trace())
+    error = False
+    try:
+        yield timings
+    except Exception:
+        error = True
+        raise
+    finally:
+        timings.add(MESSAGE_TOTAL, time.perf_counter() - timings.started)
+        _current_timings.reset(timings_token)
+        _trace_sampled.reset(sampled_token)
+        for stage, seconds in timings.seconds.items():
+            stage_metrics.observe(stage, seconds, error=error)
+        logger.info(
+            "chat_message_timings "
+            + json.dumps({**log_fields, **timings.as_log_fields(), "error": error})
+        )
+
+
+def _sample_trace() -> bool:
+    rate = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+    return trace is not None and rate > 0 and random.random() < rate
+
+
+def traced(name: str, **kwargs):
+    """
+    A LangSmith trace span when tracing is installed and this message was
+    sampled (``TRACE_SAMPLE_RATE``, default off); otherwise a no-op.
+    """
+    sampled = _trace_sampled.get()
+    if sampled is None:
+        sampled = _sample_trace()
+    if not sampled:
+        return nullcontext()
+    return trace(name=name, **kwargs)
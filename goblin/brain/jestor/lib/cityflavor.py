@@ -1,12 +1,84 @@
+import asyncio
 import logging
 import re
+import threading
+import time
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any, Tuple
-from datetime import datetime, timedelta
-from brain.jestor.lib.database import QueryResult, DatabaseType
+from datetime import datetime
+from brain.instrumentation import DB_QUERY, record_stage
+from brain.jestor.lib.database import (
+    QueryResult,
+    DatabaseType,
+    get_database_manager,
+)
+from brain.jestor.lib.query_cache import QueryResultCache
+from brain.jestor.lib.query_templates import QueryTemplateRegistry, TemplateShape
+from brain.jestor.lib.time_ranges import parse_time_range
+from brain.jestor.lib.vendor_index import VendorNameIndex
+from brain.jestor.lib.rollups import (
+    ORDER_DAILY_ROLLUP,
+    ROLLUP_TABLE,
+    WATERMARK_TABLE,
+    rollup_covers,
+)
 
 logger = logging.getLogger(__name__)
 
+# Patterns to identify vendor names, compiled once at import
+VENDOR_NAME_PATTERNS = [
+    # E.g., "how many orders did Akita Sushi"
+    re.compile(r"how many orders did ([\w\s]+)", re.IGNORECASE),
+    # E.g., "orders for Akita Sushi"
+    re.compile(r"orders for ([\w\s]+)", re.IGNORECASE),
+    # E.g., "Akita Sushi orders yesterday"
+    re.compile(r"([\w\s]+) orders yesterday", re.IGNORECASE),
+]
+
+# Aggregate mode: rows returned alongside the SQL summary, and the number
+# of vendor/day groups kept so the payload stays constant-size
+DEFAULT_SAMPLE_ROWS = 5
+AGGREGATE_GROUP_LIMITS = {"vendor": 10, "day": 31, "location": 10}
+
+# How long the rollup watermark is trusted before it is re-read
+WATERMARK_CACHE_SECONDS = 60
+
+# Core fields and relationships needed for analysis
+ENTITY_MAP = {
+    "Orders": {
+        "table": "main_order",
+        "essential_fields": [
+            "id",
+            "created_at_dt",
+            "total_money_amount",
+            "state",
+        ],
+        "optional_fields": [
+            "shift_id",
+            "location_id",
+            "reference_id",
+            "customer_id",
+        ],
+        "relationships": {
+            "vendor": ("main_foodtruck", "shift__truck_id", "id", ["name"]),
+            "location": ("main_location", "shift__location_id", "id", ["name"]),
+        },
+        "time_field": "created_at_dt",
+    },
+    "Vendors": {
+        "table": "main_foodtruck",
+        "essential_fields": ["id", "name", "primary_cuisine"],
+        "optional_fields": ["email", "phone", "description", "area_id"],
+        "relationships": {"area": ("main_area", "area_id", "id", ["name"])},
+    },
+    "Locations": {
+        "table": "main_location",
+        "essential_fields": ["id", "name", "street_number_and_name"],
+        "optional_fields": ["event_planner_id", "area_id", "description"],
+        "relationships": {"area": ("main_area", "area_id", "id", ["name"])},
+    },
+}
+
 
 @dataclass
 class QueryContext:
@@ -18,11 +90,37 @@ class QueryContext:
     filters: Dict[str, Any] = None
     metrics: List[str] = None
     vendor_name: Optional[str] = None
+    vendor_id: Optional[int] = None
 
 
 class CityFlavorQueryTool:
-    def __init__(self, db_manager):
+    def __init__(
+        self,
+        db_manager,
+        cache: Optional[QueryResultCache] = None,
+        aggregate: bool = True,
+        sample_rows: int = DEFAULT_SAMPLE_ROWS,
+        use_rollups: bool = True,
+    ):
         self.db_manager = db_manager
+        self.cache = cache
+        # Aggregate mode computes summaries in SQL and ships only a few
+        # sample rows; otherwise the legacy LIMIT 50 raw rows are returned
+        self.aggregate = aggregate
+        self.sample_rows = sample_rows
+        self.templates = QueryTemplateRegistry()
+        # Resolves misspelled or partial vendor names to main_foodtruck ids
+        self.vendor_index = VendorNameIndex()
+        # Answer whole-day aggregates from the daily rollup table when the
+        # rollup has been refreshed past the requested range
+        self.use_rollups = use_rollups
+        self._watermark = None
+        self._watermark_checked_at = float("-inf")
+        self.entity_runners = {
+            "Orders": self._run_order_analysis,
+            "Vendors": self._run_vendor_analysis,
+            "Locations": self._run_location_analysis,
+        }
         self._setup_entity_relationships()
 
         required_entities = {"Orders", "Vendors"}
@@ -37,67 +135,27 @@ class CityFlavorQueryTool:
 
     def _setup_entity_relationships(self):
         """Define the core fields and relationships needed for analysis"""
-        self.entity_map = {
-            "Orders": {
-                "table": "main_order",
-                "essential_fields": [
-                    "id",
-                    "created_at_dt",
-                    "total_money_amount",
-                    "state",
-                ],
-                "optional_fields": [
-                    "shift_id",
-                    "location_id",
-                    "reference_id",
-                    "customer_id",
-                ],
-                "relationships": {
-                    "vendor": ("main_foodtruck", "shift__truck_id", "id", ["name"]),
-                    "location": ("main_location", "shift__location_id", "id", ["name"]),
-                },
-                "time_field": "created_at_dt",
-            },
-            "Vendors": {
-                "table": "main_foodtruck",
-                "essential_fields": ["id", "name", "primary_cuisine"],
-                "optional_fields": ["email", "phone", "description", "area_id"],
-                "relationships": {"area": ("main_area", "area_id", "id", ["name"])},
-            },
-            # 'Locations': {
-            #     'table': 'main_location',
-            #     'essential_fields': ['id', 'name', 'street_number_and_name'],
-            #     'optional_fields': ['event_planner_id', 'area_id', 'description'],
-            #     'relationships': {
-            #         'area': ('main_area', 'area_id', 'id', ['name'])
-            #     }
-            # }
-        }
+        # Shared, read-only map; validated once per process by the singleton
+        self.entity_map = ENTITY_MAP
 
-    def _parse_time_reference(self, text: str) -> Optional[Dict[str, datetime]]:
-        """Parse time references from natural language"""
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-
-        if "yesterday" in text.lower():
-            yesterday = today - timedelta(days=1)
-            return {"start": yesterday, "end": today}
-        elif "today" in text.lower():
-            return {"start": today, "end": today + timedelta(days=1)}
-        return None
-
-    def _extract_vendor_name(self, text: str) -> Optional[str]:
-        """Extract vendor name from the query text."""
-        # Patterns to identify vendor names
-        patterns = [
-            r"how many orders did ([\w\s]+)",  # E.g., "how many orders did Akita Sushi"
-            r"orders for ([\w\s]+)",  # E.g., "orders for Akita Sushi"
-            r"([\w\s]+) orders yesterday",  # E.g., "Akita Sushi orders yesterday"
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+    def _extract_vendor_name(
+        self, text: str, time_span: Optional[Tuple[int, int]] = None
+    ) -> Optional[str]:
+        """
+        Extract vendor name from the query text. A name running into the
+        time expression ("orders for Akita Sushi last week") is cut there,
+        and a "name" that is itself part of the time expression ("orders for
+        the last 7 days") is no vendor at all.
+        """
+        for pattern in VENDOR_NAME_PATTERNS:
+            match = pattern.search(text)
             if match:
-                return match.group(1).strip()
+                start, end = match.span(1)
+                if time_span and time_span[0] <= start < time_span[1]:
+                    return None
+                if time_span and start < time_span[0] < end:
+                    end = time_span[0]
+                return text[start:end].strip() or None
         return None
 
     def _parse_query_context(self, description: str) -> QueryContext:
@@ -135,45 +193,84 @@ class CityFlavorQueryTool:
         if not main_entity:
             main_entity = "Orders"
 
-        # Extract vendor name and time range
-        vendor_name = self._extract_vendor_name(description)
-        time_range = self._parse_time_reference(description)
+        # Extract time range and vendor name
+        time_match = parse_time_range(description)
+        time_range = time_match.as_dict() if time_match else None
+        vendor_name = self._extract_vendor_name(
+            description, time_match.span if time_match else None
+        )
+        vendor_id = None
+        if self.vendor_index.is_loaded:
+            match = (
+                self.vendor_index.resolve(vendor_name)
+                if vendor_name
+                else self.vendor_index.find_in_text(description)
+            )
+            if match:
+                vendor_id, vendor_name = match.vendor_id, match.name
 
         return QueryContext(
             main_entity=main_entity,
             related_entities=related_entities,
             time_range=time_range,
             vendor_name=vendor_name,
+            vendor_id=vendor_id,
             metrics=["sales"] if "sales" in description_lower else ["orders"],
         )
 
-    def _build_dynamic_query(self, context: QueryContext) -> Tuple[str, List[Any]]:
-        """Build optimized SQL query for Akita Sushi 1 order analysis."""
-        entity_info = self.entity_map["Orders"]  # We're focused on orders
-        select_fields = []
+    def _build_order_filters(
+        self, context: QueryContext, table_alias: str = "main"
+    ) -> Tuple[List[str], List[str], List[Any]]:
+        """Build the JOIN and WHERE clauses shared by the order queries"""
+        entity_info = self.entity_map["Orders"]
         joins = []
         where_clauses = []
-        parameters = []
-
-        # Essential fields from the Orders table
-        table_alias = "main"
-        for field in entity_info["essential_fields"]:
-            select_fields.append(f"{table_alias}.{field}")
 
         # Add joins for vendor and location (optional but useful)
-        joins.append("LEFT JOIN main_foodtruck ON main.vendor_id = main_foodtruck.id")
-        select_fields.append("main_foodtruck.name AS vendor_name")
+        joins.append(
+            f"LEFT JOIN main_foodtruck ON {table_alias}.vendor_id = main_foodtruck.id"
+        )
 
-        # Add filter for Akita Sushi 1 by name
-        if context.vendor_name:
+        # Filter by the resolved vendor id, falling back to the raw name
+        if context.vendor_id is not None:
+            where_clauses.append(f"{table_alias}.vendor_id = %s")
+        elif context.vendor_name:
             where_clauses.append("LOWER(main_foodtruck.name) = LOWER(%s)")
-            parameters.append(context.vendor_name)
 
         # Add time range filter for 'yesterday'
         if context.time_range:
             where_clauses.append(f"{table_alias}.{entity_info['time_field']} >= %s")
             where_clauses.append(f"{table_alias}.{entity_info['time_field']} < %s")
+
+        return joins, where_clauses, self._order_filter_parameters(context)
+
+    def _order_filter_parameters(self, context: QueryContext) -> List[Any]:
+        """Parameters for the placeholders added by _build_order_filters"""
+        parameters = []
+        if context.vendor_id is not None:
+            parameters.append(context.vendor_id)
+        elif context.vendor_name:
+            parameters.append(context.vendor_name)
+        if context.time_range:
             parameters.extend([context.time_range["start"], context.time_range["end"]])
+        return parameters
+
+    def _build_dynamic_query(
+        self, context: QueryContext, limit: int = 50
+    ) -> Tuple[str, List[Any]]:
+        """Build optimized SQL query for Akita Sushi 1 order analysis."""
+        entity_info = self.entity_map["Orders"]  # We're focused on orders
+        select_fields = []
+
+        # Essential fields from the Orders table
+        table_alias = "main"
+        for field in entity_info["essential_fields"]:
+            select_fields.append(f"{table_alias}.{field}")
+        select_fields.append("main_foodtruck.name AS vendor_name")
+
+        joins, where_clauses, parameters = self._build_order_filters(
+            context, table_alias
+        )
 
         # Construct the final SQL query
         query = f"""
@@ -182,11 +279,229 @@ class CityFlavorQueryTool:
         {' '.join(joins)}
         {'WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''}
         ORDER BY {entity_info.get('time_field', 'id')} DESC
-        LIMIT 50
+        LIMIT %s
+        """
+
+        return query, parameters + [int(limit)]
+
+    def _build_aggregate_query(self, context: QueryContext) -> Tuple[str, List[Any]]:
+        """
+        Build a single query computing totals, per-vendor and per-day
+        aggregates in SQL with GROUPING SETS, so summaries are exact for any
+        number of matching orders.
+        """
+        entity_info = self.entity_map["Orders"]
+        table_alias = "main"
+        amount = f"{table_alias}.total_money_amount"
+        day = f"DATE({table_alias}.{entity_info['time_field']})"
+
+        joins, where_clauses, parameters = self._build_order_filters(
+            context, table_alias
+        )
+
+        query = f"""
+        SELECT
+            GROUPING(main_foodtruck.name) AS vendor_grouped,
+            GROUPING({day}) AS day_grouped,
+            main_foodtruck.name AS vendor_name,
+            {day} AS day,
+            COUNT(*) AS order_count,
+            COALESCE(SUM({amount}), 0) AS total_sales,
+            COALESCE(SUM({amount}), 0) / NULLIF(COUNT(*), 0) AS average_order
+        FROM {entity_info['table']} AS {table_alias}
+        {' '.join(joins)}
+        {'WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''}
+        GROUP BY GROUPING SETS ((), (main_foodtruck.name), ({day}))
         """
 
         return query, parameters
 
+    def _build_rollup_query(self, context: QueryContext) -> Tuple[str, List[Any]]:
+        """
+        Same output shape as _build_aggregate_query, computed from the
+        per-vendor/per-day rollup table instead of raw orders.
+        """
+        where_clauses = []
+        if context.vendor_id is not None:
+            where_clauses.append("vendor_id = %s")
+        elif context.vendor_name:
+            where_clauses.append("LOWER(vendor_name) = LOWER(%s)")
+        if context.time_range:
+            where_clauses.append("day >= %s")
+            where_clauses.append("day < %s")
+
+        query = f"""
+        SELECT
+            GROUPING(vendor_name) AS vendor_grouped,
+            GROUPING(day) AS day_grouped,
+            vendor_name,
+            day,
+            SUM(order_count) AS order_count,
+            COALESCE(SUM(total_sales), 0) AS total_sales,
+            COALESCE(SUM(total_sales), 0) / NULLIF(SUM(order_count), 0) AS average_order
+        FROM {ROLLUP_TABLE}
+        {'WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''}
+        GROUP BY GROUPING SETS ((), (vendor_name), (day))
+        """
+
+        return query, self._order_filter_parameters(context)
+
+    def _vendor_filter_parameters(self, context: QueryContext) -> List[Any]:
+        """Parameters for the placeholders added by _build_vendor_query"""
+        if context.vendor_id is not None:
+            return [context.vendor_id]
+        if context.vendor_name:
+            return [context.vendor_name]
+        return []
+
+    def _build_vendor_query(self, context: QueryContext) -> Tuple[str, List[Any]]:
+        """Vendor count and cuisine distribution from main_foodtruck"""
+        entity_info = self.entity_map["Vendors"]
+        where_clauses = []
+        if context.vendor_id is not None:
+            where_clauses.append("id = %s")
+        elif context.vendor_name:
+            where_clauses.append("LOWER(name) = LOWER(%s)")
+
+        query = f"""
+        SELECT
+            GROUPING(primary_cuisine) AS cuisine_grouped,
+            primary_cuisine,
+            COUNT(*) AS vendor_count
+        FROM {entity_info['table']}
+        {'WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''}
+        GROUP BY GROUPING SETS ((), (primary_cuisine))
+        """
+
+        return query, self._vendor_filter_parameters(context)
+
+    def _build_location_query(self, context: QueryContext) -> Tuple[str, List[Any]]:
+        """
+        Top locations by sales for the matching orders; the window count
+        reports how many locations had any orders before the LIMIT applies.
+        """
+        entity_info = self.entity_map["Locations"]
+        table_alias = "main"
+        location = entity_info["table"]
+
+        joins, where_clauses, parameters = self._build_order_filters(
+            context, table_alias
+        )
+
+        query = f"""
+        SELECT
+            {location}.id AS location_id,
+            {location}.name AS location_name,
+            COUNT(*) AS order_count,
+            COALESCE(SUM({table_alias}.total_money_amount), 0) AS total_sales,
+            COUNT(*) OVER () AS active_locations
+        FROM {self.entity_map['Orders']['table']} AS {table_alias}
+        JOIN {location} ON {table_alias}.location_id = {location}.id
+        {' '.join(joins)}
+        {'WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''}
+        GROUP BY {location}.id, {location}.name
+        ORDER BY total_sales DESC
+        LIMIT %s
+        """
+
+        return query, parameters + [AGGREGATE_GROUP_LIMITS["location"]]
+
+    async def _rollup_refreshed_through(self) -> Optional[datetime]:
+        """Read (and briefly cache) how far the order rollup is up to date"""
+        now = time.monotonic()
+        if now - self._watermark_checked_at < WATERMARK_CACHE_SECONDS:
+            return self._watermark
+
+        result = await self.db_manager.execute_query(
+            query=f"SELECT refreshed_through FROM {WATERMARK_TABLE} WHERE name = %s",
+            parameters=[ORDER_DAILY_ROLLUP],
+            db_type=DatabaseType.DEFAULT,
+        )
+        self._watermark = (
+            result.data[0]["refreshed_through"]
+            if result.is_success and result.data
+            else None
+        )
+        self._watermark_checked_at = now
+        return self._watermark
+
+    def _time_range_summary(self, context: QueryContext) -> Dict[str, Optional[str]]:
+        if not context.time_range:
+            return {"start": None, "end": None}
+        return {
+            "start": context.time_range["start"].isoformat(),
+            "end": context.time_range["end"].isoformat(),
+        }
+
+    def _summarize_aggregates(
+        self, rows: List[Dict[str, Any]], context: QueryContext
+    ) -> Dict[str, Any]:
+        """Turn GROUPING SETS rows into a constant-size summary"""
+
+        def metrics(row: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                "order_count": int(row["order_count"] or 0),
+                "total_sales": round(float(row["total_sales"] or 0), 2),
+                "average_order": round(float(row["average_order"] or 0), 2),
+            }
+
+        totals = {"order_count": 0, "total_sales": 0.0, "average_order": 0.0}
+        by_vendor = []
+        by_day = []
+        for row in rows:
+            if row["vendor_grouped"] and row["day_grouped"]:
+                totals = metrics(row)
+            elif row["day_grouped"]:
+                by_vendor.append({"vendor_name": row["vendor_name"], **metrics(row)})
+            elif row["vendor_grouped"]:
+                day = row["day"].isoformat() if row["day"] else None
+                by_day.append({"day": day, **metrics(row)})
+
+        by_vendor.sort(key=lambda item: item["total_sales"], reverse=True)
+        by_day.sort(key=lambda item: item["day"] or "")
+
+        return {
+            "total_records": totals["order_count"],
+            "total_sales": totals["total_sales"],
+            "average_order": totals["average_order"],
+            "vendor_name": context.vendor_name,
+            "time_range": self._time_range_summary(context),
+            "vendor_count": len(by_vendor),
+            "by_vendor": by_vendor[: AGGREGATE_GROUP_LIMITS["vendor"]],
+            "day_count": len(by_day),
+            "by_day": by_day[-AGGREGATE_GROUP_LIMITS["day"] :],
+        }
+
+    def _format_aggregate_results_for_ai(
+        self,
+        aggregate_result: QueryResult,
+        sample_result: Optional[QueryResult],
+        context: QueryContext,
+    ) -> Dict[str, Any]:
+        """Format SQL aggregates plus optional sample rows for the AI"""
+        if not aggregate_result.is_success:
+            return {"status": "error", "message": aggregate_result.error}
+
+        summary = self._summarize_aggregates(aggregate_result.data, context)
+        if summary["total_records"] == 0:
+            return {
+                "status": "success",
+                "message": f"No orders found for {context.vendor_name} on the given date.",
+                "summary": summary,
+            }
+
+        data = []
+        if sample_result is not None and sample_result.is_success:
+            data = sample_result.data
+        summary["sample_size"] = len(data)
+
+        return {
+            "status": "success",
+            "data": data,
+            "summary": summary,
+            "message": f"Analysis completed for {context.main_entity}",
+        }
+
     def _format_results_for_ai(
         self, query_result: QueryResult, context: QueryContext
     ) -> Dict[str, Any]:
@@ -283,16 +598,267 @@ class CityFlavorQueryTool:
 
         return summary
 
+    def template_builders(self) -> List[Tuple[str, str, Any, List[Any]]]:
+        """
+        Every query template the tool can run, as (kind, entity, builder,
+        extra parameters), for tooling such as the advise_indexes command.
+        """
+        return [
+            ("rows", "Orders", self._build_dynamic_query, [50]),
+            ("aggregate", "Orders", self._build_aggregate_query, []),
+            ("rollup", "Orders", self._build_rollup_query, []),
+            ("cuisines", "Vendors", self._build_vendor_query, []),
+            (
+                "top",
+                "Locations",
+                self._build_location_query,
+                [AGGREGATE_GROUP_LIMITS["location"]],
+            ),
+        ]
+
+    def _template_shape(
+        self, kind: str, context: QueryContext, entity: str = "Orders"
+    ) -> TemplateShape:
+        return TemplateShape(
+            kind=kind,
+            entity=entity,
+            vendor_filter=bool(context.vendor_name),
+            vendor_by_id=context.vendor_id is not None,
+            # Vendor queries read main_foodtruck only; there is no time column
+            time_filter=bool(context.time_range) and entity != "Vendors",
+        )
+
+    def _filter_parameters(self, entity: str, context: QueryContext) -> List[Any]:
+        if entity == "Vendors":
+            return self._vendor_filter_parameters(context)
+        return self._order_filter_parameters(context)
+
+    async def _execute_template(
+        self,
+        kind: str,
+        context: QueryContext,
+        build_query,
+        extra_parameters: Optional[List[Any]] = None,
+        entity: str = "Orders",
+    ) -> QueryResult:
+        """
+        Run a query through its registered template: the SQL text is built
+        only the first time a shape is seen, and the statement is prepared
+        on pooled connections. Latency is recorded per template.
+        """
+        template = self.templates.get(
+            self._template_shape(kind, context, entity),
+            lambda: build_query(context)[0],
+        )
+        parameters = self._filter_parameters(entity, context) + (
+            extra_parameters or []
+        )
+
+        started = time.perf_counter()
+        result = await self.db_manager.execute_query(
+            query=template.sql,
+            parameters=parameters,
+            db_type=DatabaseType.DEFAULT,
+            prepare=True,
+        )
+        elapsed = time.perf_counter() - started
+        template.latency.observe(elapsed, error=not result.is_success)
+        record_stage(DB_QUERY, elapsed)
+        return result
+
+    async def _run_aggregate_analysis(self, context: QueryContext) -> Dict[str, Any]:
+        """
+        Run the aggregate query and, when aggregating raw orders, the
+        sample-row query concurrently. Rollup answers skip the samples so
+        they never touch main_order.
+        """
+        # Plan: daily rollups when the range is whole, refreshed days;
+        # otherwise aggregate raw orders
+        source = "orders"
+        if (
+            self.use_rollups
+            and context.time_range
+            and rollup_covers(
+                context.time_range, await self._rollup_refreshed_through()
+            )
+        ):
+            source = "rollup"
+            queries = [
+                self._execute_template("rollup", context, self._build_rollup_query)
+            ]
+        else:
+            queries = [
+                self._execute_template(
+                    "aggregate", context, self._build_aggregate_query
+                )
+            ]
+        if source == "orders" and self.sample_rows > 0:
+            queries.append(
+                self._execute_template(
+                    "rows",
+                    context,
+                    self._build_dynamic_query,
+                    extra_parameters=[self.sample_rows],
+                )
+            )
+
+        results = await asyncio.gather(*queries)
+        sample_result = results[1] if len(results) > 1 else None
+        formatted = self._format_aggregate_results_for_ai(
+            results[0], sample_result, context
+        )
+        if "summary" in formatted:
+            formatted["summary"]["source"] = source
+        return formatted
+
+    async def _run_order_analysis(self, context: QueryContext) -> Dict[str, Any]:
+        if self.aggregate:
+            return await self._run_aggregate_analysis(context)
+
+        result = await self._execute_template(
+            "rows", context, self._build_dynamic_query, extra_parameters=[50]
+        )
+
+        # Always format and return the result
+        return self._format_results_for_ai(result, context)
+
+    async def _run_vendor_analysis(self, context: QueryContext) -> Dict[str, Any]:
+        result = await self._execute_template(
+            "cuisines", context, self._build_vendor_query, entity="Vendors"
+        )
+        if not result.is_success:
+            return {"status": "error", "message": result.error}
+
+        vendor_count = 0
+        cuisines = {}
+        for row in result.data:
+            if row["cuisine_grouped"]:
+                vendor_count = int(row["vendor_count"] or 0)
+            else:
+                cuisines[row["primary_cuisine"] or "unknown"] = int(
+                    row["vendor_count"] or 0
+                )
+
+        return {
+            "status": "success",
+            "summary": {
+                "total_records": vendor_count,
+                "vendor_name": context.vendor_name,
+                "cuisine_distribution": cuisines,
+            },
+            "message": "Analysis completed for Vendors",
+        }
+
+    async def _run_location_analysis(self, context: QueryContext) -> Dict[str, Any]:
+        result = await self._execute_template(
+            "top",
+            context,
+            self._build_location_query,
+            extra_parameters=[AGGREGATE_GROUP_LIMITS["location"]],
+            entity="Locations",
+        )
+        if not result.is_success:
+            return {"status": "error", "message": result.error}
+
+        by_location = [
+            {
+                "location_name": row["location_name"],
+                "order_count": int(row["order_count"] or 0),
+                "total_sales": round(float(row["total_sales"] or 0), 2),
+            }
+            for row in result.data
+        ]
+        active = int(result.data[0]["active_locations"]) if result.data else 0
+
+        return {
+            "status": "success",
+            "summary": {
+                "total_records": active,
+                "active_locations": active,
+                "vendor_name": context.vendor_name,
+                "time_range": self._time_range_summary(context),
+                "by_location": by_location,
+            },
+            "message": "Analysis completed for Locations",
+        }
+
+    def _fan_out_entities(self, context: QueryContext) -> List[str]:
+        """
+        Entities mentioned besides Orders that we can query. Orders is
+        always the response itself, as it was before fan-out.
+        """
+        entities = [context.main_entity] + context.related_entities
+        return [
+            entity
+            for entity in dict.fromkeys(entities)
+            if entity != "Orders" and entity in self.entity_runners
+        ]
+
+    def _merge_entity_results(
+        self, response: Dict[str, Any], results: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Attach each fanned-out entity's summary (or error) to the Orders
+        response under "entities", leaving the rest of it unchanged.
+        """
+        merged = dict(response)
+        merged["entities"] = {
+            entity: (
+                result.get("summary", {})
+                if result["status"] == "success"
+                else {"error": result["message"]}
+            )
+            for entity, result in results.items()
+        }
+        return merged
+
+    async def warm_up(self):
+        """Load the vendor name index ahead of the first question"""
+        await self.vendor_index.ensure_fresh(self.db_manager)
+
     async def analyze_data(self, query_description: str) -> Dict[str, Any]:
         try:
+            await self.vendor_index.ensure_fresh(self.db_manager)
             context = self._parse_query_context(query_description)
-            query, parameters = self._build_dynamic_query(context)
-
-            result = await self.db_manager.execute_query(
-                query=query, parameters=parameters, db_type=DatabaseType.DEFAULT
+            if self.cache is not None:
+                cached = await self.cache.get(context)
+                if cached is not None:
+                    return cached
+
+            # Orders plus one query plan per other requested entity, run
+            # concurrently so a compound question costs as much as its
+            # slowest entity
+            entities = self._fan_out_entities(context)
+            formatted, *results = await asyncio.gather(
+                self._run_order_analysis(context),
+                *(self.entity_runners[entity](context) for entity in entities),
             )
-
-            # Always format and return the result
-            return self._format_results_for_ai(result, context)
+            if entities and formatted["status"] == "success":
+                formatted = self._merge_entity_results(
+                    formatted, dict(zip(entities, results))
+                )
+
+            if self.cache is not None and formatted["status"] == "success":
+                await self.cache.set(context, formatted)
+            return formatted
         except Exception as e:
             return {"status": "error", "message": f"Failed to analyze data: {str(e)}"}
+
+
+_query_tool = None
+_query_tool_lock = threading.Lock()
+
+
+def get_city_flavor_query_tool() -> CityFlavorQueryTool:
+    """
+    Process-wide CityFlavorQueryTool. The tool keeps no per-query state, so
+    one instance is safely shared by every consumer thread and coroutine.
+    """
+    global _query_tool
+    if _query_tool is None:
+        with _query_tool_lock:
+            if _query_tool is None:
+                _query_tool = CityFlavorQueryTool(
+                    get_database_manager(), cache=QueryResultCache()
+                )
+    return _query_tool
@@ -1,11 +1,16 @@
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
+from django.conf import settings
 from django.db import connections, connection
-from channels.db import database_sync_to_async
+from channels.db import DatabaseSyncToAsync
+import asyncio
 import logging
+import threading
 from dataclasses import dataclass
 from enum import Enum
 from contextlib import contextmanager
 
+from brain.jestor.lib.pool import get_pool_backend
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -18,6 +23,9 @@ class QueryResult:
     data: List[Dict[str, Any]]
     row_count: int
     error: Optional[str] = None
+    columns: Optional[List[str]] = None
+    columnar_data: Optional[Tuple[List[Any], ...]] = None
+    truncated: bool = False
     
     @property
     def is_success(self) -> bool:
@@ -50,8 +58,10 @@ class DatabaseManager:
     """
     Manages database operations without storing persistent connections.
     """
-    def __init__(self):
-        pass  # No need to initialize connections here
+    def __init__(self, pool_backend=None):
+        # Optional natively async pooled backend (psycopg 3); without it
+        # queries run on Django connections in worker threads
+        self.pool_backend = pool_backend
     
     @contextmanager
     def get_connection(self, db_type: DatabaseType = DatabaseType.DEFAULT):
@@ -110,19 +120,33 @@ class DatabaseManager:
         self,
         query: str,
         parameters: Optional[Union[list, tuple, dict]] = None,
-        db_type: DatabaseType = DatabaseType.DEFAULT
+        db_type: DatabaseType = DatabaseType.DEFAULT,
+        prepare: bool = False
     ) -> QueryResult:
         """
         Execute a query on the specified database connection.
+
+        ``prepare`` asks the pooled backend to prepare the statement once per
+        connection; it is ignored on the Django connection path.
         """
         try:
             if not query.strip().upper().startswith('SELECT'):
                 raise ValueError("Only SELECT queries are allowed")
             
-            # Wrap the synchronous method with database_sync_to_async
-            results = await database_sync_to_async(self._execute_read_query)(
-                query, parameters, db_type
-            )
+            if self.pool_backend is not None and self.pool_backend.supports(db_type):
+                columns, rows = await self.pool_backend.fetch(
+                    db_type, query, parameters, prepare=prepare or None
+                )
+                results = [dict(zip(columns, row)) for row in rows]
+            else:
+                # Not thread-sensitive: each query gets a worker thread with
+                # its own Django connection, so gathered queries really run
+                # concurrently instead of queueing on the one sync thread.
+                # Old connections are closed before and after, as in
+                # database_sync_to_async.
+                results = await DatabaseSyncToAsync(
+                    self._execute_read_query, thread_sensitive=False
+                )(query, parameters, db_type)
             return QueryResult(
                 status="success",
                 data=results,
@@ -146,3 +170,247 @@ class DatabaseManager:
                 columns = [col[0] for col in cursor.description]
                 data = [dict(zip(columns, row)) for row in cursor.fetchall()]
                 return data
+
+
+@dataclass
+class RowBatch:
+    """
+    A batch of rows from a streamed query, kept as raw tuples until the
+    caller picks a shape: per-row dicts or columnar lists.
+    """
+    columns: List[str]
+    rows: List[tuple]
+
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def as_columns(self) -> Tuple[List[Any], ...]:
+        if not self.rows:
+            return tuple([] for _ in self.columns)
+        return tuple(list(column) for column in zip(*self.rows))
+
+
+def _estimate_row_bytes(row: tuple) -> int:
+    """Cheap size estimate used for byte caps; exact sizing isn't needed"""
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes, bytearray, memoryview)):
+            size += len(value)
+        else:
+            size += 8
+    return size
+
+
+class StreamingDatabaseManager(DatabaseManager):
+    """
+    DatabaseManager variant that streams large SELECTs in batches.
+
+    On PostgreSQL rows come from a server-side (named) cursor, so only one
+    batch is held in memory at a time. Batches are fetched on a worker
+    thread and handed to the event loop through a bounded queue, which
+    applies backpressure when the consumer is slower than the database.
+    Connections served by the pooled backend keep its non-streaming path.
+    """
+    def __init__(
+        self,
+        pool_backend=None,
+        batch_size: int = 1000,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        prefetch_batches: int = 2
+    ):
+        super().__init__(pool_backend=pool_backend)
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.prefetch_batches = prefetch_batches
+
+    async def stream_query(
+        self,
+        query: str,
+        parameters: Optional[Union[list, tuple, dict]] = None,
+        db_type: DatabaseType = DatabaseType.DEFAULT,
+        batch_size: Optional[int] = None
+    ) -> AsyncIterator[RowBatch]:
+        """
+        Yield RowBatch objects until the result set, the row cap or the
+        byte cap is exhausted.
+        """
+        async for batch in self._stream_batches(
+            query, parameters, db_type, batch_size, status={}
+        ):
+            yield batch
+
+    async def _stream_batches(
+        self, query, parameters, db_type, batch_size, status: Dict[str, Any]
+    ) -> AsyncIterator[RowBatch]:
+        """Stream batches, setting ``status["truncated"]`` if a cap was hit"""
+        if not query.strip().upper().startswith('SELECT'):
+            raise ValueError("Only SELECT queries are allowed")
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+        # Own worker thread and Django connection per stream, as in
+        # DatabaseManager.execute_query
+        producer = asyncio.ensure_future(
+            DatabaseSyncToAsync(self._produce_batches, thread_sensitive=False)(
+                loop, queue, stop, query, parameters, db_type,
+                batch_size or self.batch_size,
+            )
+        )
+
+        rows_seen = 0
+        bytes_seen = 0
+        finished = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                rows = item.rows
+                if self.max_rows is not None and rows_seen + len(rows) > self.max_rows:
+                    rows = rows[:self.max_rows - rows_seen]
+                if self.max_bytes is not None:
+                    kept = []
+                    for row in rows:
+                        bytes_seen += _estimate_row_bytes(row)
+                        if bytes_seen > self.max_bytes:
+                            break
+                        kept.append(row)
+                    rows = kept
+
+                rows_seen += len(rows)
+                if rows:
+                    yield RowBatch(columns=item.columns, rows=rows)
+                if len(rows) < len(item.rows):
+                    raise _CapReached()
+        except _CapReached:
+            status["truncated"] = True
+            logger.info(f"Streaming query stopped at cap after {rows_seen} rows")
+        finally:
+            stop.set()
+            # Drain up to the producer's end marker, so a producer blocked
+            # on a full queue can observe stop
+            while not finished:
+                finished = await queue.get() is None
+            await producer
+
+    async def execute_query(
+        self,
+        query: str,
+        parameters: Optional[Union[list, tuple, dict]] = None,
+        db_type: DatabaseType = DatabaseType.DEFAULT,
+        prepare: bool = False,
+        columnar: bool = False
+    ) -> QueryResult:
+        """
+        Execute a query through the streaming path, honouring the row and
+        byte caps. With ``columnar=True`` the rows are returned as one list
+        per column in ``columnar_data`` instead of per-row dicts.
+
+        Databases served by the pooled backend are fetched there whole, with
+        ``prepare`` passed through.
+        """
+        if self.pool_backend is not None and self.pool_backend.supports(db_type):
+            result = await super().execute_query(query, parameters, db_type, prepare)
+            if columnar and result.is_success:
+                columns = list(result.data[0]) if result.data else []
+                result.columns = columns
+                result.columnar_data = tuple(
+                    [row[column] for row in result.data] for column in columns
+                )
+                result.data = []
+            return result
+
+        try:
+            columns: List[str] = []
+            rows: List[tuple] = []
+            status: Dict[str, Any] = {"truncated": False}
+            async for batch in self._stream_batches(
+                query, parameters, db_type, None, status
+            ):
+                columns = batch.columns
+                rows.extend(batch.rows)
+
+            result = RowBatch(columns=columns, rows=rows)
+            return QueryResult(
+                status="success",
+                data=[] if columnar else result.as_dicts(),
+                row_count=len(rows),
+                error=None,
+                columns=columns,
+                columnar_data=result.as_columns() if columnar else None,
+                truncated=status["truncated"]
+            )
+        except Exception as e:
+            error_msg = f"Query execution error on {db_type.connection_name}: {str(e)}"
+            logger.error(error_msg)
+            return QueryResult(
+                status="error",
+                data=[],
+                row_count=0,
+                error=error_msg
+            )
+
+    def _produce_batches(self, loop, queue, stop, query, parameters, db_type, batch_size):
+        """
+        Worker-thread side: fetch batches from a server-side cursor. Always
+        ends with a None marker, which the consumer waits for.
+        """
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        conn = None
+        try:
+            with self.get_connection(db_type) as conn:
+                # chunked_cursor() is a named server-side cursor on PostgreSQL
+                # and a regular cursor on backends without support for one
+                with conn.chunked_cursor() as cursor:
+                    cursor.execute(query, parameters)
+                    columns = [col[0] for col in cursor.description]
+                    while not stop.is_set():
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        put(RowBatch(columns=columns, rows=rows))
+        except Exception as e:
+            logger.error(f"Streaming query error on {db_type.connection_name}: {str(e)}")
+            if not stop.is_set():
+                put(e)
+        finally:
+            # The worker thread's connection isn't managed by Django's
+            # request cycle, so release it here
+            if conn is not None:
+                conn.close()
+            put(None)
+
+
+class _CapReached(Exception):
+    """Internal signal that a streaming row/byte cap was hit"""
+
+
+_database_manager = None
+_database_manager_lock = threading.Lock()
+
+
+def get_database_manager() -> DatabaseManager:
+    """
+    Process-wide DatabaseManager shared by query tools. Queries not served
+    by the pooled backend are streamed, under the DATABASE_STREAM_* caps.
+    """
+    global _database_manager
+    if _database_manager is None:
+        with _database_manager_lock:
+            if _database_manager is None:
+                _database_manager = StreamingDatabaseManager(
+                    pool_backend=get_pool_backend(),
+                    batch_size=getattr(settings, "DATABASE_STREAM_BATCH_SIZE", 1000),
+                    max_rows=getattr(settings, "DATABASE_STREAM_MAX_ROWS", None),
+                    max_bytes=getattr(settings, "DATABASE_STREAM_MAX_BYTES", None),
+                )
+    return _database_manager
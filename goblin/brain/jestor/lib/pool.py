@@ -0,0 +1,205 @@
+from typing import Dict, Any, List, Optional, Tuple, Union
+from django.conf import settings
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+try:
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # psycopg 3 is optional; the sync Django path is used instead
+    AsyncConnectionPool = None
+
+logger = logging.getLogger(__name__)
+
+POSTGRES_ENGINES = (
+    "django.db.backends.postgresql",
+    "django.db.backends.postgresql_psycopg2",
+)
+
+DEFAULT_POOL_SETTINGS = {
+    "min_size": 1,
+    "max_size": 10,
+    "timeout": 10.0,  # seconds to wait for a free connection
+    "max_idle": 300.0,
+    "statement_timeout_ms": 15000,
+}
+
+
+@dataclass
+class PoolMetrics:
+    """Per-database counters for the async pool backend"""
+    queries: int = 0
+    errors: int = 0
+    total_query_seconds: float = 0.0
+    total_wait_seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def record(self, wait: float, duration: float, error: bool = False):
+        self.queries += 1
+        self.errors += int(error)
+        self.total_wait_seconds += wait
+        self.total_query_seconds += duration
+        self.latencies.append(duration)
+        if len(self.latencies) > 1000:
+            del self.latencies[:500]
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else None
+        return {
+            "queries": self.queries,
+            "errors": self.errors,
+            "avg_query_ms": (
+                round(1000 * self.total_query_seconds / self.queries, 3)
+                if self.queries else None
+            ),
+            "avg_wait_ms": (
+                round(1000 * self.total_wait_seconds / self.queries, 3)
+                if self.queries else None
+            ),
+            "p95_query_ms": round(1000 * p95, 3) if p95 is not None else None,
+        }
+
+
+class AsyncPoolBackend:
+    """
+    Natively async, pooled query execution for PostgreSQL databases.
+
+    One psycopg 3 AsyncConnectionPool is opened lazily per DatabaseType,
+    sized from settings.DATABASE_POOL_DEFAULTS / DATABASE_POOLS, with a
+    server-side statement_timeout and a health check on checkout. Queries
+    run on the event loop instead of occupying a sync thread.
+    """
+    def __init__(self):
+        self._pools: Dict[str, Any] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def is_available() -> bool:
+        return AsyncConnectionPool is not None
+
+    def supports(self, db_type) -> bool:
+        """True when the database is PostgreSQL and psycopg 3 is installed"""
+        config = settings.DATABASES.get(db_type.connection_name)
+        return (
+            self.is_available()
+            and config is not None
+            and config.get("ENGINE") in POSTGRES_ENGINES
+        )
+
+    def pool_settings(self, db_type) -> Dict[str, Any]:
+        pool_settings = dict(DEFAULT_POOL_SETTINGS)
+        pool_settings.update(getattr(settings, "DATABASE_POOL_DEFAULTS", {}))
+        pool_settings.update(
+            getattr(settings, "DATABASE_POOLS", {}).get(db_type.connection_name, {})
+        )
+        return pool_settings
+
+    async def _get_pool(self, db_type):
+        name = db_type.connection_name
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+
+        async with self._lock:
+            pool = self._pools.get(name)
+            if pool is not None:
+                return pool
+
+            config = settings.DATABASES[name]
+            pool_settings = self.pool_settings(db_type)
+            statement_timeout = int(pool_settings["statement_timeout_ms"])
+            pool = AsyncConnectionPool(
+                kwargs={
+                    "dbname": config.get("NAME"),
+                    "user": config.get("USER"),
+                    "password": config.get("PASSWORD"),
+                    "host": config.get("HOST") or None,
+                    "port": config.get("PORT") or None,
+                    "autocommit": True,
+                    "options": f"-c statement_timeout={statement_timeout}",
+                },
+                min_size=pool_settings["min_size"],
+                max_size=pool_settings["max_size"],
+                timeout=pool_settings["timeout"],
+                max_idle=pool_settings["max_idle"],
+                check=AsyncConnectionPool.check_connection,
+                name=name,
+                open=False,
+            )
+            await pool.open()
+            logger.info(
+                f"Opened async pool for {name} "
+                f"(min={pool_settings['min_size']}, max={pool_settings['max_size']})"
+            )
+            self._pools[name] = pool
+            self._metrics.setdefault(name, PoolMetrics())
+            return pool
+
+    async def fetch(
+        self,
+        db_type,
+        query: str,
+        parameters: Optional[Union[list, tuple, dict]] = None,
+        prepare: Optional[bool] = None,
+    ) -> Tuple[List[str], List[tuple]]:
+        """Run a read query on a pooled connection, returning columns and rows"""
+        pool = await self._get_pool(db_type)
+        metrics = self._metrics[db_type.connection_name]
+
+        requested = time.perf_counter()
+        async with pool.connection() as conn:
+            acquired = time.perf_counter()
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, parameters, prepare=prepare)
+                    columns = [col.name for col in cursor.description]
+                    rows = await cursor.fetchall()
+            except Exception:
+                metrics.record(
+                    acquired - requested, time.perf_counter() - acquired, error=True
+                )
+                raise
+        metrics.record(acquired - requested, time.perf_counter() - acquired)
+        return columns, rows
+
+    async def close(self):
+        async with self._lock:
+            for pool in self._pools.values():
+                await pool.close()
+            self._pools.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Query counters plus psycopg_pool's own stats, per database"""
+        result = {}
+        for name, metrics in self._metrics.items():
+            result[name] = metrics.as_dict()
+            pool = self._pools.get(name)
+            if pool is not None:
+                result[name]["pool"] = pool.get_stats()
+        return result
+
+
+_pool_backend = None
+_pool_backend_lock = threading.Lock()
+
+
+def get_pool_backend() -> Optional[AsyncPoolBackend]:
+    """
+    Process-wide pool backend, or None when pooling is disabled in settings
+    or psycopg 3 isn't installed.
+    """
+    global _pool_backend
+    if not getattr(settings, "DATABASE_POOL_ENABLED", False):
+        return None
+    if not AsyncPoolBackend.is_available():
+        logger.warning("DATABASE_POOL_ENABLED is set but psycopg_pool is missing")
+        return None
+    if _pool_backend is None:
+        with _pool_backend_lock:
+            if _pool_backend is None:
+                _pool_backend = AsyncPoolBackend()
+    return _pool_backend
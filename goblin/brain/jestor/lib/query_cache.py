@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# TTLs in seconds
+CLOSED_RANGE_TTL = 24 * 60 * 60  # ranges entirely in the past don't change
+OPEN_RANGE_TTL = 60  # ranges touching "now" keep receiving orders
+REDIS_RETRY_AFTER = 30  # back off after a Redis failure
+
+
+class QueryResultCache:
+    """
+    Two-level cache for CityFlavorQueryTool.analyze_data results.
+
+    Keys are derived from the normalized QueryContext, so differently worded
+    questions that parse to the same query share an entry. An in-process
+    LRU sits in front of Redis (the same instance used for channels); the
+    TTL depends on whether the requested time range is closed in the past.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        max_entries: int = 256,
+        prefix: str = "cityflavor:analyze:",
+    ):
+        self.redis_url = redis_url or getattr(settings, "REDIS_URL", None)
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_down_until = 0.0
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key_for(self, context) -> str:
+        """Stable cache key for a parsed QueryContext"""
+        normalized = asdict(context)
+        if context.vendor_name:
+            normalized["vendor_name"] = " ".join(
+                context.vendor_name.lower().split()
+            )
+        normalized["related_entities"] = sorted(context.related_entities or [])
+        normalized["metrics"] = sorted(context.metrics or [])
+        encoded = json.dumps(normalized, sort_keys=True, default=str)
+        return self.prefix + hashlib.sha1(encoded.encode()).hexdigest()
+
+    def ttl_for(self, context) -> int:
+        """Long TTL for ranges closed in the past, short for anything open"""
+        time_range = context.time_range
+        if (
+            time_range
+            and time_range.get("end")
+            and time_range["end"] <= datetime.now()
+        ):
+            return CLOSED_RANGE_TTL
+        return OPEN_RANGE_TTL
+
+    async def get(self, context) -> Optional[Dict[str, Any]]:
+        key = self.key_for(context)
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._local.move_to_end(key)
+                    self.local_hits += 1
+                    return value
+                del self._local[key]
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = await client.get(key)
+                if raw is not None:
+                    value = json.loads(raw)
+                    ttl = await client.ttl(key)
+                    if not ttl or ttl < 0:
+                        ttl = OPEN_RANGE_TTL
+                    self._store_local(key, value, ttl)
+                    with self._lock:
+                        self.redis_hits += 1
+                    return value
+            except Exception as e:
+                self._mark_redis_down(e)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, context, value: Dict[str, Any]):
+        key = self.key_for(context)
+        ttl = self.ttl_for(context)
+        # Round-trip through JSON so local and Redis hits return the same shape
+        encoded = json.dumps(value, default=str)
+        self._store_local(key, json.loads(encoded), ttl)
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                await client.set(key, encoded, ex=ttl)
+            except Exception as e:
+                self._mark_redis_down(e)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._local)
+            local_hits, redis_hits, misses = (
+                self.local_hits,
+                self.redis_hits,
+                self.misses,
+            )
+        lookups = local_hits + redis_hits + misses
+        return {
+            "entries": entries,
+            "local_hits": local_hits,
+            "redis_hits": redis_hits,
+            "misses": misses,
+            "hit_rate": round((lookups - misses) / lookups, 3) if lookups else None,
+        }
+
+    def _store_local(self, key: str, value: Dict[str, Any], ttl: int):
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _get_redis(self):
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            try:
+                import redis.asyncio as redis
+
+                self._redis = redis.from_url(self.redis_url)
+            except Exception as e:
+                self._mark_redis_down(e)
+                return None
+        return self._redis
+
+    def _mark_redis_down(self, error: Exception):
+        logger.warning(f"Query cache Redis unavailable, using local only: {error}")
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
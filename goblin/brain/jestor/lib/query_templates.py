@@ -0,0 +1,78 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+from brain.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TemplateShape:
+    """
+    The parts of a QueryContext that change the SQL text. Contexts with the
+    same shape share one parameterized statement; only parameters differ.
+    """
+
+    kind: str  # e.g. "rows", "aggregate"
+    entity: str
+    vendor_filter: bool
+    time_filter: bool
+    vendor_by_id: bool = False
+
+    @property
+    def name(self) -> str:
+        filters = [
+            label
+            for label, enabled in (
+                ("vendor_id" if self.vendor_by_id else "vendor", self.vendor_filter),
+                ("time", self.time_filter),
+            )
+            if enabled
+        ]
+        return f"{self.entity.lower()}.{self.kind}[{','.join(filters) or 'all'}]"
+
+
+@dataclass
+class QueryTemplate:
+    name: str
+    sql: str
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+class QueryTemplateRegistry:
+    """
+    Maps each query shape to a stable parameterized statement.
+
+    SQL text is assembled once per shape. Because the text is identical
+    for every call of a shape, the pooled backend can prepare it once per
+    connection (psycopg ``prepare=True``) and Postgres reuses the plan.
+    Each template records its own latency histogram.
+    """
+
+    def __init__(self):
+        self._templates: Dict[TemplateShape, QueryTemplate] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self, shape: TemplateShape, build_sql: Callable[[], str]
+    ) -> QueryTemplate:
+        template = self._templates.get(shape)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(shape)
+                if template is None:
+                    template = QueryTemplate(name=shape.name, sql=build_sql())
+                    self._templates[shape] = template
+                    logger.info(f"Registered query template {template.name}")
+        return template
+
+    def templates(self) -> List[QueryTemplate]:
+        return list(self._templates.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            template.name: template.latency.as_dict()
+            for template in self._templates.values()
+        }
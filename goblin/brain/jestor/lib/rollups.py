@@ -0,0 +1,151 @@
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from brain.jestor.lib.database import DatabaseType
+from brain.models import OrderDailyRollup, RollupWatermark
+
+logger = logging.getLogger(__name__)
+
+ORDER_DAILY_ROLLUP = "order_daily"
+ROLLUP_TABLE = OrderDailyRollup._meta.db_table
+WATERMARK_TABLE = RollupWatermark._meta.db_table
+
+# Days before the watermark that are re-aggregated on every run, so
+# late-arriving or edited orders are picked up
+DEFAULT_LOOKBACK_DAYS = 2
+
+# Days aggregated per query and transaction, bounding memory on backfills
+DEFAULT_BATCH_DAYS = 31
+
+FIRST_ORDER_QUERY = "SELECT MIN(created_at_dt) FROM main_order"
+
+SOURCE_QUERY = """
+    SELECT
+        COALESCE(main.vendor_id, 0) AS vendor_id,
+        MAX(main_foodtruck.name) AS vendor_name,
+        COALESCE(main.location_id, 0) AS location_id,
+        DATE(main.created_at_dt) AS day,
+        COUNT(*) AS order_count,
+        COALESCE(SUM(main.total_money_amount), 0) AS total_sales
+    FROM main_order AS main
+    LEFT JOIN main_foodtruck ON main.vendor_id = main_foodtruck.id
+    WHERE main.created_at_dt >= %s AND main.created_at_dt < %s
+    GROUP BY COALESCE(main.vendor_id, 0), COALESCE(main.location_id, 0),
+        DATE(main.created_at_dt)
+"""
+
+
+def refresh_order_rollups(
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    source: DatabaseType = DatabaseType.DEFAULT,
+    batch_days: int = DEFAULT_BATCH_DAYS,
+) -> int:
+    """
+    Incrementally rebuild per-vendor/per-location/per-day order rollups.
+
+    Days from (watermark - lookback) up to now are re-aggregated from
+    main_order and replace their existing rollup rows; older days are left
+    alone. The first run backfills all history from the first order. Work
+    is done ``batch_days`` at a time, each batch in its own transaction
+    that also advances the watermark, so a long backfill holds one batch in
+    memory and resumes where it stopped. Returns rows written.
+    """
+    run_started = timezone.now()
+    connection = connections[source.connection_name]
+    watermark = RollupWatermark.objects.filter(name=ORDER_DAILY_ROLLUP).first()
+    if watermark is None:
+        since = _first_order_day(connection)
+    else:
+        since = (watermark.refreshed_through - timedelta(days=lookback_days)).date()
+
+    written = 0
+    if since is None:
+        # No orders yet; the (empty) rollup is current
+        RollupWatermark.objects.update_or_create(
+            name=ORDER_DAILY_ROLLUP, defaults={"refreshed_through": run_started}
+        )
+    for first_day, end_day in rollup_batches(since, run_started, batch_days):
+        written += _refresh_days(connection, first_day, end_day, run_started)
+
+    logger.info(
+        f"Refreshed {written} order rollup rows since "
+        f"{since or 'the beginning'} through {run_started.isoformat()}"
+    )
+    return written
+
+
+def rollup_batches(since: Optional[date], until: datetime, batch_days: int):
+    """(first day, end day) pairs covering ``since`` up to ``until``'s day"""
+    if since is None:
+        return
+    last_day = until.date()
+    while since <= last_day:
+        end_day = since + timedelta(days=batch_days)
+        yield since, end_day
+        since = end_day
+
+
+def _first_order_day(connection) -> Optional[date]:
+    with connection.cursor() as cursor:
+        cursor.execute(FIRST_ORDER_QUERY)
+        first_order = cursor.fetchone()[0]
+    return first_order.date() if first_order else None
+
+
+def _refresh_days(connection, first_day: date, end_day: date, run_started) -> int:
+    """Replace the rollups for days in [first_day, end_day) up to run_started"""
+    window_start = timezone.make_aware(datetime.combine(first_day, time.min))
+    window_end = min(
+        timezone.make_aware(datetime.combine(end_day, time.min)), run_started
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(SOURCE_QUERY, [window_start, window_end])
+        rows = cursor.fetchall()
+
+    rollups = [
+        OrderDailyRollup(
+            vendor_id=vendor_id,
+            vendor_name=vendor_name,
+            location_id=location_id,
+            day=day,
+            order_count=order_count,
+            total_sales=total_sales,
+            average_order=(
+                (Decimal(total_sales) / order_count).quantize(Decimal("0.01"))
+                if order_count
+                else 0
+            ),
+        )
+        for vendor_id, vendor_name, location_id, day, order_count, total_sales in rows
+    ]
+
+    with transaction.atomic():
+        OrderDailyRollup.objects.filter(day__gte=first_day, day__lt=end_day).delete()
+        OrderDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+        RollupWatermark.objects.update_or_create(
+            name=ORDER_DAILY_ROLLUP, defaults={"refreshed_through": window_end}
+        )
+    return len(rollups)
+
+
+def rollup_covers(time_range, refreshed_through) -> bool:
+    """
+    True when a time range is made of whole days that the rollup has fully
+    aggregated, i.e. daily grain is enough to answer it exactly.
+    """
+    if not time_range or refreshed_through is None:
+        return False
+
+    start, end = time_range["start"], time_range["end"]
+    if start.time() != time.min or end.time() != time.min:
+        return False
+
+    if timezone.is_naive(end) and timezone.is_aware(refreshed_through):
+        refreshed_through = timezone.make_naive(refreshed_through)
+    return end <= refreshed_through
@@ -0,0 +1,286 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+MONTHS = {
+    "jan": 1,
+    "feb": 2,
+    "mar": 3,
+    "apr": 4,
+    "may": 5,
+    "jun": 6,
+    "jul": 7,
+    "aug": 8,
+    "sep": 9,
+    "oct": 10,
+    "nov": 11,
+    "dec": 12,
+}
+
+NUMBER_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+    "thirty": 30,
+    "ninety": 90,
+}
+
+# Grammar fragments, combined into the compiled rules below
+_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?"
+    r"|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_ORDINAL = r"\d{1,2}(?:st|nd|rd|th)?(?!\d)"
+_YEAR = r"(?:19|20)\d{2}"
+_ISO = r"\d{4}-\d{1,2}-\d{1,2}"
+_MONTH_DAY = rf"{_MONTH}\.?\s+{_ORDINAL}(?:,?\s+{_YEAR})?"
+_DAY_MONTH = rf"{_ORDINAL}\s+(?:of\s+)?{_MONTH}(?:,?\s+{_YEAR})?"
+_DAY = rf"(?:{_ISO}|{_MONTH_DAY}|{_DAY_MONTH}|today|yesterday)"
+_COUNT = rf"(?:\d+|{'|'.join(NUMBER_WORDS)})"
+_UNIT = r"(?:day|week|month|year)s?"
+_LEAD = r"(?:(?:in|during|over|for|within)\s+)?(?:the\s+)?"
+
+_ISO_PARTS = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_MONTH_PARTS = re.compile(rf"({_MONTH})", re.IGNORECASE)
+_DIGITS = re.compile(r"\d+")
+
+
+@dataclass(frozen=True)
+class TimeRangeMatch:
+    """A bounded [start, end) range and where it was found in the text"""
+
+    start: datetime
+    end: datetime
+    span: Tuple[int, int]
+
+    def as_dict(self) -> Dict[str, datetime]:
+        return {"start": self.start, "end": self.end}
+
+
+def _midnight(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(day: datetime, months: int) -> datetime:
+    """Shift by whole months, clamping to the last day of the target month"""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    following = datetime(year + month // 12, month % 12 + 1, 1)
+    last_day = (following - timedelta(days=1)).day
+    return day.replace(year=year, month=month, day=min(day.day, last_day))
+
+
+def _count(token: str) -> int:
+    token = token.lower()
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _unit(token: str) -> str:
+    return token.lower().rstrip("s")
+
+
+def _parse_day(token: str, today: datetime) -> Optional[datetime]:
+    """Midnight of a single-day token; dates without a year are never future"""
+    token = token.lower()
+    if token == "today":
+        return today
+    if token == "yesterday":
+        return today - timedelta(days=1)
+
+    try:
+        iso = _ISO_PARTS.fullmatch(token)
+        if iso:
+            return datetime(*(int(part) for part in iso.groups()))
+
+        month = MONTHS[_MONTH_PARTS.search(token).group(1)[:3]]
+        numbers = [int(n) for n in _DIGITS.findall(token)]
+        day = numbers[0]
+        if len(numbers) > 1:
+            return datetime(numbers[1], month, day)
+        parsed = datetime(today.year, month, day)
+        if parsed > today:
+            parsed = parsed.replace(year=today.year - 1)
+        return parsed
+    except (ValueError, KeyError, AttributeError, IndexError):
+        return None
+
+
+def _between(match, today):
+    start = _parse_day(match.group("first"), today)
+    last = _parse_day(match.group("second"), today)
+    if start is None or last is None:
+        return None
+    if last < start:
+        start, last = last, start
+    return start, last + timedelta(days=1)
+
+
+def _since(match, today):
+    start = _parse_day(match.group("day"), today)
+    if start is None:
+        return None
+    return start, today + timedelta(days=1)
+
+
+def _rolling(match, today):
+    """'last 7 days' includes today: the N units ending tomorrow at midnight"""
+    count = _count(match.groupdict().get("count") or "1")
+    if count < 1:
+        return None
+    unit = _unit(match.group("unit"))
+    end = today + timedelta(days=1)
+    if unit == "day":
+        return end - timedelta(days=count), end
+    if unit == "week":
+        return end - timedelta(weeks=count), end
+    months = count if unit == "month" else count * 12
+    return _add_months(end, -months), end
+
+
+def _ago(match, today):
+    count = _count(match.group("count"))
+    days = count * 7 if _unit(match.group("unit")) == "week" else count
+    day = today - timedelta(days=days)
+    return day, day + timedelta(days=1)
+
+
+def _calendar(match, today):
+    """'this week' / 'last month': whole calendar periods, weeks from Monday"""
+    unit = _unit(match.group("unit"))
+    offset = 0 if match.group("which").lower() in ("this", "current") else -1
+    if unit == "week":
+        start = today - timedelta(days=today.weekday()) + timedelta(weeks=offset)
+        return start, start + timedelta(weeks=1)
+    if unit == "month":
+        start = _add_months(today.replace(day=1), offset)
+        return start, _add_months(start, 1)
+    start = today.replace(month=1, day=1, year=today.year + offset)
+    return start, start.replace(year=start.year + 1)
+
+
+def _single_day(match, today):
+    day = _parse_day(match.group("day"), today)
+    if day is None:
+        return None
+    return day, day + timedelta(days=1)
+
+
+def _month(match, today):
+    """A whole month; without a year, the most recent one not in the future"""
+    if match.group("month_with_year"):
+        month = MONTHS[match.group("month_with_year").lower()[:3]]
+        start = datetime(int(match.group("year_only")), month, 1)
+        return start, _add_months(start, 1)
+
+    month = MONTHS[match.group("month").lower()[:3]]
+    year = match.group("year")
+    if year:
+        start = datetime(int(year), month, 1)
+    else:
+        start = datetime(today.year, month, 1)
+        if start > today:
+            start = start.replace(year=today.year - 1)
+    return start, _add_months(start, 1)
+
+
+def _year(match, today):
+    start = datetime(int(match.group("year")), 1, 1)
+    return start, start.replace(year=start.year + 1)
+
+
+# Rules are tried in order; the first one that matches and yields a valid
+# range wins, so compound forms come before the single dates they contain
+RULES: List[Tuple[re.Pattern, Callable]] = [
+    (
+        re.compile(
+            rf"\b(?:between|from)\s+(?P<first>{_DAY})\s+"
+            rf"(?:and|to|until|through|thru|-)\s+(?P<second>{_DAY})\b",
+            re.IGNORECASE,
+        ),
+        _between,
+    ),
+    (
+        # A bare "from X" with no end is open-ended, like "since X"
+        re.compile(rf"\b(?:since|after|from)\s+(?P<day>{_DAY})\b", re.IGNORECASE),
+        _since,
+    ),
+    (
+        re.compile(
+            rf"\b{_LEAD}(?:last|past|previous)\s+(?P<count>{_COUNT})\s+"
+            rf"(?P<unit>{_UNIT})\b",
+            re.IGNORECASE,
+        ),
+        _rolling,
+    ),
+    (
+        re.compile(
+            rf"\b(?P<count>{_COUNT})\s+(?P<unit>(?:day|week)s?)\s+ago\b",
+            re.IGNORECASE,
+        ),
+        _ago,
+    ),
+    (
+        re.compile(
+            rf"\b{_LEAD}past\s+(?P<unit>day|week|month|year)\b",
+            re.IGNORECASE,
+        ),
+        _rolling,
+    ),
+    (
+        re.compile(
+            rf"\b{_LEAD}(?P<which>this|current|last|previous)\s+"
+            rf"(?P<unit>week|month|year)\b",
+            re.IGNORECASE,
+        ),
+        _calendar,
+    ),
+    (
+        re.compile(rf"\b(?:on\s+)?(?P<day>{_DAY})\b", re.IGNORECASE),
+        _single_day,
+    ),
+    (
+        re.compile(
+            rf"\b(?:(?:in|during|for|of)\s+(?P<month>{_MONTH})"
+            rf"(?:\s+(?P<year>{_YEAR}))?"
+            rf"|(?P<month_with_year>{_MONTH})\s+(?P<year_only>{_YEAR}))\b",
+            re.IGNORECASE,
+        ),
+        _month,
+    ),
+    (
+        re.compile(rf"\b(?:in|during)\s+(?P<year>{_YEAR})\b", re.IGNORECASE),
+        _year,
+    ),
+]
+
+
+def parse_time_range(
+    text: str, now: Optional[datetime] = None
+) -> Optional[TimeRangeMatch]:
+    """
+    Find the first time expression in a question and turn it into a bounded
+    [start, end) range of whole days: today, yesterday, N days ago, last/past
+    N days/weeks/months/years, this/last week/month/year, ISO dates, month
+    names with or without a day or year, 'since X' / 'from X' and
+    'between X and Y'. The span covers lead words such as 'from' or 'since'.
+    """
+    today = _midnight(now or datetime.now())
+    for pattern, handler in RULES:
+        for match in pattern.finditer(text):
+            bounds = handler(match, today)
+            if bounds is not None:
+                return TimeRangeMatch(bounds[0], bounds[1], match.span())
+    return None
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from brain.jestor.lib.database import DatabaseType
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_SECONDS = 300
+DEFAULT_THRESHOLD = 0.45
+# Words shared by more than this fraction of vendors ("grill", "food")
+# don't nominate candidates when scanning a whole question
+COMMON_WORD_FRACTION = 0.2
+# Words introducing a vendor by name in a question ("sales for X", "orders at X")
+MENTION_WORDS = {"for", "at"}
+# Stricter than DEFAULT_THRESHOLD: a mention found by scanning the question
+# has to read as the vendor's name, not just share a word with it
+DEFAULT_TEXT_THRESHOLD = 0.6
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """pg_trgm-style trigrams: words padded with two leading, one trailing space"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass
+class VendorMatch:
+    vendor_id: int
+    name: str
+    score: float
+
+
+class VendorNameIndex:
+    """
+    In-memory trigram index resolving free-text vendor mentions to vendor
+    ids, so queries can filter on the indexed ``vendor_id`` instead of
+    ``LOWER(name)``. Similarity is trigram Jaccard, like pg_trgm's
+    ``similarity()``. The index reloads from main_foodtruck in the
+    background once it is older than ``refresh_seconds``.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: int = DEFAULT_REFRESH_SECONDS,
+        threshold: float = DEFAULT_THRESHOLD,
+        text_threshold: float = DEFAULT_TEXT_THRESHOLD,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.threshold = threshold
+        self.text_threshold = text_threshold
+        self._names: Dict[int, str] = {}
+        self._gram_counts: Dict[int, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._exact: Dict[str, int] = {}
+        self._words: Dict[str, List[int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def build(self, vendors: Iterable[Tuple[int, str]]):
+        """Replace the index contents with (id, name) pairs"""
+        names, gram_counts, exact = {}, {}, {}
+        postings = defaultdict(list)
+        words = defaultdict(list)
+        for vendor_id, name in vendors:
+            if not name:
+                continue
+            grams = trigrams(name)
+            names[vendor_id] = name
+            gram_counts[vendor_id] = len(grams)
+            exact.setdefault(normalize(name), vendor_id)
+            for gram in grams:
+                postings[gram].append(vendor_id)
+            for word in set(normalize(name).split()):
+                words[word].append(vendor_id)
+
+        # Swap in one step so concurrent lookups see a consistent index
+        self._names, self._gram_counts, self._exact = names, gram_counts, exact
+        self._postings, self._words = dict(postings), dict(words)
+        self._loaded_at = time.monotonic()
+        logger.info(f"Vendor name index built with {len(names)} vendors")
+
+    def resolve(self, mention: str) -> Optional[VendorMatch]:
+        """Best vendor for a mention, or None below the similarity threshold"""
+        key = normalize(mention)
+        if not key:
+            return None
+        vendor_id = self._exact.get(key)
+        if vendor_id is not None:
+            return VendorMatch(vendor_id, self._names[vendor_id], 1.0)
+
+        grams = trigrams(key)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] += 1
+
+        best = None
+        for candidate, common in shared.items():
+            score = common / (len(grams) + self._gram_counts[candidate] - common)
+            if best is None or score > best.score:
+                best = VendorMatch(candidate, self._names[candidate], score)
+        if best is not None and best.score >= self.threshold:
+            return best
+        return None
+
+    def find_in_text(self, text: str) -> Optional[VendorMatch]:
+        """
+        Find a vendor named explicitly in a question ("sales for Taco
+        Truck", "orders at Akita Sushi"). Only the words right after a
+        mention word are scored, as a window of the vendor name's own
+        length, so generic questions sharing a word with a vendor name
+        ("top taco vendors", "total sales yesterday") resolve to nothing.
+        """
+        words = normalize(text).split()
+        starts = [i + 1 for i, word in enumerate(words[:-1]) if word in MENTION_WORDS]
+        if not starts:
+            return None
+
+        common = max(3, int(len(self._names) * COMMON_WORD_FRACTION))
+        candidates = set()
+        for word in set(words[starts[0] :]):
+            vendor_ids = self._words.get(word, ())
+            if len(vendor_ids) <= common:
+                candidates.update(vendor_ids)
+
+        best = None
+        for vendor_id in candidates:
+            name_grams = trigrams(self._names[vendor_id])
+            length = len(normalize(self._names[vendor_id]).split())
+            for start in starts:
+                grams = trigrams(" ".join(words[start : start + length]))
+                common_grams = len(grams & name_grams)
+                score = common_grams / (len(grams) + len(name_grams) - common_grams)
+                if best is None or score > best.score:
+                    best = VendorMatch(vendor_id, self._names[vendor_id], score)
+        if best is not None and best.score >= self.text_threshold:
+            return best
+        return None
+
+    async def ensure_fresh(self, db_manager):
+        """
+        Load on first use, with concurrent callers sharing one load;
+        afterwards refresh in the background when stale.
+        """
+        if not self.is_loaded:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self.refresh(db_manager))
+            await asyncio.shield(self._refresh_task)
+        elif time.monotonic() - self._loaded_at > self.refresh_seconds and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.create_task(self.refresh(db_manager))
+
+    async def refresh(self, db_manager):
+        result = await db_manager.execute_query(
+            query="SELECT id, name FROM main_foodtruck",
+            db_type=DatabaseType.DEFAULT,
+        )
+        if not result.is_success:
+            logger.error(f"Vendor name index refresh failed: {result.error}")
+            if not self.is_loaded:
+                # Don't retry on every question while the table is unreachable
+                self._loaded_at = time.monotonic()
+            return
+        self.build((row["id"], row["name"]) for row in result.data)
@@ -0,0 +1,257 @@
+import json
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from brain.jestor.lib.cityflavor import CityFlavorQueryTool, QueryContext
+from brain.jestor.lib.database import DatabaseManager
+from brain.jestor.lib.rollups import ROLLUP_TABLE
+
+# The main_* tables belong to the CityFlavor database, not to a Django app
+# here, so suggestions are a plain SQL script rather than a migration
+SQL_SCRIPT_HEADER = """\
+-- Indexes suggested by advise_indexes for the tables CityFlavor queries.
+-- The main_* tables are not managed by this project's migrations: review
+-- and run this against the database that owns them. CREATE INDEX CONCURRENTLY
+-- can't run inside a transaction, so run it statement by statement
+-- (e.g. psql without --single-transaction).
+"""
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+class IndexSuggestion:
+    def __init__(self, table, expressions, reason):
+        self.table = table
+        self.expressions = tuple(expressions)
+        self.reason = reason
+
+    @property
+    def name(self):
+        parts = [re.sub(r"\W+", "_", e.lower()).strip("_") for e in self.expressions]
+        return f"{self.table}_{'_'.join(parts)}_idx"[:63]
+
+    @property
+    def sql(self):
+        return (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} "
+            f"ON {self.table} ({', '.join(self.expressions)})"
+        )
+
+    def __eq__(self, other):
+        return (self.table, self.expressions) == (other.table, other.expressions)
+
+    def __hash__(self):
+        return hash((self.table, self.expressions))
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN for every CityFlavor query template (order rows and "
+        "aggregates, daily rollups, vendor cuisines and top locations, each "
+        "without and with vendor-name, vendor-id and time filters), report "
+        "sequential scans and print the SQL for suggested functional and "
+        "composite indexes. --analyze executes the queries for real timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Connection to explain against (default: default)",
+        )
+        parser.add_argument(
+            "--vendor",
+            default=None,
+            help="Vendor name used for vendor-filtered templates "
+            "(default: first vendor in main_foodtruck)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Size of the time range used for time-filtered templates",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Use EXPLAIN (ANALYZE, BUFFERS), which executes every query; "
+            "only run it against a database that can take the load",
+        )
+        parser.add_argument(
+            "--sql-file",
+            default=None,
+            help="Also write the suggested CREATE INDEX statements to this file",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            raise CommandError("EXPLAIN (FORMAT JSON) requires PostgreSQL")
+
+        tool = CityFlavorQueryTool(DatabaseManager())
+        vendor_id, vendor_name = self._sample_vendor(connection, options["vendor"])
+        end = datetime.now()
+        time_range = {"start": end - timedelta(days=options["days"]), "end": end}
+        vendor_filters = (
+            (None, None),
+            (None, vendor_name),
+            (vendor_id, vendor_name),
+        )
+
+        suggestions = []
+        seen = set()
+        for kind, entity, build_query, extra in tool.template_builders():
+            for filter_id, filter_name in vendor_filters:
+                for time_filter in (False, True):
+                    context = QueryContext(
+                        main_entity=entity,
+                        related_entities=[],
+                        vendor_name=filter_name,
+                        vendor_id=filter_id,
+                        time_range=time_range if time_filter else None,
+                    )
+                    shape = tool._template_shape(kind, context, entity)
+                    # Vendor templates ignore the time range: one shape each
+                    if shape in seen:
+                        continue
+                    seen.add(shape)
+
+                    query = build_query(context)[0]
+                    parameters = tool._filter_parameters(entity, context) + extra
+                    plan = self._explain(
+                        connection, query, parameters, options["analyze"]
+                    )
+                    suggestions.extend(
+                        self._report(shape.name, plan, tool.entity_map, context)
+                    )
+
+        unique = list(dict.fromkeys(suggestions))
+        if not unique:
+            self.stdout.write(self.style.SUCCESS("No sequential scans need indexes"))
+            return
+
+        script = self._sql_script(unique)
+        self.stdout.write("\nSuggested indexes:\n")
+        self.stdout.write(script)
+
+        if options["sql_file"]:
+            path = Path(options["sql_file"])
+            path.write_text(script)
+            self.stdout.write(self.style.SUCCESS(f"\nWrote {path}"))
+
+    def _sample_vendor(self, connection, name=None):
+        """(id, name) of the named vendor, or of the first one"""
+        with connection.cursor() as cursor:
+            if name:
+                cursor.execute(
+                    "SELECT id, name FROM main_foodtruck WHERE LOWER(name) = LOWER(%s)",
+                    [name],
+                )
+            else:
+                cursor.execute(
+                    "SELECT id, name FROM main_foodtruck ORDER BY id LIMIT 1"
+                )
+            row = cursor.fetchone()
+        return row if row else (0, name or "unknown vendor")
+
+    def _explain(self, connection, query, parameters, analyze=False):
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN ({options}) {query}", parameters)
+            result = cursor.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result[0]
+
+    def _report(self, template_name, explained, entity_map, context):
+        """Print the plan summary for one template and return suggestions"""
+        plan = explained["Plan"]
+        if "Execution Time" in explained:
+            self.stdout.write(
+                f"\n{template_name}: {explained['Execution Time']:.2f} ms, "
+                f"shared read buffers {plan.get('Shared Read Blocks', 0)}"
+            )
+        else:
+            self.stdout.write(
+                f"\n{template_name}: estimated cost {plan.get('Total Cost', 0):.2f}, "
+                f"{plan.get('Plan Rows', 0)} rows"
+            )
+
+        table = entity_map["Orders"]["table"]
+        time_field = entity_map["Orders"]["time_field"]
+        vendor_filter = bool(context.vendor_name)
+        suggestions = []
+        for node in _walk(plan):
+            if node.get("Node Type") != "Seq Scan":
+                continue
+
+            relation = node.get("Relation Name")
+            condition = node.get("Filter", "")
+            if "Actual Rows" in node:
+                rows = (
+                    f"{node['Actual Rows']} rows kept, "
+                    f"{node.get('Rows Removed by Filter', 0)} removed"
+                )
+            else:
+                rows = f"{node.get('Plan Rows', 0)} rows estimated"
+            self.stdout.write(
+                f"  Seq Scan on {relation}: {rows}"
+                + (f", filter {condition}" if condition else "")
+            )
+
+            if relation == "main_foodtruck" and "lower" in condition.lower():
+                suggestions.append(
+                    IndexSuggestion(
+                        relation,
+                        ["LOWER(name)"],
+                        f"{template_name} filters on LOWER(main_foodtruck.name)",
+                    )
+                )
+            elif relation == ROLLUP_TABLE and vendor_filter and not context.time_range:
+                # The (day, vendor_id) index can't serve a vendor-only filter
+                suggestions.append(
+                    IndexSuggestion(
+                        relation,
+                        ["vendor_id", "day"],
+                        f"{template_name} filters the rollup by vendor only",
+                    )
+                )
+            elif relation == table and vendor_filter and context.time_range:
+                suggestions.append(
+                    IndexSuggestion(
+                        relation,
+                        ["vendor_id", time_field],
+                        f"{template_name} joins on vendor_id within a time range",
+                    )
+                )
+            elif relation == table and time_field in condition:
+                suggestions.append(
+                    IndexSuggestion(
+                        relation,
+                        [time_field],
+                        f"{template_name} filters on a {time_field} range",
+                    )
+                )
+            elif relation == table and vendor_filter:
+                suggestions.append(
+                    IndexSuggestion(
+                        relation,
+                        ["vendor_id"],
+                        f"{template_name} joins orders to a single vendor",
+                    )
+                )
+        return suggestions
+
+    def _sql_script(self, suggestions):
+        statements = "\n".join(
+            f"-- {s.reason}\n{s.sql};" for s in suggestions
+        )
+        return f"{SQL_SCRIPT_HEADER}\n{statements}\n"
@@ -0,0 +1,101 @@
+import base64
+import json
+import random
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw
+
+from eyes.frames import decode_data_url, decode_frame, encode_frame
+
+
+def _synthetic_screenshot(width: int, height: int) -> bytes:
+    """A PNG that compresses roughly like a code editor screenshot"""
+    rng = random.Random(0)
+    image = Image.new("RGB", (width, height), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    for y in range(10, height - 20, 18):
+        x = 10 + rng.randrange(0, 80, 8)
+        for _ in range(rng.randrange(2, 12)):
+            word = "".join(
+                rng.choice("abcdefghijklmnopqrstuvwxyz_(){}=.")
+                for _ in range(rng.randrange(2, 10))
+            )
+            color = rng.choice([(220, 220, 170), (86, 156, 214), (206, 145, 120)])
+            draw.text((x, y), word, fill=color)
+            x += 8 * (len(word) + 1)
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the legacy JSON/base64 screenshot message with the binary "
+        "frame protocol: bytes on the wire and server CPU to ingest one "
+        "screenshot (parse the message and open the image with PIL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--image",
+            default=None,
+            help="Screenshot file to use instead of a synthetic one",
+        )
+        parser.add_argument("--size", default="1920x1080", help="Synthetic size WxH")
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options["image"]:
+            with open(options["image"], "rb") as f:
+                image_bytes = f.read()
+        else:
+            width, height = (int(n) for n in options["size"].lower().split("x"))
+            image_bytes = _synthetic_screenshot(width, height)
+
+        header = {
+            "type": "screenshot",
+            "format": "png",
+            "project": "benchmark",
+            "timestamp": "2024-01-01T00:00:00.000Z",
+        }
+        legacy = json.dumps(
+            {
+                **header,
+                "data": "data:image/png;base64,"
+                + base64.b64encode(image_bytes).decode(),
+            }
+        )
+        binary = encode_frame(header, image_bytes)
+
+        def ingest_legacy():
+            data = json.loads(legacy)
+            Image.open(BytesIO(decode_data_url(data["data"]))).load()
+
+        def ingest_binary():
+            _, view = decode_frame(binary)
+            Image.open(BytesIO(view)).load()
+
+        legacy_bytes = len(legacy.encode())
+        self.stdout.write(f"Image: {len(image_bytes) / 1024:.1f} KiB PNG")
+        self.stdout.write(
+            f"Wire:   legacy {legacy_bytes / 1024:.1f} KiB, "
+            f"binary {len(binary) / 1024:.1f} KiB "
+            f"({100 * (1 - len(binary) / legacy_bytes):.1f}% smaller)"
+        )
+
+        iterations = options["iterations"]
+        results = {}
+        for name, ingest in (("legacy", ingest_legacy), ("binary", ingest_binary)):
+            ingest()  # warm up
+            started = time.process_time()
+            for _ in range(iterations):
+                ingest()
+            results[name] = (time.process_time() - started) / iterations * 1000
+
+        self.stdout.write(
+            f"CPU:    legacy {results['legacy']:.2f} ms, "
+            f"binary {results['binary']:.2f} ms per screenshot "
+            f"({results['legacy'] - results['binary']:.2f} ms saved)"
+        )
@@ -0,0 +1,121 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from brain.jestor.lib.cityflavor import CityFlavorQueryTool, QueryContext
+from brain.jestor.lib.database import DatabaseManager
+from brain.jestor.lib.time_ranges import parse_time_range
+
+SAMPLE_QUESTIONS = [
+    "How many orders did Akita Sushi 1 get yesterday?",
+    "What were total sales today?",
+    "Orders for Akita Sushi 1 in the last 7 days",
+    "Revenue for the past two weeks",
+    "How did sales look last week?",
+    "Orders this month by vendor",
+    "Total revenue last month",
+    "Orders on 2024-03-05",
+    "Sales between 2024-01-01 and 2024-01-31",
+    "Orders from March 3 to March 10",
+    "Revenue since Oct 1st",
+    "How many orders in December?",
+    "Which vendors sold the most?",
+]
+
+TIME_RANGE_QUESTIONS = [
+    "orders yesterday",
+    "orders in the last 7 days",
+    "orders last month",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the CityFlavor time-range parser and compare EXPLAIN "
+        "ANALYZE timings of bounded order queries against the unbounded scan "
+        "a question without a time range produces."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=10000,
+            help="Parses per sample question (default: 10000)",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Connection to explain against (default: default)",
+        )
+        parser.add_argument(
+            "--skip-queries",
+            action="store_true",
+            help="Only benchmark the parser",
+        )
+
+    def handle(self, *args, **options):
+        self._benchmark_parser(options["iterations"])
+        if options["skip_queries"]:
+            return
+
+        connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            self.stdout.write(
+                "\nSkipping query comparison: EXPLAIN ANALYZE requires PostgreSQL"
+            )
+            return
+        self._benchmark_queries(connection)
+
+    def _benchmark_parser(self, iterations):
+        self.stdout.write("Parse cost per question:")
+        per_question = []
+        for question in SAMPLE_QUESTIONS:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                match = parse_time_range(question)
+            micros = (time.perf_counter() - started) / iterations * 1e6
+            per_question.append(micros)
+
+            parsed = (
+                f"{match.start:%Y-%m-%d} .. {match.end:%Y-%m-%d}"
+                if match
+                else "no time range"
+            )
+            self.stdout.write(f"  {micros:7.2f} us  {question!r} -> {parsed}")
+
+        self.stdout.write(
+            f"  mean {statistics.mean(per_question):.2f} us, "
+            f"max {max(per_question):.2f} us"
+        )
+
+    def _benchmark_queries(self, connection):
+        tool = CityFlavorQueryTool(DatabaseManager())
+        unbounded = QueryContext(main_entity="Orders", related_entities=[])
+        self.stdout.write("\nAggregate query execution time:")
+        baseline = self._explain(connection, tool, unbounded)
+        self.stdout.write(f"  {baseline:9.2f} ms  unbounded")
+
+        for question in TIME_RANGE_QUESTIONS:
+            context = QueryContext(
+                main_entity="Orders",
+                related_entities=[],
+                time_range=parse_time_range(question).as_dict(),
+            )
+            elapsed = self._explain(connection, tool, context)
+            speedup = baseline / elapsed if elapsed else float("inf")
+            self.stdout.write(
+                f"  {elapsed:9.2f} ms  {question!r} ({speedup:.1f}x faster)"
+            )
+
+    def _explain(self, connection, tool, context):
+        query, parameters = tool._build_aggregate_query(context)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", parameters)
+            result = cursor.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result[0].get("Execution Time", 0)
@@ -0,0 +1,332 @@
+import asyncio
+import base64
+import contextlib
+import os
+import resource
+import time
+import tracemalloc
+from functools import partial
+from io import BytesIO
+from unittest import mock
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from langchain_core.messages import AIMessage
+from PIL import Image, ImageDraw
+
+from brain.providers.pool import PROVIDER_CLASSES, provider_pool
+from eyes.frames import encode_frame
+
+FAKE_PROVIDER = "loadtest"
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+}
+
+
+class FakeStreamingProvider:
+    """Deterministic provider that streams a fixed reply token by token"""
+
+    supports_tools = False
+
+    def __init__(self, tokens: int = 50, delay: float = 0.005):
+        self.tokens = tokens
+        self.delay = delay
+
+    async def generate_response_stream(self, messages):
+        for index in range(self.tokens):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield f"token{index} "
+
+
+class FakeVisionModel:
+    """Stands in for ChatAnthropic in ScreenshotConsumer"""
+
+    delay = 0.05
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.delay)
+        return AIMessage(content="Looks fine.")
+
+
+def _percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _screenshot(session: int, frame: int, size) -> bytes:
+    """A distinct PNG per frame, so no frame is a duplicate"""
+    image = Image.new("RGB", size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.text((20, 20), f"session {session} frame {frame}", fill=(0, 0, 0))
+    draw.rectangle(
+        (40 + frame * 10, 60, 140 + frame * 10, 160), fill=(session % 255, 80, 160)
+    )
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the ears ChatConsumer and eyes ScreenshotConsumer in-process: "
+        "the ASGI application from goblin/asgi.py runs with an in-memory channel "
+        "layer and deterministic fake models, N concurrent sessions are driven "
+        "over WebsocketCommunicator, and throughput, latency percentiles and "
+        "memory per connection are reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chat-sessions", type=int, default=50)
+        parser.add_argument("--eyes-sessions", type=int, default=10)
+        parser.add_argument(
+            "--messages", type=int, default=3, help="Messages per session"
+        )
+        parser.add_argument(
+            "--tokens", type=int, default=50, help="Tokens per fake chat reply"
+        )
+        parser.add_argument(
+            "--token-delay-ms",
+            type=float,
+            default=5.0,
+            help="Delay between fake tokens (default: 5)",
+        )
+        parser.add_argument(
+            "--vision-delay-ms",
+            type=float,
+            default=50.0,
+            help="Fake screenshot analysis time (default: 50)",
+        )
+        parser.add_argument(
+            "--image-size",
+            default="1280x800",
+            help="Screenshot size as WIDTHxHEIGHT (default: 1280x800)",
+        )
+        parser.add_argument(
+            "--eyes-legacy",
+            action="store_true",
+            help="Send screenshots as base64 JSON text frames instead of "
+            "binary frames",
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=60.0, help="Per-frame receive timeout"
+        )
+        parser.add_argument(
+            "--no-test-db",
+            action="store_true",
+            help="Write conversations to the configured database instead of a "
+            "throwaway test database",
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true", help="Reuse the test database"
+        )
+
+    def handle(self, *args, **options):
+        old_name = None
+        if not options["no_test_db"]:
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+            )
+
+        fake_provider = partial(
+            FakeStreamingProvider,
+            tokens=options["tokens"],
+            delay=options["token_delay_ms"] / 1000,
+        )
+        FakeVisionModel.delay = options["vision_delay_ms"] / 1000
+        try:
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(
+                    override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+                )
+                stack.enter_context(
+                    mock.patch.dict(PROVIDER_CLASSES, {FAKE_PROVIDER: fake_provider})
+                )
+                stack.enter_context(
+                    mock.patch.dict(os.environ, {"AI_PROVIDER": FAKE_PROVIDER})
+                )
+                stack.enter_context(
+                    mock.patch("eyes.consumers.ChatAnthropic", FakeVisionModel)
+                )
+
+                provider_pool.evict(FAKE_PROVIDER)
+                from goblin.asgi import application
+
+                asyncio.run(self._run(application, options))
+        finally:
+            provider_pool.evict(FAKE_PROVIDER)
+            if old_name is not None:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options["keepdb"]
+                )
+
+    async def _run(self, application, options):
+        width, height = (int(n) for n in options["image_size"].lower().split("x"))
+        if options["chat_sessions"]:
+            await self._phase(
+                "chat",
+                application,
+                "/ws/ears/chat/",
+                options["chat_sessions"],
+                lambda session, communicator: self._chat_session(
+                    communicator, options["messages"], options["timeout"]
+                ),
+            )
+        if options["eyes_sessions"]:
+            frames = {
+                session: [
+                    _screenshot(session, frame, (width, height))
+                    for frame in range(options["messages"])
+                ]
+                for session in range(options["eyes_sessions"])
+            }
+            await self._phase(
+                "eyes",
+                application,
+                "/ws/eyes/screenshots/",
+                options["eyes_sessions"],
+                lambda session, communicator: self._eyes_session(
+                    communicator,
+                    frames[session],
+                    options["timeout"],
+                    options["eyes_legacy"],
+                ),
+            )
+
+    async def _phase(self, name, application, path, sessions, drive):
+        """Connect every session, measure memory, then drive them concurrently"""
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        communicators = [
+            WebsocketCommunicator(application, path) for _ in range(sessions)
+        ]
+        started = time.perf_counter()
+        connected = await asyncio.gather(
+            *(self._connect(communicator) for communicator in communicators)
+        )
+        connect_seconds = time.perf_counter() - started
+        allocated = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        live = [c for c, ok in zip(communicators, connected) if ok]
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(drive(session, c) for session, c in enumerate(live)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(communicator.disconnect() for communicator in live))
+
+        first, total, failures = [], [], 0
+        for result in results:
+            if isinstance(result, Exception):
+                failures += 1
+                continue
+            first.extend(result[0])
+            total.extend(result[1])
+
+        self._report(
+            name,
+            sessions=sessions,
+            connected=len(live),
+            failures=failures,
+            connect_seconds=connect_seconds,
+            elapsed=elapsed,
+            first=first,
+            total=total,
+            bytes_per_connection=allocated / max(len(live), 1),
+            rss_growth_kb=rss_after - rss_before,
+        )
+
+    async def _connect(self, communicator) -> bool:
+        connected, _ = await communicator.connect(timeout=30)
+        if connected:
+            await communicator.receive_json_from(timeout=30)  # connection_status
+        return connected
+
+    async def _chat_session(self, communicator, messages, timeout):
+        """Returns (time-to-first-chunk, time-to-complete) samples in seconds"""
+        first, total = [], []
+        conversation_id = None
+        for index in range(messages):
+            started = time.perf_counter()
+            await communicator.send_json_to(
+                {
+                    "message": f"How many orders yesterday? ({index})",
+                    "project": "loadtest",
+                    "provider": FAKE_PROVIDER,
+                    "conversation_id": conversation_id,
+                }
+            )
+            first_at = None
+            while True:
+                frame = await communicator.receive_json_from(timeout=timeout)
+                if frame.get("type") == "error":
+                    raise RuntimeError(frame.get("message"))
+                if first_at is None and frame.get("message"):
+                    first_at = time.perf_counter()
+                if frame.get("is_complete"):
+                    break
+            done = time.perf_counter()
+            conversation_id = frame.get("conversation_id")
+            first.append((first_at or done) - started)
+            total.append(done - started)
+        return first, total
+
+    async def _eyes_session(self, communicator, frames, timeout, legacy):
+        total = []
+        for index, image_bytes in enumerate(frames):
+            header = {"type": "screenshot", "timestamp": index, "project": "loadtest"}
+            started = time.perf_counter()
+            if legacy:
+                data = base64.b64encode(image_bytes).decode()
+                await communicator.send_json_to(
+                    {**header, "data": "data:image/png;base64," + data}
+                )
+            else:
+                await communicator.send_to(
+                    bytes_data=encode_frame({**header, "format": "png"}, image_bytes)
+                )
+            while True:
+                frame = await communicator.receive_json_from(timeout=timeout)
+                if frame.get("type") == "error":
+                    raise RuntimeError(frame.get("message"))
+                if frame.get("type") in ("screenshot_analysis", "screenshot_skipped"):
+                    break
+            total.append(time.perf_counter() - started)
+        return total, total
+
+    def _report(self, name, **r):
+        def ms(value):
+            return "n/a" if value is None else f"{value * 1000:.1f} ms"
+
+        count = len(r["total"])
+        self.stdout.write(f"\n{name}: {r['connected']}/{r['sessions']} sessions")
+        self.stdout.write(
+            f"  connect        {ms(r['connect_seconds'])} for all sessions, "
+            f"{r['bytes_per_connection'] / 1024:.1f} KiB Python heap per "
+            f"connection, max RSS +{r['rss_growth_kb'] / 1024:.1f} MiB"
+        )
+        self.stdout.write(
+            f"  throughput     {count / r['elapsed']:.1f} messages/s "
+            f"({count} messages in {r['elapsed']:.2f} s, "
+            f"{r['failures']} failed sessions)"
+        )
+        for label, samples in (("first frame", r["first"]), ("done", r["total"])):
+            self.stdout.write(
+                f"  {label:<14} p50 {ms(_percentile(samples, 0.50))}, "
+                f"p95 {ms(_percentile(samples, 0.95))}, "
+                f"p99 {ms(_percentile(samples, 0.99))}, "
+                f"max {ms(max(samples) if samples else None)}"
+            )
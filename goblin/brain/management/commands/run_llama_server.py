@@ -0,0 +1,31 @@
+import asyncio
+import logging
+
+from django.core.management.base import BaseCommand
+
+from brain.providers.llama_server import LlamaInferenceServer
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the resident local-model inference server. LlamaProvider instances "
+        "in Daphne and Celery processes stream from it over a Unix socket "
+        "(LLAMA_SERVER_SOCKET) instead of each loading LLAMA_MODEL_PATH."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=None,
+            help="Unix socket path (defaults to LLAMA_SERVER_SOCKET)",
+        )
+
+    def handle(self, *args, **options):
+        server = LlamaInferenceServer(socket_path=options["socket"])
+        self.stdout.write(f"Starting Llama inference server on {server.socket_path}")
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            self.stdout.write("Llama inference server stopped")
@@ -0,0 +1,58 @@
+import bisect
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+@dataclass
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram, Prometheus style"""
+
+    counts: List[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    )
+    total_ms: float = 0.0
+    observations: int = 0
+    errors: int = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.observations += 1
+        self.errors += int(error)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket containing the p-th percentile"""
+        if not self.observations:
+            return 0.0
+        target = p * self.observations
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return float(LATENCY_BUCKETS_MS[index])
+                return float("inf")
+        return float("inf")
+
+    def as_dict(self) -> Dict[str, Any]:
+        buckets = {}
+        running = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + ["+Inf"], self.counts):
+            running += count
+            buckets[str(bound)] = running
+        return {
+            "count": self.observations,
+            "errors": self.errors,
+            "avg_ms": (
+                round(self.total_ms / self.observations, 3)
+                if self.observations
+                else None
+            ),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "buckets_ms": buckets,
+        }
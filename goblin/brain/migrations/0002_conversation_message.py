@@ -0,0 +1,36 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brain', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('goblinmodel_ptr', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, related_name='conversation_record', serialize=False, to='brain.goblinmodel')),
+                ('session_id', models.UUIDField(default=uuid.uuid4, editable=False)),
+                ('title', models.CharField(blank=True, max_length=200, null=True)),
+            ],
+            bases=('brain.goblinmodel',),
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('goblinmodel_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='brain.goblinmodel')),
+                ('content', models.TextField()),
+                ('role', models.CharField(choices=[('user', 'User'), ('assistant', 'Assistant'), ('system', 'System'), ('tool', 'Tool')], max_length=50)),
+                ('audio_session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='brain.transcriptionsession')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='brain.conversation')),
+            ],
+            options={
+                'ordering': ['datetime_created'],
+            },
+            bases=('brain.goblinmodel',),
+        ),
+    ]
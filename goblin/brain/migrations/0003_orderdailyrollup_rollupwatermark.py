@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brain', '0002_conversation_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vendor_id', models.IntegerField(default=0)),
+                ('vendor_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('location_id', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('average_order', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('datetime_updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('vendor_id', 'location_id', 'day')},
+                'indexes': [models.Index(fields=['day', 'vendor_id'], name='rollup_day_vendor_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('refreshed_through', models.DateTimeField()),
+                ('datetime_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -48,6 +48,15 @@ class AudioChunk(models.Model):
 
 
 class Conversation(GoblinModel):
+    # Explicit parent link: the default reverse accessor on GoblinModel
+    # ("conversation") clashes with Message.conversation
+    goblinmodel_ptr = models.OneToOneField(
+        GoblinModel,
+        on_delete=models.CASCADE,
+        parent_link=True,
+        primary_key=True,
+        related_name='conversation_record',
+    )
     session_id = models.UUIDField(default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=200, null=True, blank=True)
     
@@ -61,10 +70,11 @@ class Message(GoblinModel):
     role = models.CharField(max_length=50, choices=[
         ('user', 'User'),
         ('assistant', 'Assistant'),
-        ('system', 'System')
+        ('system', 'System'),
+        ('tool', 'Tool')
     ])
     audio_session = models.ForeignKey(
-        'ears.TranscriptionSession', 
+        'brain.TranscriptionSession',
         null=True, 
         blank=True, 
         on_delete=models.SET_NULL
@@ -77,5 +87,35 @@ class Message(GoblinModel):
         return f"{self.role}: {self.content[:50]}..."
 
 
+# Analytics rollups
+
+class OrderDailyRollup(models.Model):
+    """Per-vendor, per-location, per-day order aggregates built from main_order"""
+    vendor_id = models.IntegerField(default=0)
+    vendor_name = models.CharField(max_length=255, null=True, blank=True)
+    location_id = models.IntegerField(default=0)
+    day = models.DateField()
+    order_count = models.IntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    average_order = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    datetime_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [('vendor_id', 'location_id', 'day')]
+        indexes = [
+            models.Index(fields=['day', 'vendor_id'], name='rollup_day_vendor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_name} {self.day}: {self.order_count} orders"
 
 
+class RollupWatermark(models.Model):
+    """Tracks how far each rollup has been refreshed"""
+    name = models.CharField(max_length=100, unique=True)
+    # Every order created before this instant is reflected in the rollup
+    refreshed_through = models.DateTimeField()
+    datetime_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} through {self.refreshed_through}"
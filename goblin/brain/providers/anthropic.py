@@ -9,7 +9,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 class AnthropicProvider:
-    def __init__(self):
+    supports_tools = True
+
+    def __init__(self, http_client=None, http_async_client=None):
         api_key = os.environ.get("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
@@ -20,6 +22,25 @@ class AnthropicProvider:
             max_tokens=4096,
             streaming=True
         )
+        # ChatAnthropic takes no HTTP client, so swap its SDK clients for
+        # copies on the pooled connections
+        if http_client is not None:
+            self.model._client.close()
+            self.model._client = self.model._client.copy(http_client=http_client)
+        if http_async_client is not None:
+            self.model._async_client = self.model._async_client.copy(
+                http_client=http_async_client
+            )
+        self.http_clients = (http_client, http_async_client)
+        self._bound_models = {}
+
+    async def aclose(self):
+        """Close the HTTP clients this provider was built with"""
+        http_client, http_async_client = self.http_clients
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
 
     async def generate_response_stream(self, messages: List[BaseMessage]):
         """Generate a streaming response from the model"""
@@ -30,3 +51,24 @@ class AnthropicProvider:
         except Exception as e:
             logger.error(f"Anthropic streaming error: {str(e)}")
             raise
+
+    def _bind_tools(self, tools: List[Any]):
+        """Bind tools once per tool set and reuse the bound model"""
+        key = tuple(tool.name for tool in tools)
+        bound = self._bound_models.get(key)
+        if bound is None:
+            bound = self.model.bind_tools(tools)
+            self._bound_models[key] = bound
+        return bound
+
+    async def generate_message_stream(
+        self, messages: List[BaseMessage], tools: Optional[List[Any]] = None
+    ):
+        """Stream raw message chunks, including native tool call chunks"""
+        model = self._bind_tools(tools) if tools else self.model
+        try:
+            async for chunk in model.astream(messages):
+                yield chunk
+        except Exception as e:
+            logger.error(f"Anthropic streaming error: {str(e)}")
+            raise
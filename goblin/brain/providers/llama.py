@@ -1,22 +1,26 @@
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any, Optional, List, Union
 from langchain_core.messages import BaseMessage
-from langchain_community.llms import LlamaCpp
 import os
+import asyncio
 import logging
 
+from brain.providers.llama_server import LlamaServerClient, build_llama_model
+
 logger = logging.getLogger(__name__)
 
 class LlamaProvider:
+    # LlamaCpp is a plain completion model without structured tool calls
+    supports_tools = False
+
     def __init__(self):
-        self.model = LlamaCpp(
-            model_path=os.environ.get("LLAMA_MODEL_PATH"),
-            temperature=0.75,
-            max_tokens=2000,
-            n_ctx=2048,
-            n_threads=os.cpu_count(),
-            streaming=True
-        )
+        # Prefer the resident inference server so the model is loaded once
+        # per host; fall back to an in-process model when it isn't running.
+        self.server = LlamaServerClient()
+        self.model = None
+        if not self.server.is_available():
+            logger.info("Llama inference server not found, loading model in-process")
+            self.model = build_llama_model()
 
     async def generate_response_stream(self, messages: List[BaseMessage]):
         try:
@@ -24,6 +28,20 @@ class LlamaProvider:
             prompt = "\n".join([f"{msg.type}: {msg.content}" for msg in messages])
             
             # Stream responses
+            if self.model is None:
+                streamed = False
+                try:
+                    async for chunk in self.server.stream(prompt):
+                        streamed = True
+                        yield chunk
+                    return
+                except (ConnectionError, FileNotFoundError) as e:
+                    # Server went away; only retry locally if nothing was sent
+                    if streamed:
+                        raise
+                    logger.warning(f"Llama inference server unavailable ({str(e)}), loading model in-process")
+                    self.model = await asyncio.to_thread(build_llama_model)
+
             async for chunk in self.model.astream(prompt):
                 yield chunk
         except Exception as e:
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/goblin-llama.sock"
+
+# Sentinel pushed onto a subscriber queue when its generation finishes
+_DONE = object()
+
+
+def get_socket_path() -> str:
+    return os.environ.get("LLAMA_SERVER_SOCKET", DEFAULT_SOCKET_PATH)
+
+
+def build_llama_model():
+    """Load the local model with settings shared by the server and in-process mode"""
+    from langchain_community.llms import LlamaCpp
+
+    return LlamaCpp(
+        model_path=os.environ.get("LLAMA_MODEL_PATH"),
+        temperature=float(os.environ.get("LLAMA_TEMPERATURE", 0.75)),
+        max_tokens=int(os.environ.get("LLAMA_MAX_TOKENS", 2000)),
+        n_ctx=int(os.environ.get("LLAMA_N_CTX", 2048)),
+        n_threads=int(os.environ.get("LLAMA_N_THREADS", os.cpu_count())),
+        streaming=True,
+    )
+
+
+@dataclass
+class _Generation:
+    """One decode over the model, fanned out to every request that asked for it"""
+
+    prompt: str
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
+    # Set once every subscriber has disconnected; the model thread stops
+    cancelled: bool = False
+
+
+class LlamaInferenceServer:
+    """
+    Resident inference worker that owns the only copy of the local model.
+
+    Clients connect over a Unix socket and send one JSON line
+    ``{"prompt": ...}``; the server replies with ``{"token": ...}`` lines
+    followed by ``{"done": true}`` (or ``{"error": ...}``).
+
+    This is not continuous batching: LlamaCpp exposes a single sequence
+    per context, so generations run one at a time, first come first served,
+    on a dedicated thread, and a different prompt waits for the whole
+    current generation. Different prompts never share work. What is shared
+    is the loaded model, plus requests for an identical prompt that is
+    still queued, which are merged into one generation streamed to all of
+    their sockets. A client that disconnects is dropped from its
+    generation, and a generation nobody is waiting for is cancelled.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, model=None):
+        self.socket_path = socket_path or get_socket_path()
+        self.model = model
+        self._pending: Dict[str, _Generation] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.requests_served = 0
+        self.generations_run = 0
+
+    async def serve_forever(self):
+        if self.model is None:
+            logger.info("Loading local model for inference server...")
+            self.model = build_llama_model()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._wakeup = asyncio.Event()
+        server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path
+        )
+        logger.info(f"Llama inference server listening on {self.socket_path}")
+
+        try:
+            async with server:
+                await asyncio.gather(server.serve_forever(), self._scheduler())
+        finally:
+            # A leftover socket file would make clients think we're still up
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_client(self, reader, writer):
+        queue: asyncio.Queue = asyncio.Queue()
+        try:
+            line = await reader.readline()
+            if not line:
+                # Connect-and-close availability probe from a client
+                return
+            request = json.loads(line)
+            prompt = request["prompt"]
+
+            generation = self._pending.get(prompt)
+            if generation is None:
+                generation = _Generation(prompt=prompt)
+                self._pending[prompt] = generation
+            generation.subscribers.append(queue)
+            self._wakeup.set()
+
+            # The client sends nothing after its request, so EOF means it left
+            disconnected = asyncio.ensure_future(reader.read())
+            try:
+                while True:
+                    getter = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait(
+                        {getter, disconnected}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if getter not in done:
+                        getter.cancel()
+                        logger.info("Llama client disconnected before completion")
+                        return
+                    item = getter.result()
+                    if item is _DONE:
+                        writer.write(b'{"done": true}\n')
+                        break
+                    if isinstance(item, Exception):
+                        writer.write(json.dumps({"error": str(item)}).encode() + b"\n")
+                        break
+                    writer.write(json.dumps({"token": item}).encode() + b"\n")
+                    await writer.drain()
+            finally:
+                disconnected.cancel()
+                self._unsubscribe(generation, queue)
+            self.requests_served += 1
+        except Exception as e:
+            logger.error(f"Llama server client error: {str(e)}", exc_info=True)
+            writer.write(json.dumps({"error": str(e)}).encode() + b"\n")
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _scheduler(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Oldest prompt first, one generation at a time
+            while self._pending:
+                prompt = next(iter(self._pending))
+                generation = self._pending.pop(prompt)
+                self.generations_run += 1
+                if len(generation.subscribers) > 1:
+                    logger.info(
+                        f"Serving {len(generation.subscribers)} identical requests "
+                        f"with one generation ({len(self._pending)} queued)"
+                    )
+                await loop.run_in_executor(
+                    self._executor, self._run_generation, loop, generation
+                )
+
+    def _unsubscribe(self, generation: _Generation, queue: asyncio.Queue):
+        if queue in generation.subscribers:
+            generation.subscribers.remove(queue)
+        if not generation.subscribers:
+            # Nobody is waiting: drop it if still queued, stop it if running
+            if self._pending.get(generation.prompt) is generation:
+                del self._pending[generation.prompt]
+            generation.cancelled = True
+
+    @staticmethod
+    def _publish(generation: _Generation, item):
+        for queue in generation.subscribers:
+            queue.put_nowait(item)
+
+    def _run_generation(self, loop, generation: _Generation):
+        """Decode on the model thread, pushing tokens to every subscriber"""
+
+        def publish(item):
+            # Subscribers change on the event loop, so fan out there
+            loop.call_soon_threadsafe(self._publish, generation, item)
+
+        try:
+            for token in self.model.stream(generation.prompt):
+                if generation.cancelled:
+                    logger.info("All clients disconnected, stopping generation")
+                    break
+                publish(token)
+            publish(_DONE)
+        except Exception as e:
+            logger.error(f"Llama generation error: {str(e)}", exc_info=True)
+            publish(e)
+
+
+class LlamaServerClient:
+    """Streams completions from a running LlamaInferenceServer"""
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or get_socket_path()
+
+    def is_available(self, timeout: float = 0.5) -> bool:
+        """True when a server is accepting connections on the socket"""
+        if not os.path.exists(self.socket_path):
+            return False
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.settimeout(timeout)
+                probe.connect(self.socket_path)
+            return True
+        except OSError:
+            # Stale socket file left behind by a server that died
+            return False
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            writer.write(json.dumps({"prompt": prompt}).encode() + b"\n")
+            await writer.drain()
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("Llama inference server closed the stream")
+                message = json.loads(line)
+                if "token" in message:
+                    yield message["token"]
+                elif message.get("done"):
+                    return
+                else:
+                    raise RuntimeError(message.get("error", "Unknown server error"))
+        finally:
+            writer.close()
@@ -8,12 +8,26 @@ import logging
 logger = logging.getLogger(__name__)
 
 class OpenAIProvider:
-    def __init__(self):
+    supports_tools = True
+
+    def __init__(self, http_client=None, http_async_client=None):
         self.model = ChatOpenAI(
             api_key=os.environ.get("OPENAI_API_KEY"),
             model_name="gpt-4-1106-preview",
-            streaming=True
+            streaming=True,
+            http_client=http_client,
+            http_async_client=http_async_client
         )
+        self.http_clients = (http_client, http_async_client)
+        self._bound_models = {}
+
+    async def aclose(self):
+        """Close the HTTP clients this provider was built with"""
+        http_client, http_async_client = self.http_clients
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
 
     async def generate_response_stream(self, messages: List[BaseMessage]):
         try:
@@ -26,3 +40,24 @@ class OpenAIProvider:
         except Exception as e:
             logger.error(f"OpenAI streaming error: {str(e)}")
             raise
+
+    def _bind_tools(self, tools: List[Any]):
+        """Bind tools once per tool set and reuse the bound model"""
+        key = tuple(tool.name for tool in tools)
+        bound = self._bound_models.get(key)
+        if bound is None:
+            bound = self.model.bind_tools(tools)
+            self._bound_models[key] = bound
+        return bound
+
+    async def generate_message_stream(
+        self, messages: List[BaseMessage], tools: Optional[List[Any]] = None
+    ):
+        """Stream raw message chunks, including native tool call chunks"""
+        model = self._bind_tools(tools) if tools else self.model
+        try:
+            async for chunk in model.astream(messages):
+                yield chunk
+        except Exception as e:
+            logger.error(f"OpenAI streaming error: {str(e)}")
+            raise
@@ -0,0 +1,198 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import os
+import threading
+import logging
+
+import httpx
+
+from brain.providers.anthropic import AnthropicProvider
+from brain.providers.openai import OpenAIProvider
+from brain.providers.llama import LlamaProvider
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_CLASSES = {
+    "anthropic": AnthropicProvider,
+    "openai": OpenAIProvider,
+    "llama": LlamaProvider,
+}
+
+
+def create_http_clients():
+    """
+    HTTP clients for one pooled provider. Every consumer borrowing that
+    provider shares them, so keep-alive connections survive across
+    consumers and messages; the pool closes them when it evicts it.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.environ.get("AI_PROVIDER_HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(
+            os.environ.get("AI_PROVIDER_HTTP_MAX_KEEPALIVE", 20)
+        ),
+    )
+    timeout = httpx.Timeout(float(os.environ.get("AI_PROVIDER_HTTP_TIMEOUT", 600)))
+    return (
+        httpx.Client(limits=limits, timeout=timeout),
+        httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+
+def create_provider(name: str):
+    """Construct a new provider instance by name"""
+    provider_class = PROVIDER_CLASSES.get(name.lower())
+    if provider_class is None:
+        raise ValueError(f"Unsupported provider: {name}")
+
+    if provider_class in (AnthropicProvider, OpenAIProvider):
+        http_client, http_async_client = create_http_clients()
+        return provider_class(
+            http_client=http_client, http_async_client=http_async_client
+        )
+    return provider_class()
+
+
+class ProviderPool:
+    """
+    Bounded LRU cache of initialized providers keyed by provider name.
+
+    Providers are expensive to build (LlamaProvider loads a GGUF model, the
+    HTTP providers own connection pools), so consumers borrow a shared
+    instance instead of constructing one per message.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or int(os.environ.get("AI_PROVIDER_POOL_SIZE", 4))
+        self._providers: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per provider name so a slow build (e.g. loading a GGUF
+        # model) only blocks callers waiting for that same provider
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._eviction_hooks: List[Callable[[str, Any], None]] = [
+            self._close_provider
+        ]
+        # Loop the async clients are used on, for closing them from threads
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name: str):
+        """Return the pooled provider for ``name``, creating it on first use"""
+        key = name.lower()
+        provider = self._lookup(key)
+        if provider is not None:
+            return provider
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            # Another caller may have built it while we waited
+            provider = self._lookup(key)
+            if provider is not None:
+                return provider
+
+            logger.info(f"Initializing pooled provider: {key}")
+            provider = create_provider(key)
+
+            with self._lock:
+                self.misses += 1
+                self._providers[key] = provider
+                while len(self._providers) > self.max_size:
+                    evicted_key, evicted = self._providers.popitem(last=False)
+                    self._run_eviction_hooks(evicted_key, evicted)
+            return provider
+
+    async def aget(self, name: str):
+        """``get`` for async callers; a cold build runs off the event loop"""
+        self._loop = asyncio.get_running_loop()
+        provider = self._lookup(name.lower())
+        if provider is not None:
+            return provider
+        return await asyncio.to_thread(self.get, name)
+
+    def _lookup(self, key: str):
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is not None:
+                self._providers.move_to_end(key)
+                self.hits += 1
+            return provider
+
+    def evict(self, name: str) -> bool:
+        """Drop a provider from the pool; returns False if it was not pooled"""
+        key = name.lower()
+        with self._lock:
+            provider = self._providers.pop(key, None)
+            if provider is None:
+                return False
+            self._run_eviction_hooks(key, provider)
+            return True
+
+    def reload(self, name: str):
+        """Evict and rebuild a provider, e.g. after a model or key change"""
+        self.evict(name)
+        return self.get(name)
+
+    def clear(self):
+        """Evict every pooled provider"""
+        with self._lock:
+            while self._providers:
+                key, provider = self._providers.popitem(last=False)
+                self._run_eviction_hooks(key, provider)
+
+    def add_eviction_hook(self, hook: Callable[[str, Any], None]):
+        """Register a callback invoked with (name, provider) on eviction"""
+        self._eviction_hooks.append(hook)
+
+    def _close_provider(self, key: str, provider: Any):
+        """
+        Close an evicted provider's HTTP clients with its ``aclose()``. A
+        consumer still streaming from it fails that request and borrows a
+        fresh provider on its next message.
+        """
+        aclose = getattr(provider, "aclose", None)
+        if aclose is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is not None:
+            task = running.create_task(aclose())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        elif self._loop is not None and self._loop.is_running():
+            # Evicted by a build in a worker thread: close on the serving loop
+            asyncio.run_coroutine_threadsafe(aclose(), self._loop)
+        else:
+            asyncio.run(aclose())
+
+    def _run_eviction_hooks(self, key: str, provider: Any):
+        self.evictions += 1
+        logger.info(f"Evicting pooled provider: {key}")
+        for hook in self._eviction_hooks:
+            try:
+                hook(key, provider)
+            except Exception as e:
+                logger.error(f"Provider eviction hook failed for {key}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pooled": list(self._providers.keys()),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+provider_pool = ProviderPool()
+
+
+def get_provider(name: str):
+    """Borrow a shared provider instance from the process-wide pool"""
+    return provider_pool.get(name)
@@ -5,6 +5,7 @@ import numpy as np
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 import tempfile
+from brain.jestor.lib.rollups import refresh_order_rollups
 
 
 @shared_task
@@ -38,3 +39,8 @@ def ping_brain():
         ticket_description = issue["description"] 
         agent.run()
 
+
+# Keeps the per-vendor daily order rollups used by analyze_city_flavor_data fresh
+@shared_task
+def refresh_order_daily_rollups():
+    return refresh_order_rollups()
@@ -1,3 +1,552 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+
+from brain.jestor.lib import database, pool
+from brain.jestor.lib.cityflavor import ENTITY_MAP, CityFlavorQueryTool, QueryContext
+from brain.jestor.lib.database import (
+    DatabaseType,
+    QueryResult,
+    StreamingDatabaseManager,
+)
+from brain.jestor.lib.query_cache import (
+    CLOSED_RANGE_TTL,
+    OPEN_RANGE_TTL,
+    QueryResultCache,
+)
+from brain.jestor.lib.rollups import rollup_batches
+from brain.jestor.lib.time_ranges import parse_time_range
+from brain.jestor.lib.vendor_index import VendorNameIndex
+from brain.management.commands.advise_indexes import Command as AdviseIndexesCommand
+from brain.providers.llama_server import LlamaInferenceServer, LlamaServerClient
+from brain.providers.pool import ProviderPool
+
+NOW = datetime(2024, 3, 15, 14, 30)
+
+
+class TimeRangeTests(SimpleTestCase):
+    def assertRange(self, text, start, end):
+        match = parse_time_range(text, now=NOW)
+        self.assertIsNotNone(match, text)
+        self.assertEqual((match.start, match.end), (start, end))
+
+    def test_relative_days(self):
+        self.assertRange("sales today", datetime(2024, 3, 15), datetime(2024, 3, 16))
+        self.assertRange(
+            "orders yesterday", datetime(2024, 3, 14), datetime(2024, 3, 15)
+        )
+        self.assertRange(
+            "orders in the last 7 days", datetime(2024, 3, 9), datetime(2024, 3, 16)
+        )
+        self.assertRange(
+            "sales last month", datetime(2024, 2, 1), datetime(2024, 3, 1)
+        )
+
+    def test_between_dates(self):
+        self.assertRange(
+            "orders from 2024-03-01 to 2024-03-05",
+            datetime(2024, 3, 1),
+            datetime(2024, 3, 6),
+        )
+
+    def test_bare_from_runs_until_now(self):
+        self.assertRange(
+            "sales from 2024-03-01", datetime(2024, 3, 1), datetime(2024, 3, 16)
+        )
+        self.assertRange(
+            "sales since March 10th", datetime(2024, 3, 10), datetime(2024, 3, 16)
+        )
+
+    def test_span_includes_lead_word(self):
+        text = "Get total sales for Akita Sushi 1 from 2024-03-01"
+        match = parse_time_range(text, now=NOW)
+        self.assertEqual(text[match.span[0] : match.span[1]], "from 2024-03-01")
+
+    def test_rejects_empty_and_unknown_ranges(self):
+        for text in ["orders in the last 0 days", "total sales", "top vendors"]:
+            with self.subTest(text=text):
+                self.assertIsNone(parse_time_range(text, now=NOW))
+
+
+class VendorNameIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = VendorNameIndex()
+        self.index.build(
+            [
+                (1, "Sales Burger"),
+                (2, "Best Food"),
+                (3, "Order Up"),
+                (4, "Taco Truck"),
+                (5, "Akita Sushi 1"),
+                (6, "Downtown Grill"),
+            ]
+        )
+
+    def test_resolve_exact_and_fuzzy(self):
+        self.assertEqual(self.index.resolve("akita sushi 1").vendor_id, 5)
+        self.assertEqual(self.index.resolve("Taco Truk").vendor_id, 4)
+        self.assertIsNone(self.index.resolve("downtown vendors"))
+
+    def test_find_explicit_mention(self):
+        match = self.index.find_in_text("Total sales for Taco Truck last week")
+        self.assertEqual(match.vendor_id, 4)
+        match = self.index.find_in_text("How many orders at akita sushi 1 today")
+        self.assertEqual(match.vendor_id, 5)
+
+    def test_generic_questions_resolve_to_nothing(self):
+        for question in [
+            "total sales yesterday",
+            "best vendors by sales",
+            "Show order count for downtown vendors today",
+            "Which are the top taco vendors",
+            "sales for taco vendors this week",
+        ]:
+            with self.subTest(question=question):
+                self.assertIsNone(self.index.find_in_text(question))
+
+
+class QueryContextTests(SimpleTestCase):
+    def setUp(self):
+        self.tool = CityFlavorQueryTool(db_manager=None)
+
+    def test_vendor_name_stops_at_time_expression(self):
+        context = self.tool._parse_query_context(
+            "Get total orders for Akita Sushi 1 from 2024-03-01"
+        )
+        self.assertEqual(context.vendor_name, "Akita Sushi 1")
+        self.assertIsNotNone(context.time_range)
+
+    def test_time_expression_is_not_a_vendor(self):
+        for text in ["orders for the last 7 days", "orders for march"]:
+            with self.subTest(text=text):
+                context = self.tool._parse_query_context(text)
+                self.assertIsNone(context.vendor_name)
+                self.assertIsNotNone(context.time_range)
+
+    def test_vendor_before_time_expression(self):
+        for text, vendor in [
+            ("orders for Pizza Hut last 7 days", "Pizza Hut"),
+            ("orders for Pizza Hut for the last 7 days", "Pizza Hut"),
+            ("orders for Pizza Hut in march", "Pizza Hut"),
+        ]:
+            with self.subTest(text=text):
+                context = self.tool._parse_query_context(text)
+                self.assertEqual(context.vendor_name, vendor)
+                self.assertIsNotNone(context.time_range)
+
+    def test_generic_question_has_no_vendor(self):
+        self.tool.vendor_index.build([(1, "Sales Burger"), (2, "Taco Truck")])
+        context = self.tool._parse_query_context("total sales yesterday")
+        self.assertIsNone(context.vendor_name)
+        self.assertIsNone(context.vendor_id)
+
+        context = self.tool._parse_query_context(
+            "Get total sales for Taco Truck from 2024-03-01"
+        )
+        self.assertEqual((context.vendor_id, context.vendor_name), (2, "Taco Truck"))
+
+
+class FakeDatabase:
+    """Records every query and answers from ``rows(query)``"""
+
+    def __init__(self, rows=lambda query: []):
+        self.rows = rows
+        self.queries = []
+
+    async def execute_query(self, query, parameters=None, db_type=None, prepare=False):
+        self.queries.append((" ".join(query.split()), list(parameters or [])))
+        rows = self.rows(query)
+        return QueryResult(status="success", data=rows, row_count=len(rows))
+
+
+def aggregate_rows(query):
+    if "GROUPING SETS" not in query:
+        return []
+    totals = {"order_count": 3, "total_sales": 30, "average_order": 10}
+    return [
+        {"vendor_grouped": 1, "day_grouped": 1, "vendor_name": None, "day": None, **totals},
+        {"vendor_grouped": 0, "day_grouped": 1, "vendor_name": "Taco Truck", "day": None, **totals},
+        {"vendor_grouped": 1, "day_grouped": 0, "vendor_name": None, "day": NOW.date(), **totals},
+    ]
+
+
+class AggregateQueryTests(SimpleTestCase):
+    def setUp(self):
+        self.db = FakeDatabase(aggregate_rows)
+        self.tool = CityFlavorQueryTool(db_manager=self.db, use_rollups=False)
+        self.context = QueryContext(
+            main_entity="Orders",
+            related_entities=[],
+            time_range={"start": datetime(2024, 3, 1), "end": datetime(2024, 3, 8)},
+            metrics=["sales"],
+            vendor_name="Taco Truck",
+            vendor_id=2,
+        )
+
+    async def test_grouping_sets_query_and_parameters(self):
+        result = await self.tool._run_aggregate_analysis(self.context)
+        (aggregate_sql, aggregate_parameters), (sample_sql, sample_parameters) = (
+            self.db.queries
+        )
+        self.assertIn(
+            "GROUP BY GROUPING SETS ((), (main_foodtruck.name), "
+            "(DATE(main.created_at_dt)))",
+            aggregate_sql,
+        )
+        self.assertIn(
+            "WHERE main.vendor_id = %s AND main.created_at_dt >= %s "
+            "AND main.created_at_dt < %s",
+            aggregate_sql,
+        )
+        self.assertEqual(
+            aggregate_parameters, [2, datetime(2024, 3, 1), datetime(2024, 3, 8)]
+        )
+        self.assertIn("LIMIT %s", sample_sql)
+        self.assertEqual(sample_parameters, aggregate_parameters + [5])
+
+        summary = result["summary"]
+        self.assertEqual((summary["total_records"], summary["total_sales"]), (3, 30.0))
+        self.assertEqual(summary["by_vendor"][0]["vendor_name"], "Taco Truck")
+        self.assertEqual(summary["by_day"][0]["day"], "2024-03-15")
+        self.assertEqual(summary["source"], "orders")
+
+    async def test_rollup_answers_skip_the_sample_rows(self):
+        def rows(query):
+            if "refreshed_through" in query:
+                return [{"refreshed_through": datetime(2024, 3, 20)}]
+            return aggregate_rows(query)
+
+        self.db.rows = rows
+        self.tool.use_rollups = True
+        result = await self.tool._run_aggregate_analysis(self.context)
+        self.assertEqual(result["summary"]["source"], "rollup")
+        self.assertEqual(result["summary"]["sample_size"], 0)
+        self.assertFalse(any("main_order" in sql for sql, _ in self.db.queries))
+
+    def test_vendor_name_without_id_filters_by_name(self):
+        self.context.vendor_id = None
+        query, parameters = self.tool._build_aggregate_query(self.context)
+        self.assertIn("LOWER(main_foodtruck.name) = LOWER(%s)", query)
+        self.assertEqual(parameters[0], "Taco Truck")
+
+
+class FakeCursor:
+    description = [("id",), ("name",)]
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetched = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, parameters):
+        pass
+
+    def fetchmany(self, size):
+        batch = self.rows[self.fetched : self.fetched + size]
+        self.fetched += len(batch)
+        return batch
+
+
+class StreamingDatabaseManagerTests(SimpleTestCase):
+    def manager(self, row_count=25, **caps):
+        manager = StreamingDatabaseManager(batch_size=10, prefetch_batches=1, **caps)
+        self.cursor = FakeCursor([(i, f"vendor {i:03d}") for i in range(row_count)])
+        cursor = self.cursor
+
+        @contextmanager
+        def get_connection(db_type):
+            yield mock.Mock(chunked_cursor=lambda: cursor)
+
+        manager.get_connection = get_connection
+        return manager
+
+    async def test_streams_every_batch_without_caps(self):
+        manager = self.manager()
+        batches = [batch async for batch in manager.stream_query("SELECT 1")]
+        self.assertEqual([len(batch.rows) for batch in batches], [10, 10, 5])
+        self.assertEqual(batches[0].as_dicts()[0], {"id": 0, "name": "vendor 000"})
+
+    async def test_row_cap_truncates_and_stops_fetching(self):
+        manager = self.manager(row_count=1000, max_rows=12)
+        result = await manager.execute_query("SELECT 1")
+        self.assertEqual(result.row_count, 12)
+        self.assertTrue(result.truncated)
+        self.assertEqual(result.data[-1]["id"], 11)
+        # Stopped after the capped batch plus at most the prefetched ones
+        self.assertLessEqual(self.cursor.fetched, 40)
+
+    async def test_byte_cap_truncates(self):
+        # Each row is estimated at 8 (int) + 10 (name) bytes
+        result = await self.manager(max_bytes=100).execute_query(
+            "SELECT 1", columnar=True
+        )
+        self.assertEqual(result.row_count, 5)
+        self.assertTrue(result.truncated)
+        self.assertEqual(result.columnar_data[0], [0, 1, 2, 3, 4])
+        self.assertEqual(result.data, [])
+
+    async def test_pooled_databases_keep_the_pool_path(self):
+        pool_backend = mock.Mock(
+            supports=lambda db_type: True,
+            fetch=mock.AsyncMock(return_value=(["id"], [(1,), (2,)])),
+        )
+        manager = StreamingDatabaseManager(pool_backend=pool_backend)
+        result = await manager.execute_query("SELECT 1", prepare=True, columnar=True)
+        self.assertEqual(pool_backend.fetch.await_args.kwargs["prepare"], True)
+        self.assertEqual(result.columnar_data, ([1, 2],))
+
+
+@mock.patch.object(pool, "_pool_backend", None)
+@mock.patch.object(database, "_database_manager", None)
+class PoolBackendSettingTests(SimpleTestCase):
+    @override_settings(DATABASE_POOL_ENABLED=False)
+    def test_disabled_pool_is_never_used(self):
+        with mock.patch.object(pool, "AsyncConnectionPool", object):
+            self.assertIsNone(pool.get_pool_backend())
+            self.assertIsNone(database.get_database_manager().pool_backend)
+
+    @override_settings(DATABASE_POOL_ENABLED=True)
+    def test_enabled_pool_needs_psycopg(self):
+        with mock.patch.object(pool, "AsyncConnectionPool", None):
+            self.assertIsNone(pool.get_pool_backend())
+
+    @override_settings(DATABASE_POOL_ENABLED=True)
+    async def test_enabled_pool_serves_postgres_queries(self):
+        with mock.patch.object(pool, "AsyncConnectionPool", object):
+            manager = database.get_database_manager()
+        self.assertIsInstance(manager.pool_backend, pool.AsyncPoolBackend)
+        manager.pool_backend.fetch = mock.AsyncMock(return_value=(["id"], [(1,)]))
+        with mock.patch.object(pool, "AsyncConnectionPool", object):
+            result = await manager.execute_query("SELECT 1", prepare=True)
+        self.assertEqual(result.data, [{"id": 1}])
+        manager.pool_backend.fetch.assert_awaited_once_with(
+            DatabaseType.DEFAULT, "SELECT 1", None, prepare=True
+        )
+
+
+class EntityFanOutTests(SimpleTestCase):
+    def setUp(self):
+        def rows(query):
+            if "primary_cuisine" in query:
+                return [
+                    {"cuisine_grouped": 1, "primary_cuisine": None, "vendor_count": 2},
+                    {"cuisine_grouped": 0, "primary_cuisine": "tacos", "vendor_count": 2},
+                ]
+            if "FROM main_foodtruck" in query:
+                return [{"id": 2, "name": "Taco Truck"}]
+            return aggregate_rows(query)
+
+        self.db = FakeDatabase(rows)
+        self.tool = CityFlavorQueryTool(db_manager=self.db, use_rollups=False)
+
+    async def test_orders_stay_the_response_with_vendors_fanned_out(self):
+        result = await self.tool.analyze_data("total sales and vendor count last 7 days")
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(
+            set(result), {"status", "data", "summary", "message", "entities"}
+        )
+        self.assertEqual(result["summary"]["total_sales"], 30.0)
+        self.assertEqual(list(result["entities"]), ["Vendors"])
+        self.assertEqual(result["entities"]["Vendors"]["total_records"], 2)
+
+    async def test_orders_only_question_has_no_entities(self):
+        result = await self.tool.analyze_data("total sales last 7 days")
+        self.assertEqual(set(result), {"status", "data", "summary", "message"})
+        self.assertEqual(result["summary"]["total_records"], 3)
+
+
+class RollupBatchTests(SimpleTestCase):
+    def test_backfill_is_split_into_bounded_batches(self):
+        batches = list(rollup_batches(date(2024, 1, 1), NOW, batch_days=31))
+        self.assertEqual(batches[0], (date(2024, 1, 1), date(2024, 2, 1)))
+        self.assertEqual(len(batches), 3)
+        # Contiguous, and the last batch includes today
+        for (_, end_day), (first_day, _) in zip(batches, batches[1:]):
+            self.assertEqual(end_day, first_day)
+        self.assertGreater(batches[-1][1], NOW.date())
+
+    def test_incremental_refresh_is_one_batch(self):
+        batches = list(rollup_batches(date(2024, 3, 13), NOW, batch_days=31))
+        self.assertEqual(batches, [(date(2024, 3, 13), date(2024, 4, 13))])
+
+    def test_no_orders_means_no_batches(self):
+        self.assertEqual(list(rollup_batches(None, NOW, batch_days=31)), [])
+
+
+class QueryResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = QueryResultCache()
+        # Local level only
+        self.cache._get_redis = lambda: None
+
+    def context(self, vendor_name=None, start=None, end=None, metrics=None):
+        time_range = {"start": start, "end": end} if start else None
+        return QueryContext(
+            main_entity="orders",
+            related_entities=[],
+            time_range=time_range,
+            filters={},
+            metrics=metrics or ["total_amount"],
+            vendor_name=vendor_name,
+        )
+
+    def test_equivalent_contexts_share_a_key(self):
+        self.assertEqual(
+            self.cache.key_for(self.context("Taco  Truck", metrics=["a", "b"])),
+            self.cache.key_for(self.context("taco truck", metrics=["b", "a"])),
+        )
+
+    def test_different_contexts_get_different_keys(self):
+        keys = {
+            self.cache.key_for(context)
+            for context in [
+                self.context(),
+                self.context("Taco Truck"),
+                self.context("Akita Sushi 1"),
+                self.context("Taco Truck", NOW, NOW + timedelta(days=1)),
+                self.context("Taco Truck", metrics=["order_count"]),
+            ]
+        }
+        self.assertEqual(len(keys), 5)
+
+    def test_ttl_depends_on_whether_range_is_closed(self):
+        past = datetime.now() - timedelta(days=2)
+        closed = self.context(start=past, end=past + timedelta(days=1))
+        self.assertEqual(self.cache.ttl_for(closed), CLOSED_RANGE_TTL)
+
+        open_range = self.context(start=past, end=datetime.now() + timedelta(hours=1))
+        self.assertEqual(self.cache.ttl_for(open_range), OPEN_RANGE_TTL)
+        self.assertEqual(self.cache.ttl_for(self.context()), OPEN_RANGE_TTL)
+
+    async def test_hits_and_misses_are_counted(self):
+        context = self.context("Taco Truck")
+        self.assertIsNone(await self.cache.get(context))
+        await self.cache.set(context, {"status": "success", "total": 3})
+        self.assertEqual(await self.cache.get(context), {"status": "success", "total": 3})
+        stats = self.cache.stats()
+        self.assertEqual((stats["local_hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+
+class AdviseIndexesTests(SimpleTestCase):
+    def explain(self, analyze):
+        cursor = mock.MagicMock()
+        cursor.fetchone.return_value = [[{"Plan": {}}]]
+        connection = mock.MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+        AdviseIndexesCommand()._explain(connection, "SELECT 1", [], analyze)
+        return cursor.execute.call_args.args[0]
+
+    def test_explain_runs_queries_only_with_analyze(self):
+        self.assertEqual(self.explain(False), "EXPLAIN (FORMAT JSON) SELECT 1")
+        self.assertEqual(
+            self.explain(True), "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT 1"
+        )
+
+    def test_seq_scans_become_a_sql_script(self):
+        command = AdviseIndexesCommand()
+        plan = {
+            "Plan": {
+                "Node Type": "Seq Scan",
+                "Relation Name": "main_order",
+                "Filter": "(created_at_dt >= '2024-03-01')",
+                "Plan Rows": 500,
+                "Total Cost": 12.5,
+            }
+        }
+        context = QueryContext(
+            main_entity="Orders",
+            related_entities=[],
+            time_range={"start": NOW, "end": NOW},
+        )
+        suggestions = command._report("orders.aggregate[time]", plan, ENTITY_MAP, context)
+        script = command._sql_script(suggestions)
+        self.assertIn(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS main_order_created_at_dt_idx "
+            "ON main_order (created_at_dt);",
+            script,
+        )
+        self.assertIn("not managed by this project's migrations", script)
+
+
+@mock.patch.dict("os.environ", {"ANTHROPIC_API_KEY": "test", "OPENAI_API_KEY": "test"})
+class ProviderPoolTests(SimpleTestCase):
+    async def test_anthropic_uses_pooled_http_clients(self):
+        provider = await ProviderPool().aget("anthropic")
+        http_client, http_async_client = provider.http_clients
+        self.assertIs(provider.model._client._client, http_client)
+        self.assertIs(provider.model._async_client._client, http_async_client)
+
+    async def test_evicted_provider_clients_are_closed(self):
+        pool = ProviderPool(max_size=1)
+        evicted = await pool.aget("anthropic")
+        kept = await pool.aget("openai")
+        await asyncio.sleep(0.05)
+        self.assertTrue(all(client.is_closed for client in evicted.http_clients))
+        self.assertFalse(any(client.is_closed for client in kept.http_clients))
+        self.assertEqual(pool.stats()["pooled"], ["openai"])
+
+
+class FakeLlama:
+    def __init__(self, tokens=20, delay=0.01):
+        self.tokens, self.delay = tokens, delay
+        self.produced = 0
+
+    def stream(self, prompt):
+        for index in range(self.tokens):
+            time.sleep(self.delay)
+            self.produced += 1
+            yield f"{prompt}{index} "
+
+
+class LlamaInferenceServerTests(SimpleTestCase):
+    async def start_server(self):
+        self.socket_path = os.path.join(tempfile.mkdtemp(), "llama.sock")
+        self.model = FakeLlama()
+        self.server = LlamaInferenceServer(self.socket_path, model=self.model)
+        self.task = asyncio.create_task(self.server.serve_forever())
+        self.client = LlamaServerClient(self.socket_path)
+        while not self.client.is_available():
+            await asyncio.sleep(0.01)
+
+    async def stop_server(self):
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+    async def test_streams_every_token(self):
+        await self.start_server()
+        try:
+            tokens = [token async for token in self.client.stream("a")]
+            self.assertEqual(len(tokens), 20)
+            self.assertEqual(self.server.requests_served, 1)
+        finally:
+            await self.stop_server()
+
+    async def test_disconnected_client_cancels_its_generation(self):
+        await self.start_server()
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            writer.write(b'{"prompt": "a"}\n')
+            await reader.readline()
+            writer.close()
+            # Long enough for the whole generation had it kept running
+            await asyncio.sleep(self.model.tokens * self.model.delay * 2)
+            self.assertLess(self.model.produced, self.model.tokens)
+            self.assertEqual(self.server.requests_served, 0)
+
+            # The server keeps serving later requests
+            tokens = [token async for token in self.client.stream("b")]
+            self.assertEqual(len(tokens), 20)
+        finally:
+            await self.stop_server()
@@ -10,5 +10,6 @@ router.register(r'groups', views.GroupViewSet, basename='groups')
 urlpatterns = [
     path("", include(router.urls)),
     path("", views.index, name="index"),
+    path("api/metrics/", views.query_metrics, name="query_metrics"),
 ]
 
@@ -1,5 +1,5 @@
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib.auth.models import Group, User
 from rest_framework import permissions, viewsets
 from brain.serializers import GroupSerializer, UserSerializer
@@ -7,6 +7,8 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from brain.models import TranscriptionSession, AudioChunk
+from brain.jestor.lib.cityflavor import get_city_flavor_query_tool
+from brain.jestor.lib.pool import get_pool_backend
 import base64
 
 
@@ -14,6 +16,19 @@ def index(request):
     return HttpResponse("Hello, world. You're at the polls index.")
 
 
+def query_metrics(request):
+    """Query cache, prepared template and database pool statistics"""
+    tool = get_city_flavor_query_tool()
+    pool_backend = get_pool_backend()
+    return JsonResponse(
+        {
+            "query_cache": tool.cache.stats(),
+            "query_templates": tool.templates.stats(),
+            "database_pools": pool_backend.metrics() if pool_backend else {},
+        }
+    )
+
+
 class UserViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
@@ -1,24 +1,33 @@
 import json
 import logging
 import os
-import re
+import time
 import asyncio
-from typing import Dict, Any, List, Optional, Sequence, TypedDict
-from langsmith import trace
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence, Tuple, TypedDict
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.db import OperationalError, connection
 from pydantic import BaseModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_anthropic import ChatAnthropic
 from langchain.tools import StructuredTool
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from langchain_core.output_parsers import StrOutputParser
-from langgraph.graph import StateGraph, END
-
-from brain.jestor.lib.database import DatabaseManager
-from brain.jestor.lib.cityflavor import CityFlavorQueryTool
-from brain.providers import anthropic, openai, llama
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph
+
+from brain.instrumentation import (
+    WEBSOCKET_SEND,
+    message_timing,
+    timed_stage,
+    traced,
+)
+from brain.jestor.lib.cityflavor import get_city_flavor_query_tool
+from brain.providers.pool import provider_pool
+from ears.streaming import StreamCoalescer
+from ears.tool_engine import ToolCallEngine
+from ears.memory import ConversationMemory
 
 LANGCHAIN_TRACING_V2 = True
 LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
@@ -51,40 +60,103 @@ class ToolRegistry:
         self, name: str, func, description: str, args_schema: type[BaseModel]
     ):
         """Register a tool using LangChain's StructuredTool"""
-        self._tools[name] = StructuredTool.from_function(
-            func=func, name=name, description=description, args_schema=args_schema
-        )
+        if asyncio.iscoroutinefunction(func):
+            self._tools[name] = StructuredTool.from_function(
+                coroutine=func,
+                name=name,
+                description=description,
+                args_schema=args_schema,
+            )
+        else:
+            self._tools[name] = StructuredTool.from_function(
+                func=func, name=name, description=description, args_schema=args_schema
+            )
+
+    def get_tool(self, name: str) -> Optional[StructuredTool]:
+        """Get a registered tool by name"""
+        return self._tools.get(name)
 
     def get_tools(self) -> List[StructuredTool]:
         """Get all registered tools"""
         return list(self._tools.values())
 
+    def signature(self) -> Tuple[str, ...]:
+        """Stable identifier for the registered tool set"""
+        return tuple(sorted(self._tools.keys()))
+
+
+class ConnectLatencyMetrics:
+    """Rolling connect-latency samples for ChatConsumer"""
+
+    def __init__(self, max_samples: int = 1000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.total_connections = 0
+
+    def record(self, seconds: float):
+        """Record the time from consumer construction to accepted socket"""
+        with self._lock:
+            self._samples.append(seconds)
+            self.total_connections += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return count and percentiles (in milliseconds) of recent connects"""
+        with self._lock:
+            samples = sorted(self._samples)
+            total = self.total_connections
+
+        def percentile(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            index = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+            return round(samples[index] * 1000, 3)
+
+        return {
+            "total_connections": total,
+            "samples": len(samples),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 3) if samples else None,
+        }
 
-class ChatConsumer(AsyncWebsocketConsumer):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        try:
-            # Initialize components
-            self.tool_registry = ToolRegistry()
-            self._register_default_tools()
-
-            # Initialize AI provider based on configuration
-            provider_name = os.environ.get("AI_PROVIDER", "anthropic")
-
-            if provider_name.lower() == "anthropic":
-                self.provider = anthropic.AnthropicProvider()
-            elif provider_name.lower() == "openai":
-                self.provider = openai.OpenAIProvider()
-            elif provider_name.lower() == "llama":
-                self.provider = llama.LlamaProvider()
-            else:
-                raise ValueError(f"Unsupported provider: {provider_name}")
 
-            # Create and compile the workflow
-            with trace(
-                name="Graph Initialization", project_name=LANGCHAIN_PROJECT
+class GraphRegistry:
+    """
+    Process-wide registry of compiled chat workflows.
+
+    The workflow is built, validated and compiled once per (provider, tool-set)
+    key. Consumers share the compiled app and pass their per-session state
+    (provider instance, send callback) through the invoke config.
+    """
+
+    def __init__(self):
+        self._apps = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_app(self, provider_name: str, tool_registry: ToolRegistry):
+        """Return the compiled app for this key, compiling it on first use"""
+        key = (provider_name.lower(), tool_registry.signature())
+        app = self._lookup(key)
+        if app is not None:
+            return app
+
+        with self._lock:
+            app = self._lookup(key)
+            if app is not None:
+                return app
+
+            with self._stats_lock:
+                self.misses += 1
+            with traced(
+                name="Graph Initialization",
+                project_name=LANGCHAIN_PROJECT,
+                metadata={"provider": key[0], "tools": list(key[1])},
             ) as tracer:
-                graph = self._create_graph()
+                graph = _create_graph(tool_registry)
                 if graph is None:
                     raise ValueError("Failed to create graph")
 
@@ -92,177 +164,236 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 validation_result = graph.validate()
                 logger.info(f"Graph validation result: {validation_result}")
 
-                self.graph = graph
-                self.app = self.graph.compile()
-                logger.info("Graph compiled successfully")
+                app = graph.compile()
+                logger.info(f"Graph compiled successfully for {key}")
+
+            self._apps[key] = app
+            return app
+
+    async def aget_app(self, provider_name: str, tool_registry: ToolRegistry):
+        """``get_app`` for async callers; a cold compile runs off the event loop"""
+        app = self._lookup((provider_name.lower(), tool_registry.signature()))
+        if app is not None:
+            return app
+        return await asyncio.to_thread(self.get_app, provider_name, tool_registry)
+
+    def _lookup(self, key):
+        app = self._apps.get(key)
+        if app is not None:
+            # Counted under a lock of its own so hits aren't lost, without
+            # waiting behind a compile holding _lock
+            with self._stats_lock:
+                self.hits += 1
+        return app
+
+    def clear(self):
+        """Drop all compiled apps so the next request recompiles them"""
+        with self._lock:
+            self._apps.clear()
 
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "compiled": len(self._apps),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+graph_registry = GraphRegistry()
+connect_metrics = ConnectLatencyMetrics()
+
+
+def _create_graph(tool_registry: ToolRegistry) -> StateGraph:
+    """
+    Create the LangGraph workflow.
+
+    The graph holds no per-connection state: the node reads the provider and
+    the consumer's send callback from ``config["configurable"]``.
+    """
+    try:
+        logger.info("Starting graph creation...")
+
+        graph = StateGraph(AgentState)
+        logger.info("StateGraph initialized")
+
+        try:
+            # Update the system prompt to be more explicit about tool usage
+            prompt = ChatPromptTemplate.from_messages(
+                [
+                    (
+                        "system",
+                        """You are an AI assistant with DIRECT access to a food vendor database through the analyze_city_flavor_data tool.
+
+                CRITICAL INSTRUCTIONS:
+                1. You MUST use the analyze_city_flavor_data tool for EVERY data-related question
+                2. NEVER say you don't have access to data
+                3. NEVER respond without using the tool for data queries
+                4. If the tool returns no data, explain that to the user but don't claim you can't access data
+                5. When a question needs several independent lookups, call the tool for each of them in the same turn
+
+                After getting tool results:
+                1. Always explain the data in clear, natural language
+                2. Highlight key metrics and trends
+                3. Offer to analyze additional aspects if relevant
+                """,
+                    ),
+                    MessagesPlaceholder(variable_name="messages"),
+                ]
+            )
+            logger.info("Prompt template created successfully")
         except Exception as e:
-            logger.error("Error during ChatConsumer initialization", exc_info=True)
+            logger.error(f"Failed to create prompt template: {str(e)}")
             raise
 
-    def _create_graph(self) -> StateGraph:
-        """Create the LangGraph workflow"""
-        try:
-            logger.info("Starting graph creation...")
-
-            if not hasattr(self, "provider") or self.provider is None:
-                raise ValueError("AI provider not properly initialized")
-
-            graph = StateGraph(AgentState)
-            logger.info("StateGraph initialized")
-
-            try:
-                # Update the system prompt to be more explicit about tool usage
-                prompt = ChatPromptTemplate.from_messages(
-                    [
-                        (
-                            "system",
-                            """You are an AI assistant with DIRECT access to a food vendor database through the analyze_city_flavor_data tool.
-
-                    CRITICAL INSTRUCTIONS:
-                    1. You MUST use the analyze_city_flavor_data tool for EVERY data-related question
-                    2. NEVER say you don't have access to data
-                    3. NEVER respond without using the tool for data queries
-                    4. If the tool returns no data, explain that to the user but don't claim you can't access data
-                    
-                    Tool Usage Format:
-                    <tool>analyze_city_flavor_data("your specific query")</tool>
-
-                    Example Queries:
-                    - <tool>analyze_city_flavor_data("Get total sales for Akita Sushi 1 from 2024-03-01")</tool>
-                    - <tool>analyze_city_flavor_data("Show order count for downtown vendors today")</tool>
-                    - <tool>analyze_city_flavor_data("Compare sales metrics for Fries First between yesterday and today")</tool>
-
-                    After getting tool results:
-                    1. Always explain the data in clear, natural language
-                    2. Highlight key metrics and trends
-                    3. Offer to analyze additional aspects if relevant
-                    """,
-                        ),
-                        MessagesPlaceholder(variable_name="messages"),
-                    ]
-                )
-                logger.info("Prompt template created successfully")
-            except Exception as e:
-                logger.error(f"Failed to create prompt template: {str(e)}")
-                raise
-
-            # Define the processing node
-            async def process_message(state: AgentState) -> AgentState:
-                """Process message node with tracing"""
-                with trace(
-                    name="Process Message Node", project_name=LANGCHAIN_PROJECT
-                ) as node_tracer:
+        tool_engine = ToolCallEngine(tool_registry, project_name=LANGCHAIN_PROJECT)
+
+        # Define the processing node
+        async def process_message(
+            state: AgentState, config: RunnableConfig
+        ) -> AgentState:
+            """Process message node with tracing"""
+            with traced(
+                name="Process Message Node", project_name=LANGCHAIN_PROJECT
+            ) as node_tracer:
+                try:
+                    configurable = config.get("configurable", {})
+                    provider = configurable.get("provider")
+                    send = configurable.get("send")
+                    if provider is None or send is None:
+                        raise ValueError("AI provider not properly initialized")
+
+                    # Stream the answer, running native tool calls as they arrive
+                    coalescer = StreamCoalescer(send)
                     try:
-                        # Analyze the input to ensure we're using the tool
-                        user_message = state["messages"][-1].content
-                        if any(
-                            keyword in user_message.lower()
-                            for keyword in [
-                                "sales",
-                                "revenue",
-                                "orders",
-                                "metrics",
-                                "trends",
-                                "performance",
-                            ]
-                        ):
-                            # Format tool call if not already formatted
-                            if not "<tool>" in user_message:
-                                formatted_query = f'<tool>analyze_city_flavor_data("{user_message}")</tool>'
-                                state["messages"].append(
-                                    HumanMessage(content=formatted_query)
-                                )
-
-                        # Build complete response from stream
-                        response_content = ""
-                        async for chunk in self.provider.generate_response_stream(
-                            state["messages"]
-                        ):
-                            response_content += chunk
-                            await self.send(
-                                json.dumps(
-                                    {
-                                        "type": "chat_message_chunk",
-                                        "message": chunk,
-                                        "is_complete": False,
-                                    }
-                                )
-                            )
-
-                        state["messages"].append(AIMessage(content=response_content))
-
-                        # Check for tool calls
-                        tool_match = re.search(
-                            r"<tool>(.*?)\((.*?)\)</tool>", response_content
-                        )
-                        if tool_match:
-                            tool_name = tool_match.group(1)
-                            tool_args = {
-                                "query_description": tool_match.group(2).strip("\"'")
-                            }
-
-                            with trace(
-                                name="Tool Execution",
-                                project_name=LANGCHAIN_PROJECT,
-                                metadata={"tool_name": tool_name},
-                            ):
-                                result = await self._handle_city_flavor_data_analysis(
-                                    **tool_args
-                                )
-                                state["messages"].append(
-                                    HumanMessage(content=f"Tool result: {str(result)}")
-                                )
-
-                                # Get final response with streaming
-                                final_content = ""
-                                async for (
-                                    chunk
-                                ) in self.provider.generate_response_stream(
-                                    state["messages"]
-                                ):
-                                    final_content += chunk
-                                    await self.send(
-                                        json.dumps(
-                                            {
-                                                "type": "chat_message_chunk",
-                                                "message": chunk,
-                                                "is_complete": False,
-                                            }
-                                        )
-                                    )
-                                state["messages"].append(
-                                    AIMessage(content=final_content)
-                                )
-
-                        return state
-
-                    except Exception as e:
-                        logger.error(
-                            f"Error in process_message: {str(e)}", exc_info=True
+                        new_messages = await tool_engine.run(
+                            provider, state["messages"], coalescer.push
                         )
-                        state["messages"].append(AIMessage(content=f"Error: {str(e)}"))
-                        return state
+                    finally:
+                        # Also on failure, so no flush timer fires after the turn
+                        await coalescer.flush()
+                    state["messages"].extend(new_messages)
+                    state["tool_calls"].extend(
+                        call
+                        for message in new_messages
+                        for call in getattr(message, "tool_calls", None) or []
+                    )
+                    return state
+
+                except Exception as e:
+                    logger.error(f"Error in process_message: {str(e)}", exc_info=True)
+                    state["messages"].append(AIMessage(content=f"Error: {str(e)}"))
+                    return state
+
+        # Add the node to the graph
+        graph.add_node("process_message", process_message)
+        logger.info("Node 'process_message' added")
+
+        # Set the entry point
+        graph.set_entry_point("process_message")
+        logger.info("Entry point set to 'process_message'")
+
+        return graph
+
+    except Exception as e:
+        logger.error(f"Error creating graph: {str(e)}", exc_info=True)
+        raise ValueError(f"Failed to create graph: {str(e)}")
+
+
+async def _handle_city_flavor_data_analysis(query_description: str) -> Dict[str, Any]:
+    """Handler for analyzing city flavor data"""
+    with traced(
+        name="City Flavor Analysis",
+        project_name=LANGCHAIN_PROJECT,
+        metadata={"query": query_description},
+    ) as analysis_tracer:
+        try:
+            city_flavor_query_tool = get_city_flavor_query_tool()
+            results = await city_flavor_query_tool.analyze_data(query_description)
+
+            if results["status"] == "success":
+                response = {
+                    "status": "success",
+                    "data": results.get("data", []),
+                    "summary": results.get("summary", {}),
+                    "message": "Analysis completed successfully",
+                }
+                if "entities" in results:
+                    response["entities"] = results["entities"]
+                return response
+            else:
+                return {
+                    "status": "error",
+                    "message": results.get("message", "Unknown error"),
+                }
+        except Exception as e:
+            logger.error("Analysis error", exc_info=True)
+            return {"status": "error", "message": str(e)}
+
+
+@lru_cache(maxsize=None)
+def get_default_tool_registry() -> ToolRegistry:
+    """Build the default tool set once per process"""
+    tool_registry = ToolRegistry()
+    try:
+        logger.info("Registering default tools...")
+        tool_registry.register_tool(
+            name="analyze_city_flavor_data",
+            func=_handle_city_flavor_data_analysis,
+            description="""
+            Analyze food vendor program data:
+            - Orders: Search by date, vendor, location
+            - Vendors: Get performance metrics
+            - Locations: View activity trends
+            - Shifts: Check schedules and metrics
+            """,
+            args_schema=AnalyzeDataSchema,
+        )
+        logger.info("Tool 'analyze_city_flavor_data' registered successfully")
+    except Exception as e:
+        logger.error(f"Error registering tools: {str(e)}", exc_info=True)
+    return tool_registry
+
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_started = time.perf_counter()
+        try:
+            # Shared across every connection in this process
+            self.tool_registry = get_default_tool_registry()
 
-            # Add the node to the graph
-            graph.add_node("process_message", process_message)
-            logger.info("Node 'process_message' added")
+            # Borrowed from the shared pool in connect(), off the event loop
+            self.provider_name = os.environ.get("AI_PROVIDER", "anthropic")
+            self.provider = None
 
-            # Set the entry point
-            graph.set_entry_point("process_message")
-            logger.info("Entry point set to 'process_message'")
+            # Compiled once per (provider, tool-set) and shared; the first
+            # connection compiles it in connect(), off the event loop
+            self.app = None
 
-            return graph
+            # Conversation history for this socket, persisted per turn
+            self.memory = ConversationMemory()
 
         except Exception as e:
-            logger.error(f"Error creating graph: {str(e)}", exc_info=True)
-            raise ValueError(f"Failed to create graph: {str(e)}")
+            logger.error("Error during ChatConsumer initialization", exc_info=True)
+            raise
 
     async def connect(self):
         """Handle WebSocket connection setup"""
         try:
             await database_sync_to_async(self.test_db_connection)()
+            self.provider = await provider_pool.aget(self.provider_name)
+            self.app = await graph_registry.aget_app(
+                self.provider_name, self.tool_registry
+            )
+            # Load the vendor index in the background so it is usually ready
+            # by the first question; needs this event loop and the database,
+            # so it can't happen in AppConfig.ready()
+            self._warm_up = asyncio.create_task(
+                get_city_flavor_query_tool().warm_up()
+            )
             await self.accept()
+            connect_metrics.record(time.perf_counter() - self._init_started)
             await self.send(
                 json.dumps({"type": "connection_status", "status": "connected"})
             )
@@ -277,18 +408,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message = data["message"]
             project = data["project"]
             provider = data["provider"]
-            print(provider)
-            print(project)
-            print(message)
-
-            if provider.lower() == "anthropic":
-                self.provider = anthropic.AnthropicProvider()
-            elif provider.lower() == "openai":
-                self.provider = openai.OpenAIProvider()
-            elif provider.lower() == "llama":
-                self.provider = llama.LlamaProvider()
-            else:
-                raise ValueError(f"Unsupported provider: {provider}")
+            logger.debug(f"Chat message for {provider} in project {project}: {message}")
+
+            self.provider = await provider_pool.aget(provider)
+            self.app = await graph_registry.aget_app(provider, self.tool_registry)
 
             # Initialize state with system prompt
             system_prompt = f"""
@@ -303,92 +426,68 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             """
 
-            state = AgentState(
-                messages=[
-                    HumanMessage(content=system_prompt),
-                    HumanMessage(content=message),
-                ],
-                tool_calls=[],
-                next_step="process_message",
-            )
+            with message_timing(
+                channel=self.channel_name, provider=provider, project=project
+            ):
+                # Resume the client's conversation (or start one) and build the
+                # context from the in-memory window instead of a single message
+                await self.memory.load(data.get("conversation_id"), title=message[:200])
+                messages = self.memory.build_messages(system_prompt, message)
+                context_length = len(messages)
+
+                state = AgentState(
+                    messages=messages,
+                    tool_calls=[],
+                    next_step="process_message",
+                )
 
-            with trace(
-                name="Chat Conversation",
-                project_name=LANGCHAIN_PROJECT,
-                metadata={
-                    "channel_name": self.channel_name,
-                    "message_type": "user_input",
-                },
-            ) as conversation_tracer:
-                final_state = await self.app.ainvoke(
-                    state,
-                    config={
-                        "recursion_limit": 10,
-                        "metadata": {"session_id": self.channel_name},
+                with traced(
+                    name="Chat Conversation",
+                    project_name=LANGCHAIN_PROJECT,
+                    metadata={
+                        "channel_name": self.channel_name,
+                        "message_type": "user_input",
                     },
+                ) as conversation_tracer:
+                    final_state = await self.app.ainvoke(
+                        state,
+                        config={
+                            "recursion_limit": 10,
+                            "metadata": {"session_id": self.channel_name},
+                            "configurable": {
+                                "provider": self.provider,
+                                "send": self.send_frame,
+                            },
+                        },
+                    )
+
+                await self.memory.record_turn(
+                    message, final_state["messages"][context_length:]
                 )
 
-            # Send completion message
-            await self.send(
-                json.dumps(
-                    {"type": "chat_message_chunk", "message": "", "is_complete": True}
+                # Send completion message
+                await self.send_frame(
+                    json.dumps(
+                        {
+                            "type": "chat_message_chunk",
+                            "message": "",
+                            "is_complete": True,
+                            "conversation_id": self.memory.conversation_id,
+                        }
+                    )
                 )
-            )
+
+            self.memory.summarize_in_background(self.provider)
 
         except Exception as e:
             logger.error("Message processing error", exc_info=True)
             logger.error(str(e), exc_info=True)
             await self.send(json.dumps({"type": "error", "message": str(e)}))
 
-    def _register_default_tools(self):
-        """Register default tools"""
-        try:
-            logger.info("Registering default tools...")
-            self.tool_registry.register_tool(
-                name="analyze_city_flavor_data",
-                func=self._handle_city_flavor_data_analysis,
-                description="""
-                Analyze food vendor program data:
-                - Orders: Search by date, vendor, location
-                - Vendors: Get performance metrics
-                - Locations: View activity trends
-                - Shifts: Check schedules and metrics
-                """,
-                args_schema=AnalyzeDataSchema,
-            )
-            logger.info("Tool 'analyze_city_flavor_data' registered successfully")
-        except Exception as e:
-            logger.error(f"Error registering tools: {str(e)}", exc_info=True)
-
-    async def _handle_city_flavor_data_analysis(
-        self, query_description: str
-    ) -> Dict[str, Any]:
-        """Handler for analyzing city flavor data"""
-        with trace(
-            name="City Flavor Analysis",
-            project_name=LANGCHAIN_PROJECT,
-            metadata={"query": query_description},
-        ) as analysis_tracer:
-            try:
-                db_manager = DatabaseManager()
-                city_flavor_query_tool = CityFlavorQueryTool(db_manager)
-                results = await city_flavor_query_tool.analyze_data(query_description)
-
-                if results["status"] == "success":
-                    return {
-                        "status": "success",
-                        "data": results.get("data", []),
-                        "summary": results.get("summary", {}),
-                        "message": "Analysis completed successfully",
-                    }
-                else:
-                    return {
-                        "status": "error",
-                        "message": results.get("message", "Unknown error"),
-                    }
-            except Exception as e:
-                logger.error("Analysis error", exc_info=True)
-                return {"status": "error", "message": str(e)}
+    async def send_frame(self, text_data: str):
+        """Send a chat frame, timing the WebSocket write for this message"""
+        with timed_stage(WEBSOCKET_SEND):
+            await self.send(text_data)
 
     def test_db_connection(self):
         """Test database connection"""
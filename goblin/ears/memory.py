@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+import uuid
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from channels.db import database_sync_to_async
+from django.db import transaction
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from brain.models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 6000
+DEFAULT_HISTORY_LIMIT = 50
+# Stored tool results are cut to this many characters; the facts a
+# follow-up needs are at the top of the serialized result
+DEFAULT_TOOL_RESULT_CHARS = 2000
+
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.info("tiktoken unavailable, estimating tokens from characters")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, or estimate at ~4 characters per token"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _message_tokens(message: BaseMessage) -> int:
+    content = message.content
+    if not isinstance(content, str):
+        content = str(content)
+    tokens = count_tokens(content)
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += count_tokens(str(call.get("args", "")))
+    return tokens
+
+
+def _parse_session_id(conversation_id) -> Optional[uuid.UUID]:
+    """The client's conversation_id as a UUID, or None when absent or invalid"""
+    if not conversation_id:
+        return None
+    try:
+        return uuid.UUID(str(conversation_id))
+    except ValueError:
+        logger.warning(f"Ignoring invalid conversation_id: {conversation_id!r}")
+        return None
+
+
+@database_sync_to_async
+def _get_or_create_conversation(
+    session_id: Optional[uuid.UUID], title: Optional[str]
+) -> Tuple[Conversation, List[Tuple[str, str]], str]:
+    conversation = None
+    if session_id is not None:
+        conversation = Conversation.objects.filter(session_id=session_id).first()
+    if conversation is None:
+        return Conversation.objects.create(title=title), [], ""
+
+    limit = int(os.environ.get("EARS_MEMORY_HISTORY_LIMIT", DEFAULT_HISTORY_LIMIT))
+    rows = list(
+        conversation.messages.exclude(role="system")
+        .order_by("-datetime_created", "-pk")
+        .values_list("role", "content")[:limit]
+    )
+    summary = (
+        conversation.messages.filter(role="system")
+        .values_list("content", flat=True)
+        .last()
+    )
+    return conversation, rows[::-1], summary or ""
+
+
+@database_sync_to_async
+def _save_messages(conversation: Conversation, rows: List[Tuple[str, str]]):
+    # Message is a multi-table child of GoblinModel, which bulk_create
+    # doesn't support
+    with transaction.atomic():
+        for role, content in rows:
+            Message.objects.create(conversation=conversation, role=role, content=content)
+
+
+def _stored_rows(message: str, new_messages: List[BaseMessage]) -> List[Tuple[str, str]]:
+    """A turn as (role, content) rows: the question, AI text and tool results"""
+    limit = int(
+        os.environ.get("EARS_MEMORY_TOOL_RESULT_CHARS", DEFAULT_TOOL_RESULT_CHARS)
+    )
+    rows = [("user", message)]
+    for new_message in new_messages:
+        content = new_message.content
+        if not isinstance(content, str) or not content:
+            continue
+        if isinstance(new_message, ToolMessage):
+            if len(content) > limit:
+                content = f"{content[:limit]}\n... (truncated)"
+            rows.append(("tool", content))
+        elif isinstance(new_message, AIMessage):
+            rows.append(("assistant", content))
+    return rows
+
+
+def _stored_message(role: str, content: str) -> BaseMessage:
+    if role == "user":
+        return HumanMessage(content=content)
+    if role == "tool":
+        # The tool call it answered isn't stored, so replay it as plain text
+        return HumanMessage(content=f"Tool result: {content}")
+    return AIMessage(content=content)
+
+
+@database_sync_to_async
+def _save_summary(conversation: Conversation, summary: str):
+    # Rolling summaries are stored as the conversation's system message
+    Message.objects.filter(conversation=conversation, role="system").delete()
+    Message.objects.create(conversation=conversation, role="system", content=summary)
+
+
+class ConversationMemory:
+    """
+    Per-session chat memory backed by the Conversation/Message models.
+
+    Turns (a user message plus every AI and tool message it produced) are
+    kept in memory so follow-up questions see earlier tool results without
+    re-querying. When the window exceeds the token budget the oldest turns
+    are folded into a rolling summary, generated off the response path.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.token_budget = token_budget or int(
+            os.environ.get("EARS_CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+        )
+        self.conversation: Optional[Conversation] = None
+        self.turns: List[List[BaseMessage]] = []
+        self.summary = ""
+        self._turn_tokens: List[int] = []
+        self._window_tokens = 0
+        self._evicted: List[List[BaseMessage]] = []
+        self._summary_task: Optional[asyncio.Task] = None
+
+    @property
+    def conversation_id(self) -> Optional[str]:
+        return str(self.conversation.session_id) if self.conversation else None
+
+    async def load(
+        self, conversation_id: Optional[str] = None, title: Optional[str] = None
+    ):
+        """Attach to a stored conversation (or start one) and warm the window"""
+        session_id = _parse_session_id(conversation_id)
+        if self.conversation is not None and (
+            session_id is None or session_id == self.conversation.session_id
+        ):
+            return
+
+        self.conversation, rows, self.summary = await _get_or_create_conversation(
+            session_id, title
+        )
+        self.turns, self._turn_tokens, self._evicted = [], [], []
+        self._window_tokens = 0
+        for role, content in rows:
+            message = _stored_message(role, content)
+            tokens = _message_tokens(message)
+            if role == "user" or not self.turns:
+                self.turns.append([message])
+                self._turn_tokens.append(tokens)
+            else:
+                self.turns[-1].append(message)
+                self._turn_tokens[-1] += tokens
+            self._window_tokens += tokens
+        self._trim()
+        if self.summary:
+            # Turns older than the window are already covered by the summary
+            self._evicted = []
+
+    def build_messages(self, system_prompt: str, message: str) -> List[BaseMessage]:
+        """Assemble the context: system prompt, summary, window, new message"""
+        if self.summary:
+            system_prompt = (
+                f"{system_prompt}\n\n"
+                f"Summary of the earlier conversation:\n{self.summary}"
+            )
+        messages: List[BaseMessage] = [HumanMessage(content=system_prompt)]
+        for turn in self.turns:
+            messages.extend(turn)
+        messages.append(HumanMessage(content=message))
+        return messages
+
+    async def record_turn(self, message: str, new_messages: List[BaseMessage]):
+        """Add a completed turn to the window and persist it"""
+        user_message = HumanMessage(content=message)
+        turn = [user_message, *new_messages]
+        self.turns.append(turn)
+        tokens = sum(_message_tokens(m) for m in turn)
+        self._turn_tokens.append(tokens)
+        self._window_tokens += tokens
+        self._trim()
+
+        if self.conversation is not None:
+            await _save_messages(self.conversation, _stored_rows(message, new_messages))
+
+    def summarize_in_background(self, provider):
+        """Fold evicted turns into the rolling summary without blocking"""
+        if not self._evicted:
+            return
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        self._summary_task = asyncio.create_task(self._summarize(provider))
+
+    def _trim(self):
+        while len(self.turns) > 1 and self._window_tokens > self.token_budget:
+            self._evicted.append(self.turns.pop(0))
+            self._window_tokens -= self._turn_tokens.pop(0)
+
+    async def _summarize(self, provider):
+        evicted, self._evicted = self._evicted, []
+        transcript = "\n".join(
+            f"{m.type}: {m.content}" for turn in evicted for m in turn
+        )
+        prompt = (
+            "Update the running summary of this conversation. Keep every concrete "
+            "fact, figure, vendor name and date the user may ask about again.\n\n"
+            f"Current summary:\n{self.summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        try:
+            summary = ""
+            async for chunk in provider.generate_response_stream(
+                [HumanMessage(content=prompt)]
+            ):
+                summary += chunk if isinstance(chunk, str) else str(chunk)
+            self.summary = summary.strip()
+            if self.conversation is not None:
+                await _save_summary(self.conversation, self.summary)
+        except Exception as e:
+            logger.error(f"Conversation summary failed: {str(e)}", exc_info=True)
+            self._evicted = evicted + self._evicted
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MS = 30
+DEFAULT_MAX_BYTES = 1024
+
+
+class StreamCoalescer:
+    """
+    Batches streamed model chunks into fewer ``chat_message_chunk`` frames.
+
+    The first chunk is sent immediately so time-to-first-token is unchanged.
+    After that, chunks are buffered and flushed when the time window since
+    the last frame elapses or the buffer reaches ``max_bytes``. A window of
+    0 disables coalescing.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        window_ms: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.send = send
+        if window_ms is None:
+            window_ms = float(
+                os.environ.get("EARS_STREAM_COALESCE_MS", DEFAULT_WINDOW_MS)
+            )
+        if max_bytes is None:
+            max_bytes = int(
+                os.environ.get("EARS_STREAM_COALESCE_BYTES", DEFAULT_MAX_BYTES)
+            )
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self._buffer: List[str] = []
+        self._buffered_bytes = 0
+        self._last_sent: Optional[float] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.chunks_in = 0
+        self.frames_out = 0
+
+    async def push(self, chunk: str):
+        """Add a chunk, sending a frame now if the window or size allows"""
+        if not chunk:
+            return
+        self.chunks_in += 1
+        async with self._lock:
+            self._buffer.append(chunk)
+            self._buffered_bytes += len(chunk.encode())
+
+            window_elapsed = (
+                self._last_sent is None
+                or time.monotonic() - self._last_sent >= self.window
+            )
+            if window_elapsed or self._buffered_bytes >= self.max_bytes:
+                await self._send_buffer()
+            elif self._timer is None:
+                delay = self._last_sent + self.window - time.monotonic()
+                self._timer = asyncio.create_task(self._flush_after(delay))
+
+    async def flush(self):
+        """Send anything still buffered; call before the completion frame"""
+        async with self._lock:
+            await self._send_buffer()
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(max(delay, 0))
+        async with self._lock:
+            self._timer = None
+            await self._send_buffer()
+
+    async def _send_buffer(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+
+        message = "".join(self._buffer)
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_sent = time.monotonic()
+        self.frames_out += 1
+        await self.send(
+            json.dumps(
+                {
+                    "type": "chat_message_chunk",
+                    "message": message,
+                    "is_complete": False,
+                }
+            )
+        )
@@ -1,3 +1,329 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    ToolMessage,
+)
+from pydantic import BaseModel
+
+from ears.consumers import ToolRegistry, _create_graph
+from ears.memory import ConversationMemory, count_tokens
+from ears.streaming import StreamCoalescer
+from ears.tool_engine import ToolCallEngine
+from ears.tool_output import serialize_tool_result
+
+
+class StreamCoalescerTests(SimpleTestCase):
+    def setUp(self):
+        self.frames = []
+
+    async def send(self, frame):
+        self.frames.append(json.loads(frame)["message"])
+
+    async def test_first_chunk_is_sent_immediately(self):
+        coalescer = StreamCoalescer(self.send, window_ms=1000, max_bytes=1024)
+        await coalescer.push("Hello")
+        self.assertEqual(self.frames, ["Hello"])
+
+    async def test_chunks_within_window_are_batched(self):
+        coalescer = StreamCoalescer(self.send, window_ms=1000, max_bytes=1024)
+        for chunk in ["Hello", ",", " wor", "ld"]:
+            await coalescer.push(chunk)
+        self.assertEqual(self.frames, ["Hello"])
+        await coalescer.flush()
+        self.assertEqual(self.frames, ["Hello", ", world"])
+        self.assertEqual((coalescer.chunks_in, coalescer.frames_out), (4, 2))
+
+    async def test_timer_flushes_after_window(self):
+        coalescer = StreamCoalescer(self.send, window_ms=20, max_bytes=1024)
+        await coalescer.push("a")
+        await coalescer.push("b")
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.frames, ["a", "b"])
+
+    async def test_size_limit_flushes_early(self):
+        coalescer = StreamCoalescer(self.send, window_ms=1000, max_bytes=4)
+        for chunk in ["a", "bb", "ccc"]:
+            await coalescer.push(chunk)
+        self.assertEqual(self.frames, ["a", "bbccc"])
+
+    async def test_empty_chunks_and_flushes_send_nothing(self):
+        coalescer = StreamCoalescer(self.send, window_ms=1000, max_bytes=1024)
+        await coalescer.push("")
+        await coalescer.flush()
+        self.assertEqual(self.frames, [])
+
+    async def test_zero_window_disables_coalescing(self):
+        coalescer = StreamCoalescer(self.send, window_ms=0, max_bytes=1024)
+        for chunk in ["a", "b", "c"]:
+            await coalescer.push(chunk)
+        self.assertEqual(self.frames, ["a", "b", "c"])
+
+
+class ConversationMemoryTests(SimpleTestCase):
+    def turn(self, answer="ok"):
+        return [
+            AIMessage(content="Let me check", tool_calls=[
+                {"name": "lookup", "args": {"query": "a"}, "id": "toolu_1"}
+            ]),
+            ToolMessage(content="x" * 5000, tool_call_id="toolu_1"),
+            AIMessage(content=answer),
+        ]
+
+    @mock.patch.dict("os.environ", {"EARS_MEMORY_TOOL_RESULT_CHARS": "100"})
+    async def test_turn_is_stored_with_truncated_tool_results(self):
+        memory = ConversationMemory()
+        memory.conversation = object()
+        with mock.patch("ears.memory._save_messages", new=mock.AsyncMock()) as save:
+            await memory.record_turn("orders today?", self.turn())
+        rows = save.await_args.args[1]
+        self.assertEqual(
+            [role for role, _ in rows], ["user", "assistant", "tool", "assistant"]
+        )
+        self.assertTrue(rows[2][1].startswith("x" * 100))
+        self.assertIn("(truncated)", rows[2][1])
+        self.assertLess(len(rows[2][1]), 200)
+
+    async def test_stored_tool_results_reload_into_their_turn(self):
+        rows = [
+            ("user", "orders today?"),
+            ("assistant", "Let me check"),
+            ("tool", "orders: 12"),
+            ("assistant", "12 orders"),
+            ("user", "and yesterday?"),
+        ]
+        memory = ConversationMemory()
+        with mock.patch(
+            "ears.memory._get_or_create_conversation",
+            new=mock.AsyncMock(return_value=(None, rows, "")),
+        ):
+            await memory.load()
+        self.assertEqual([len(turn) for turn in memory.turns], [4, 1])
+        self.assertIsInstance(memory.turns[0][2], HumanMessage)
+        self.assertEqual(memory.turns[0][2].content, "Tool result: orders: 12")
+
+    async def test_oldest_turns_are_evicted_over_budget(self):
+        memory = ConversationMemory(token_budget=3000)
+        for index in range(4):
+            await memory.record_turn(f"question {index}", self.turn())
+        self.assertEqual(len(memory.turns), 2)
+        self.assertEqual(len(memory._evicted), 2)
+        self.assertEqual(memory._window_tokens, sum(memory._turn_tokens))
+        self.assertLessEqual(memory._window_tokens, 3000)
+
+
+class FailingProvider:
+    supports_tools = True
+
+    async def generate_message_stream(self, messages, tools=None):
+        yield AIMessageChunk(content="Let me ")
+        yield AIMessageChunk(content="check")
+        raise RuntimeError("stream broke")
+
+
+class ProcessMessageTests(SimpleTestCase):
+    async def test_failed_turn_flushes_and_sends_nothing_later(self):
+        frames = []
+
+        async def send(frame):
+            frames.append(json.loads(frame)["message"])
+
+        app = _create_graph(ToolRegistry()).compile()
+        state = await app.ainvoke(
+            {"messages": [HumanMessage(content="hi")], "tool_calls": [], "next_step": None},
+            config={"configurable": {"provider": FailingProvider(), "send": send}},
+        )
+        self.assertEqual(frames, ["Let me ", "check"])
+        self.assertIn("stream broke", state["messages"][-1].content)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(frames, ["Let me ", "check"])
+
+
+
+class LookupSchema(BaseModel):
+    query: str
+
+
+def tool_chunk(index, name=None, args="", id=None):
+    return AIMessageChunk(
+        content="",
+        tool_call_chunks=[{"index": index, "name": name, "args": args, "id": id}],
+    )
+
+
+class ToolProvider:
+    """Streams scripted tool call chunks, then answers in the next round"""
+
+    supports_tools = True
+
+    def __init__(self, chunks, started):
+        self.chunks = chunks
+        self.started = started
+        self.rounds = []
+
+    async def generate_message_stream(self, messages, tools=None):
+        self.rounds.append(messages)
+        if len(self.rounds) > 1:
+            yield AIMessageChunk(content="Done")
+            return
+        for chunk in self.chunks:
+            yield chunk
+        # Still streaming: the first call must already be running
+        await asyncio.wait_for(self.started["a"].wait(), 1)
+
+
+class PromptedProvider:
+    supports_tools = False
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.prompts = []
+
+    async def generate_response_stream(self, messages):
+        self.prompts.append(messages)
+        yield self.replies[len(self.prompts) - 1]
+
+
+class ToolCallEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+        self.started = {"a": asyncio.Event(), "b": asyncio.Event()}
+
+        async def lookup(query: str):
+            self.calls.append(query)
+            self.started[query].set()
+            # Parallel calls overlap: each waits for the other to start
+            await asyncio.wait_for(
+                asyncio.gather(*(event.wait() for event in self.started.values())), 1
+            )
+            return {"status": "success", "query": query}
+
+        registry = ToolRegistry()
+        registry.register_tool("lookup", lookup, "Look something up", LookupSchema)
+        self.engine = ToolCallEngine(registry)
+        self.text = []
+
+    async def on_text(self, text):
+        self.text.append(text)
+
+    async def run_turn(self, provider):
+        return await self.engine.run(provider, [HumanMessage(content="hi")], self.on_text)
+
+    async def test_parallel_calls_dispatch_while_streaming(self):
+        provider = ToolProvider(
+            [
+                tool_chunk(0, "lookup", '{"query": ', id="toolu_1"),
+                tool_chunk(0, args='"a"}'),
+                tool_chunk(1, "lookup", '{"query": "b"}', id="toolu_2"),
+            ],
+            self.started,
+        )
+        messages = await self.run_turn(provider)
+        self.assertEqual(sorted(self.calls), ["a", "b"])
+        self.assertEqual(
+            [call["id"] for call in messages[0].tool_calls], ["toolu_1", "toolu_2"]
+        )
+        results = [m for m in messages if isinstance(m, ToolMessage)]
+        self.assertEqual([m.tool_call_id for m in results], ["toolu_1", "toolu_2"])
+        self.assertIn("query: a", results[0].content)
+        self.assertEqual(messages[-1].content, "Done")
+
+    async def test_calls_without_ids_keep_apart(self):
+        provider = ToolProvider(
+            [
+                tool_chunk(0, "lookup", '{"query": "a"}'),
+                tool_chunk(1, "lookup", '{"query": "b"}'),
+            ],
+            self.started,
+        )
+        messages = await self.run_turn(provider)
+        self.assertEqual(sorted(self.calls), ["a", "b"])
+        ids = [call["id"] for call in messages[0].tool_calls]
+        self.assertEqual(len(set(ids)), 2)
+        results = [m for m in messages if isinstance(m, ToolMessage)]
+        self.assertEqual([m.tool_call_id for m in results], ids)
+
+    async def test_prompted_provider_runs_every_call(self):
+        provider = PromptedProvider(
+            ['<tool>lookup("a")</tool> <tool>lookup("b")</tool>', "Both found"]
+        )
+        messages = await self.run_turn(provider)
+        self.assertEqual(sorted(self.calls), ["a", "b"])
+        self.assertEqual(messages[1].content.count("Tool result:"), 2)
+        self.assertEqual(messages[-1].content, "Both found")
+
+    async def test_prompted_reply_without_tool_is_the_answer(self):
+        provider = PromptedProvider(["Hello there"])
+        messages = await self.run_turn(provider)
+        self.assertEqual([m.content for m in messages], ["Hello there"])
+        self.assertEqual(self.calls, [])
+
+
+class SerializeToolResultTests(SimpleTestCase):
+    def result(self, row_count):
+        return {
+            "status": "success",
+            "summary": {"orders": row_count},
+            "data": [
+                {
+                    "vendor_name": "Akita Sushi",
+                    "order_date": datetime(2024, 3, day % 28 + 1),
+                    "total": Decimal("12.50") + day,
+                    "note": f"order number {day} with a longer description",
+                }
+                for day in range(row_count)
+            ],
+        }
+
+    def test_rows_render_as_table_with_constant_columns_pulled_out(self):
+        serialized = serialize_tool_result(self.result(3), token_budget=1000)
+        lines = serialized.text.splitlines()
+        self.assertIn("status: success", lines)
+        self.assertIn('summary: {"orders":3}', lines)
+        self.assertIn("same in every row: vendor_name=Akita Sushi", serialized.text)
+        self.assertIn("order_date\ttotal\tnote", lines)
+        self.assertIn("2024-03-01\t12.5\torder number 0 with a longer description", lines)
+        self.assertEqual(serialized.omitted_rows, 0)
+
+    def test_rows_are_dropped_to_fit_budget(self):
+        serialized = serialize_tool_result(self.result(200), token_budget=300)
+        self.assertLessEqual(serialized.tokens, 300)
+        self.assertEqual(serialized.tokens, count_tokens(serialized.text))
+        self.assertGreater(serialized.omitted_rows, 0)
+        self.assertIn(
+            f"... {serialized.omitted_rows} more rows omitted", serialized.text
+        )
+        self.assertGreater(serialized.tokens_saved, 0)
+
+    def test_budget_smaller_than_metadata_keeps_no_rows(self):
+        serialized = serialize_tool_result(self.result(20), token_budget=1)
+        self.assertEqual(serialized.omitted_rows, 20)
+        self.assertIn("data (0 of 20 rows", serialized.text)
+
+    def test_rows_that_are_not_dicts_are_dropped_too(self):
+        result = {"status": "success", "data": [[day, "x" * 40] for day in range(200)]}
+        serialized = serialize_tool_result(result, token_budget=300)
+        self.assertLessEqual(serialized.tokens, 300)
+        self.assertGreater(serialized.omitted_rows, 0)
+        self.assertIn(f"... {serialized.omitted_rows} more rows omitted", serialized.text)
+
+    def test_savings_are_measured_on_the_serialized_text(self):
+        serialized = serialize_tool_result(self.result(3), token_budget=1000)
+        self.assertEqual(serialized.tokens_saved, 0)
+
+        serialized = serialize_tool_result(self.result(200), token_budget=300)
+        full = serialize_tool_result(self.result(200), token_budget=10**6)
+        self.assertEqual(serialized.original_tokens, full.tokens)
+
+    def test_non_dict_results_pass_through(self):
+        serialized = serialize_tool_result("Error: query failed", token_budget=10)
+        self.assertEqual(serialized.text, "Error: query failed")
+        self.assertEqual(serialized.omitted_rows, 0)
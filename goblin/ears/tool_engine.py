@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from brain.instrumentation import (
+    PROVIDER_STREAM,
+    TOOL_EXECUTION,
+    mark_first_token,
+    timed_stage,
+    traced,
+)
+from ears.tool_output import serialize_tool_result
+
+logger = logging.getLogger(__name__)
+
+# Prompted tool call for providers without native tool calling
+PROMPTED_TOOL_PATTERN = re.compile(r"<tool>(\w+)\((.*?)\)</tool>", re.DOTALL)
+
+
+def _chunk_text(chunk) -> str:
+    """Extract the text part of a streamed chunk (str or content blocks)"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "")
+        for block in content
+        if isinstance(block, dict) and block.get("type") in ("text", "text_delta")
+    )
+
+
+class ToolCallEngine:
+    """
+    Runs a chat turn using the provider's native structured tool calls.
+
+    Each streamed tool call is dispatched as soon as its arguments are
+    complete (the stream moves on to the next call index, or ends), so
+    parallel calls in one turn run concurrently while the model is still
+    streaming. Tool results are fed back as ToolMessages and the model is
+    re-invoked until it answers without calling tools, or answers once more
+    without tools when ``max_rounds`` runs out.
+
+    Providers without native tool calls are asked to reply with one
+    ``<tool>name("argument")</tool>`` per call; the calls are parsed from
+    their text and run concurrently.
+    """
+
+    def __init__(
+        self,
+        tool_registry,
+        project_name: Optional[str] = None,
+        max_rounds: int = 3,
+    ):
+        self.tool_registry = tool_registry
+        self.project_name = project_name
+        self.max_rounds = max_rounds
+
+    async def run(
+        self,
+        provider,
+        messages: List[BaseMessage],
+        on_text: Callable[[str], Awaitable[None]],
+    ) -> List[BaseMessage]:
+        """Run the turn, streaming text to ``on_text``; returns new messages"""
+        if not getattr(provider, "supports_tools", False):
+            return await self._run_prompted(provider, messages, on_text)
+
+        tools = self.tool_registry.get_tools()
+        conversation = list(messages)
+        new_messages: List[BaseMessage] = []
+
+        for _ in range(self.max_rounds):
+            gathered = None
+            text = ""
+            dispatched: Dict[Any, asyncio.Task] = {}
+            current_index = None
+
+            with timed_stage(PROVIDER_STREAM):
+                async for chunk in provider.generate_message_stream(
+                    conversation, tools
+                ):
+                    gathered = chunk if gathered is None else gathered + chunk
+
+                    chunk_text = _chunk_text(chunk)
+                    if chunk_text:
+                        mark_first_token()
+                        text += chunk_text
+                        await on_text(chunk_text)
+
+                    for tool_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                        index = tool_chunk.get("index")
+                        if current_index is not None and index != current_index:
+                            self._dispatch(gathered, current_index, dispatched)
+                        current_index = index
+
+            if gathered is None:
+                break
+            if current_index is not None:
+                self._dispatch(gathered, current_index, dispatched)
+
+            calls = _tool_calls(gathered)
+            tool_calls = list(calls.values())
+            ai_message = AIMessage(content=text, tool_calls=tool_calls)
+            conversation.append(ai_message)
+            new_messages.append(ai_message)
+            if not tool_calls:
+                break
+
+            # Calls not dispatched while streaming (e.g. the provider sent no
+            # index) run now
+            tasks = [
+                dispatched.get(key) or asyncio.create_task(self._execute(call))
+                for key, call in calls.items()
+            ]
+            results = await asyncio.gather(*tasks)
+            for call, result in zip(tool_calls, results):
+                serialized = serialize_tool_result(result)
+                logger.info(
+                    f"Tool {call.get('name')} result: {serialized.tokens} tokens, "
+                    f"{serialized.tokens_saved} saved, "
+                    f"{serialized.omitted_rows} rows omitted"
+                )
+                tool_message = ToolMessage(
+                    content=serialized.text, tool_call_id=call.get("id")
+                )
+                conversation.append(tool_message)
+                new_messages.append(tool_message)
+
+        if new_messages and isinstance(new_messages[-1], ToolMessage):
+            # Out of rounds with tool results still unanswered
+            logger.info(
+                f"Tool rounds exhausted ({self.max_rounds}), answering without tools"
+            )
+            text = await self._stream_text(
+                provider, _without_tool_calls(conversation), on_text
+            )
+            new_messages.append(AIMessage(content=text))
+        return new_messages
+
+    async def _stream_text(
+        self,
+        provider,
+        messages: List[BaseMessage],
+        on_text: Callable[[str], Awaitable[None]],
+    ) -> str:
+        """Stream a plain-text generation with no tools bound"""
+        content = ""
+        with timed_stage(PROVIDER_STREAM):
+            async for chunk in provider.generate_response_stream(messages):
+                if not content:
+                    mark_first_token()
+                content += chunk
+                await on_text(chunk)
+        return content
+
+    async def _run_prompted(
+        self,
+        provider,
+        messages: List[BaseMessage],
+        on_text: Callable[[str], Awaitable[None]],
+    ) -> List[BaseMessage]:
+        """One round of prompted tool calls, then the answer, for plain-text providers"""
+        tools = self.tool_registry.get_tools()
+        conversation = list(messages)
+        if tools:
+            conversation.insert(-1, HumanMessage(content=_tool_instructions(tools)))
+
+        text = await self._stream_text(provider, conversation, on_text)
+        reply = AIMessage(content=text)
+        calls = []
+        for match in PROMPTED_TOOL_PATTERN.finditer(reply.content):
+            tool = self.tool_registry.get_tool(match.group(1))
+            if tool is None:
+                continue
+            argument = match.group(2).strip().strip("\"'")
+            field = next(iter(tool.args), None)
+            calls.append({"name": tool.name, "args": {field: argument} if field else {}})
+        if not calls:
+            return [reply]
+
+        results = await asyncio.gather(*(self._execute(call) for call in calls))
+        result_message = HumanMessage(
+            content="\n\n".join(
+                f"Tool result: {serialize_tool_result(result).text}"
+                for result in results
+            )
+        )
+        conversation += [reply, result_message]
+        answer = await self._stream_text(provider, conversation, on_text)
+        return [reply, result_message, AIMessage(content=answer)]
+
+    def _dispatch(self, gathered, index, dispatched: Dict[Any, asyncio.Task]):
+        """Start the tool call at ``index`` once its streamed arguments are complete"""
+        if index in dispatched:
+            return
+        call = _tool_calls(gathered).get(index)
+        if call is not None:
+            dispatched[index] = asyncio.create_task(self._execute(call))
+
+    async def _execute(self, call: Dict[str, Any]) -> Any:
+        tool = self.tool_registry.get_tool(call["name"])
+        if tool is None:
+            return {"status": "error", "message": f"Unknown tool: {call['name']}"}
+        with traced(
+            name="Tool Execution",
+            project_name=self.project_name,
+            metadata={"tool_name": call["name"]},
+        ), timed_stage(TOOL_EXECUTION):
+            try:
+                return await tool.ainvoke(call["args"])
+            except Exception as e:
+                logger.error(f"Tool {call['name']} failed: {str(e)}", exc_info=True)
+                return {"status": "error", "message": str(e)}
+
+
+def _tool_calls(gathered) -> Dict[Any, Dict[str, Any]]:
+    """
+    Complete tool calls in a merged stream, keyed by their chunk index.
+    Chunks are merged by index, and later chunks often carry no id (some
+    providers never send one), so the index is the only stable key; a
+    missing id is filled in for the ToolMessage to answer.
+    """
+    calls: Dict[Any, Dict[str, Any]] = {}
+    for position, tool_chunk in enumerate(
+        getattr(gathered, "tool_call_chunks", None) or []
+    ):
+        if not tool_chunk.get("name"):
+            continue
+        try:
+            args = json.loads(tool_chunk.get("args") or "{}")
+        except json.JSONDecodeError:
+            continue
+        index = tool_chunk.get("index")
+        key = index if index is not None else f"position-{position}"
+        calls[key] = {
+            "name": tool_chunk["name"],
+            "args": args,
+            "id": tool_chunk.get("id") or f"call_{key}",
+        }
+    return calls
+
+
+def _tool_instructions(tools) -> str:
+    lines = [
+        "To use tools, reply with only one <tool>name(\"argument\")</tool> per "
+        "call and you will be given their results. Available tools:"
+    ]
+    for tool in tools:
+        argument = next(iter(tool.args), "")
+        lines.append(f"- {tool.name}({argument}): {tool.description}")
+    return "\n".join(lines)
+
+
+def _without_tool_calls(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Rewrite native tool calls and results as plain text, so the history can
+    be sent to a model without tools bound (providers reject tool results
+    in a request that defines no tools).
+    """
+    flattened: List[BaseMessage] = []
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            result = f"Tool result: {message.content}"
+            previous = flattened[-1] if flattened else None
+            if isinstance(previous, HumanMessage) and previous.content.startswith(
+                "Tool result: "
+            ):
+                flattened[-1] = HumanMessage(content=f"{previous.content}\n\n{result}")
+            else:
+                flattened.append(HumanMessage(content=result))
+        elif isinstance(message, AIMessage) and message.tool_calls:
+            calls = ", ".join(
+                f"{call['name']}({json.dumps(call['args'])})"
+                for call in message.tool_calls
+            )
+            text = f"{message.content}\n" if message.content else ""
+            flattened.append(AIMessage(content=f"{text}Calling tools: {calls}"))
+        else:
+            flattened.append(message)
+    return flattened
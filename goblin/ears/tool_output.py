@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ears.memory import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 1500
+
+
+@dataclass
+class SerializedResult:
+    text: str
+    tokens: int
+    # Tokens of the same serialization with every row kept
+    original_tokens: int
+    omitted_rows: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+class ToolOutputStats:
+    """Running totals of serialized tool output, for the metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tokens = 0
+        self.tokens_saved = 0
+        self.truncated = 0
+
+    def record(self, serialized: SerializedResult):
+        with self._lock:
+            self.calls += 1
+            self.tokens += serialized.tokens
+            self.tokens_saved += serialized.tokens_saved
+            self.truncated += 1 if serialized.omitted_rows else 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "tokens": self.tokens,
+                "tokens_saved": self.tokens_saved,
+                "truncated": self.truncated,
+            }
+
+
+tool_output_stats = ToolOutputStats()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return _format_value(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=_json_default)
+
+
+def _format_value(value: Any) -> str:
+    """One table cell: no repr noise, no tabs or newlines"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        if value.hour == value.minute == value.second == 0:
+            return value.date().isoformat()
+        return value.replace(microsecond=0, tzinfo=None).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return format(value.normalize(), "f")
+    if isinstance(value, (dict, list)):
+        return _compact_json(value)
+    return " ".join(str(value).split())
+
+
+def _table(
+    rows: Sequence[Dict[str, Any]], columns: Optional[Sequence[str]] = None
+) -> Tuple[str, List[str]]:
+    """
+    Render rows as TSV. Columns holding the same value in every row are
+    pulled out into the returned note instead of being repeated per row.
+    """
+    columns = list(columns or rows[0].keys())
+    constant = {}
+    if len(rows) > 1:
+        for column in columns:
+            first = rows[0].get(column)
+            if all(row.get(column) == first for row in rows):
+                constant[column] = first
+    varying = [column for column in columns if column not in constant]
+
+    note = ", ".join(f"{k}={_format_value(v)}" for k, v in constant.items())
+    lines = ["\t".join(varying)] + [
+        "\t".join(_format_value(row.get(column)) for column in varying)
+        for row in rows
+    ]
+    return note, lines
+
+
+def _render(result: Any, row_limit: Optional[int] = None) -> Tuple[str, int]:
+    """Render a tool result, keeping at most ``row_limit`` data rows"""
+    if not isinstance(result, dict):
+        return str(result), 0
+
+    parts = []
+    for key, value in result.items():
+        if key == "data":
+            continue
+        if isinstance(value, (dict, list)):
+            parts.append(f"{key}: {_compact_json(value)}")
+        else:
+            parts.append(f"{key}: {_format_value(value)}")
+
+    rows = result.get("data")
+    omitted = 0
+    if isinstance(rows, list) and rows:
+        kept = rows if row_limit is None else rows[:row_limit]
+        omitted = len(rows) - len(kept)
+        if isinstance(rows[0], dict):
+            note, lines = _table(rows, result.get("columns"))
+            header = f"data ({len(kept)} of {len(rows)} rows"
+            header += f"; same in every row: {note})" if note else ")"
+            parts.append(header + ":")
+            parts.extend(lines[: len(kept) + 1])
+        else:
+            parts.append(
+                f"data ({len(kept)} of {len(rows)} rows): {_compact_json(kept)}"
+            )
+        if omitted:
+            parts.append(f"... {omitted} more rows omitted")
+    elif rows:
+        parts.append(f"data: {_compact_json(rows)}")
+
+    return "\n".join(parts), omitted
+
+
+def serialize_tool_result(
+    result: Any, token_budget: Optional[int] = None
+) -> SerializedResult:
+    """
+    Serialize a tool result for the model as compact text: scalar fields as
+    ``key: value`` lines, nested fields as compact JSON and row data as a
+    TSV table. Rows are dropped from the end until the text fits the token
+    budget (``EARS_TOOL_RESULT_TOKEN_BUDGET``).
+    """
+    if token_budget is None:
+        token_budget = int(
+            os.environ.get("EARS_TOOL_RESULT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+        )
+
+    text, omitted = _render(result)
+    tokens = original_tokens = count_tokens(text)
+    rows = result.get("data") if isinstance(result, dict) else None
+    if tokens > token_budget and isinstance(rows, list) and rows:
+        # Binary search for the largest row count that fits
+        low, high = 0, len(rows) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(_render(result, middle)[0]) <= token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        text, omitted = _render(result, low)
+        tokens = count_tokens(text)
+
+    serialized = SerializedResult(
+        text=text,
+        tokens=tokens,
+        original_tokens=original_tokens,
+        omitted_rows=omitted,
+    )
+    tool_output_stats.record(serialized)
+    return serialized
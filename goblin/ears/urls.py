@@ -3,5 +3,6 @@ from . import views
 
 urlpatterns = [
     path('api/transcribe/', views.transcribe_audio, name='transcribe_audio'),
+    path('api/metrics/', views.chat_metrics, name='chat_metrics'),
+    path('api/metrics/prometheus/', views.chat_metrics_prometheus, name='chat_metrics_prometheus'),
 ]
-
@@ -1,4 +1,10 @@
 from django.shortcuts import render
+from django.http import HttpResponse, JsonResponse
+
+from brain.instrumentation import stage_metrics
+from brain.providers.pool import provider_pool
+from ears.consumers import connect_metrics, graph_registry
+from ears.tool_output import tool_output_stats
 
 # Create your views here.
 
@@ -6,3 +12,23 @@ from django.shortcuts import render
 
 def transcribe_audio(request):
     pass
+
+
+def chat_metrics(request):
+    """Connect latency, shared graph/provider caches and per-stage timings"""
+    return JsonResponse(
+        {
+            "connect": connect_metrics.snapshot(),
+            "graph_cache": graph_registry.stats(),
+            "provider_pool": provider_pool.stats(),
+            "tool_output": tool_output_stats.stats(),
+            "stages": stage_metrics.stats(),
+        }
+    )
+
+
+def chat_metrics_prometheus(request):
+    """Per-stage chat latency histograms for Prometheus to scrape"""
+    return HttpResponse(
+        stage_metrics.prometheus(), content_type="text/plain; version=0.0.4"
+    )
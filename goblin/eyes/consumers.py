@@ -1,6 +1,8 @@
 # eyes/consumers.py
 import json
-import base64
+import time
+import subprocess
+import asyncio
 import logging
 from io import BytesIO
 from PIL import Image
@@ -9,6 +11,12 @@ from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage
 import os
 
+from eyes.dedup import FrameDeduplicator, dedup_stats
+from eyes.frames import decode_data_url, decode_frame
+from eyes.ocr import ScreenTextModel, ocr_binary
+from eyes.preprocess import ScreenshotPreprocessor, get_preprocess_executor
+from eyes.work_queue import LatestWinsQueue, queue_stats
+
 logger = logging.getLogger(__name__)
 
 class ScreenshotConsumer(AsyncWebsocketConsumer):
@@ -19,11 +27,23 @@ class ScreenshotConsumer(AsyncWebsocketConsumer):
             model=os.getenv("AI_MODEL", "claude-3-opus-20240229")
         )
         self.current_project = None
+        # Last analyzed frame per project, to skip unchanged screens
+        self.deduplicator = FrameDeduplicator()
+        # Downscale / re-encode settings come from EYES_* environment variables
+        self.preprocessor = ScreenshotPreprocessor()
+        # Optional local OCR (EYES_OCR=1 and tesseract installed)
+        self.screen_text = ScreenTextModel() if ocr_binary() else None
+        # Screenshots waiting for the single analysis worker; newest wins
+        self.queue = None
+        self.worker = None
+        self.overloaded = False
 
     async def connect(self):
         """Handle WebSocket connection setup"""
         try:
             await self.accept()
+            self.queue = LatestWinsQueue()
+            self.worker = asyncio.create_task(self.process_queue())
             await self.send(json.dumps({
                 'type': 'connection_status',
                 'status': 'connected'
@@ -36,57 +56,25 @@ class ScreenshotConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
         logger.info(f"WebSocket disconnected with code: {close_code}")
+        if self.worker:
+            self.worker.cancel()
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Handle incoming WebSocket messages"""
         try:
+            if bytes_data is not None:
+                # Binary frame: small JSON header followed by raw image bytes
+                header, image_bytes = decode_frame(bytes_data)
+                if header.get('type', 'screenshot') == 'screenshot':
+                    await self.enqueue_screenshot(header, image_bytes)
+                return
+
             data = json.loads(text_data)
-            
+
             if data['type'] == 'screenshot':
-                # Log receipt of screenshot
-                logger.info(f"Received screenshot data. Size: {len(data['data']) // 1024}KB Project: {data.get('project')} Timestamp: {data['timestamp']}")
-                
-                # Process the screenshot
-                screenshot_data = data['data']
-                timestamp = data['timestamp']
-                project = data.get('project', 'default')
-                
-                try:
-                    # Remove the data URL prefix to get just the base64 data
-                    if ',' in screenshot_data:
-                        base64_data = screenshot_data.split(',')[1]
-                    else:
-                        base64_data = screenshot_data
-                    
-                    # Log processing stages
-                    logger.info(f"Processing screenshot for project {project}")
-                    
-                    # Convert base64 to image
-                    image_data = base64.b64decode(base64_data)
-                    image = Image.open(BytesIO(image_data))
-                    
-                    # Log the image size
-                    logger.info(f"Image processed. Size: {image.size}")
-                    
-                    # Analyze the screenshot with Claude
-                    analysis_result = await self.analyze_screenshot(image, timestamp, project)
-                    
-                    # Send back the analysis
-                    await self.send(json.dumps({
-                        'type': 'screenshot_analysis',
-                        'analysis': analysis_result,
-                        'timestamp': timestamp,
-                        'project': project
-                    }))
-                    logger.info(f"Analysis sent back for screenshot at {timestamp}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing screenshot: {str(e)}", exc_info=True)
-                    await self.send(json.dumps({
-                        'type': 'error',
-                        'message': f"Error processing screenshot: {str(e)}"
-                    }))
-                
+                # Legacy text frame: the image is a base64 data URL in the JSON
+                await self.enqueue_screenshot(data, decode_data_url(data['data']))
+
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}", exc_info=True)
             await self.send(json.dumps({
@@ -94,45 +82,198 @@ class ScreenshotConsumer(AsyncWebsocketConsumer):
                 'message': str(e)
             }))
 
-    async def analyze_screenshot(self, image, timestamp, project):
-        """Analyze screenshot using Claude"""
+    async def enqueue_screenshot(self, header, image_bytes):
+        """Hand a screenshot to the analysis worker without waiting for it"""
+        dropped = self.queue.put((header, image_bytes))
+        if dropped is not None:
+            logger.info(f"Dropped queued screenshot {dropped[0].get('timestamp')} for newer {header.get('timestamp')} ({len(self.queue)} pending)")
+            if not self.overloaded:
+                self.overloaded = True
+                await self.send_backpressure('overloaded')
+
+    async def process_queue(self):
+        """Single worker per connection: analyze queued screenshots in order"""
+        while True:
+            try:
+                header, image_bytes = await self.queue.get()
+                started = time.perf_counter()
+                try:
+                    await self.handle_screenshot(header, image_bytes)
+                finally:
+                    self.queue.done(time.perf_counter() - started)
+                if self.overloaded and not len(self.queue):
+                    self.overloaded = False
+                    await self.send_backpressure('ok')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # One bad frame must not stop analysis for the connection
+                logger.error(f"Error processing queued screenshot: {str(e)}", exc_info=True)
+
+    async def send_backpressure(self, state):
+        """Tell the client whether it is capturing faster than analysis runs"""
+        queue_stats.record_backpressure()
+        suggested_interval = self.queue.suggested_interval()
+        logger.info(f"Screenshot backpressure {state}: {len(self.queue)} pending, suggested interval {suggested_interval}s")
+        await self.send(json.dumps({
+            'type': 'backpressure',
+            'state': state,
+            'queue_depth': len(self.queue),
+            'suggested_interval': suggested_interval
+        }))
+
+    async def handle_screenshot(self, header, image_bytes):
+        """Decode one screenshot, analyze it and send the analysis back"""
+        timestamp = header.get('timestamp')
+        project = header.get('project', 'default')
+
+        # Log receipt of screenshot
+        logger.info(f"Received screenshot data. Size: {len(image_bytes) // 1024}KB Project: {project} Timestamp: {timestamp}")
+
         try:
-            print("Analyzing screenshot")
-            # Convert image to base64 for Claude
-            buffered = BytesIO()
-            image.save(buffered, format="JPEG")
-
-            img_base64 = base64.b64encode(buffered.getvalue()).decode()
-            
-            # Create message for Claude with the image and project context
-            messages = [
-                HumanMessage(content=[
-                    {
-                        "type": "text",
-                        "text": f"""
-                            Please look at this screenshot for and provide insights about the content. 
-                            Look for any important information, text, or visual elements.
-                            Make note of any glaring mistakes you see, whether that be code or something else.
-                            Keep responses short and to the point as if you're texting a friend.
-                            {'Project: ' + project if project else ""}
-                        """
-                    },
-                    {
-                        "type": "image",
-                        "source": {  
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": img_base64
-                        }
-                    }
-                ])
-            ]
-            
-            # Get Claude's analysis
-            response = await self.claude_client.ainvoke(messages)
-            print('got a response')
-            return response.content
-            
+            # Log processing stages
+            logger.info(f"Processing screenshot for project {project}")
+
+            # Identical bytes: skip before decoding anything
+            decision = self.deduplicator.check_bytes(project, image_bytes)
+            if decision.skip:
+                await self.send_skipped(decision, timestamp)
+                return
+
+            # Decode, compare and re-encode on the preprocess pool so the
+            # event loop keeps serving other sockets meanwhile
+            crop = header.get('crop')
+            loop = asyncio.get_running_loop()
+            decision, frame, text = await loop.run_in_executor(
+                get_preprocess_executor(),
+                self.prepare_frame,
+                decision,
+                image_bytes,
+                tuple(int(value) for value in crop) if crop else None,
+            )
+
+            # Perceptually or textually unchanged since the last analysis: skip
+            if decision.skip:
+                await self.send_skipped(decision, timestamp)
+                return
+            dedup_stats.record(decision)
+
+            # Analyze the screenshot with Claude, as a text diff when OCR
+            # read the change confidently and as an image otherwise
+            if frame is None:
+                analysis_result = await self.analyze_text(text, timestamp, project)
+            else:
+                analysis_result = await self.analyze_screenshot(frame, timestamp, project)
+
+            # Only frames the model actually saw become the new baseline, so a
+            # failed analysis doesn't hide the change from the next frame
+            self.deduplicator.remember(decision)
+            if text is not None:
+                self.screen_text.mark_reported(text)
+
+            # Send back the analysis
+            await self.send(json.dumps({
+                'type': 'screenshot_analysis',
+                'analysis': analysis_result,
+                'mode': 'image' if frame else 'text',
+                'timestamp': timestamp,
+                'project': project
+            }))
+            logger.info(f"Analysis sent back for screenshot at {timestamp}")
+
         except Exception as e:
-            logger.error(f"Error analyzing screenshot: {str(e)}", exc_info=True)
-            return f"Error analyzing screenshot: {str(e)}"
+            logger.error(f"Error processing screenshot: {str(e)}", exc_info=True)
+            await self.send(json.dumps({
+                'type': 'error',
+                'message': f"Error processing screenshot: {str(e)}"
+            }))
+
+    def prepare_frame(self, decision, image_bytes, crop=None):
+        """Decode, dedup and preprocess one frame; runs on the preprocess pool"""
+        # The image bytes are copied once, into the buffer PIL reads from
+        image = Image.open(BytesIO(image_bytes))
+
+        # Log the image size
+        logger.info(f"Image processed. Size: {image.size}")
+
+        decision = self.deduplicator.check_image(decision, image)
+        if decision.skip:
+            return decision, None, None
+
+        text = None
+        if self.screen_text is not None:
+            try:
+                text = self.screen_text.update(decision.project, image)
+            except (OSError, subprocess.SubprocessError) as e:
+                # Missing binary, tesseract failure or timeout: send the image
+                logger.warning(f"OCR failed for project {decision.project}, analyzing the image instead: {str(e)}")
+            if text is not None and not text.significant:
+                decision.skip, decision.reason = True, 'text'
+                return decision, None, text
+        if text is not None and text.text_only:
+            return decision, None, text
+        return decision, self.preprocessor.process(decision.project, image, crop), text
+
+    async def send_skipped(self, decision, timestamp):
+        """Tell the client a frame was not analyzed because nothing changed"""
+        dedup_stats.record(decision)
+        logger.info(f"Skipping {decision.reason} screenshot for project {decision.project} (distance {decision.distance})")
+        await self.send(json.dumps({
+            'type': 'screenshot_skipped',
+            'reason': decision.reason,
+            'distance': decision.distance,
+            'timestamp': timestamp,
+            'project': decision.project
+        }))
+
+    async def analyze_text(self, text, timestamp, project):
+        """Analyze what changed on screen from its OCR text diff"""
+        logger.debug(f"Analyzing screen text diff for project {project}")
+        messages = [
+            HumanMessage(content=f"""
+                This is a diff of the text on my screen since you last saw it, read by OCR, so expect some misread characters.
+                Provide insights about the change. Make note of any glaring mistakes you see, whether that be code or something else.
+                Keep responses short and to the point as if you're texting a friend.
+                {'Project: ' + project if project else ""}
+
+                {text.diff}
+            """)
+        ]
+
+        response = await self.claude_client.ainvoke(messages)
+        logger.debug(f"Screen text analysis received for project {project}")
+        return response.content
+
+    async def analyze_screenshot(self, frame, timestamp, project):
+        """Analyze a preprocessed screenshot using Claude"""
+        logger.debug(f"Analyzing screenshot for project {project}")
+        img_base64 = frame.base64
+
+        # Create message for Claude with the image and project context
+        messages = [
+            HumanMessage(content=[
+                {
+                    "type": "text",
+                    "text": f"""
+                        Please look at this screenshot for and provide insights about the content. 
+                        Look for any important information, text, or visual elements.
+                        Make note of any glaring mistakes you see, whether that be code or something else.
+                        Keep responses short and to the point as if you're texting a friend.
+                        {'Project: ' + project if project else ""}
+                    """
+                },
+                {
+                    "type": "image",
+                    "source": {  
+                        "type": "base64",
+                        "media_type": frame.media_type,
+                        "data": img_base64
+                    }
+                }
+            ])
+        ]
+
+        # Get Claude's analysis
+        response = await self.claude_client.ainvoke(messages)
+        logger.debug(f"Screenshot analysis received for project {project}")
+        return response.content
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# dHash grid: hash_size x hash_size bits compared between neighbouring pixels
+DEFAULT_HASH_SIZE = 16
+# Frames within this many differing bits of the last analyzed frame are
+# treated as unchanged; a negative value disables perceptual matching
+DEFAULT_MAX_DISTANCE = 6
+
+
+def difference_hash(image: Image.Image, hash_size: int = DEFAULT_HASH_SIZE) -> int:
+    """
+    Perceptual difference hash: shrink to (hash_size + 1) x hash_size
+    grayscale and set one bit per pixel brighter than its right neighbour.
+    Cursor blinks and compression noise move few bits; new content moves many.
+    """
+    small = image.convert("L").resize(
+        (hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0
+    )
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for column in range(hash_size):
+            brighter = pixels[offset + column] > pixels[offset + column + 1]
+            value = (value << 1) | brighter
+    return value
+
+
+@dataclass
+class FrameDecision:
+    project: str
+    digest: bytes
+    hash: Optional[int] = None
+    distance: Optional[int] = None
+    skip: bool = False
+    reason: str = ""
+
+
+class DedupStats:
+    """Analyzed vs skipped screenshot counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.analyzed = 0
+        self.skipped_identical = 0
+        self.skipped_similar = 0
+        self.skipped_text = 0
+
+    def record(self, decision: FrameDecision):
+        with self._lock:
+            if not decision.skip:
+                self.analyzed += 1
+            elif decision.reason == "identical":
+                self.skipped_identical += 1
+            elif decision.reason == "text":
+                self.skipped_text += 1
+            else:
+                self.skipped_similar += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "analyzed": self.analyzed,
+                "skipped_identical": self.skipped_identical,
+                "skipped_similar": self.skipped_similar,
+                "skipped_text": self.skipped_text,
+            }
+
+
+dedup_stats = DedupStats()
+
+
+class FrameDeduplicator:
+    """
+    Remembers the last analyzed frame per project and decides whether a new
+    frame is worth sending to the vision model. Byte-identical frames are
+    rejected before the image is decoded; otherwise the dHash distance to
+    the last analyzed frame is compared against ``max_distance``.
+    """
+
+    def __init__(
+        self, hash_size: Optional[int] = None, max_distance: Optional[int] = None
+    ):
+        self.hash_size = hash_size or int(
+            os.environ.get("EYES_DEDUP_HASH_SIZE", DEFAULT_HASH_SIZE)
+        )
+        self.max_distance = (
+            max_distance
+            if max_distance is not None
+            else int(os.environ.get("EYES_DEDUP_MAX_DISTANCE", DEFAULT_MAX_DISTANCE))
+        )
+        self._last: Dict[str, FrameDecision] = {}
+
+    def check_bytes(self, project: str, image_bytes) -> FrameDecision:
+        """Cheap first pass on the encoded bytes"""
+        digest = hashlib.blake2b(image_bytes, digest_size=16).digest()
+        decision = FrameDecision(project=project, digest=digest)
+        last = self._last.get(project)
+        if last is not None and last.digest == decision.digest:
+            decision.skip, decision.distance, decision.reason = True, 0, "identical"
+        return decision
+
+    def check_image(
+        self, decision: FrameDecision, image: Image.Image
+    ) -> FrameDecision:
+        """Second pass on the decoded image, for frames that aren't identical"""
+        if decision.skip:
+            return decision
+        decision.hash = difference_hash(image, self.hash_size)
+        last = self._last.get(decision.project)
+        if last is not None and last.hash is not None:
+            decision.distance = bin(decision.hash ^ last.hash).count("1")
+            if decision.distance <= self.max_distance:
+                decision.skip, decision.reason = True, "similar"
+        return decision
+
+    def remember(self, decision: FrameDecision):
+        """Record a frame that was sent for analysis"""
+        self._last[decision.project] = decision
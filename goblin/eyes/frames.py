@@ -0,0 +1,52 @@
+import base64
+import json
+from typing import Any, Dict, Tuple
+
+# Binary screenshot frame layout:
+#   [4-byte big-endian header length][UTF-8 JSON header][raw image bytes]
+# The header carries what the legacy JSON message carried besides the image
+# (type, project, timestamp, format), so the image is never base64-encoded.
+HEADER_LENGTH_BYTES = 4
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class FrameError(ValueError):
+    pass
+
+
+def encode_frame(header: Dict[str, Any], image_bytes: bytes) -> bytes:
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    return (
+        len(encoded).to_bytes(HEADER_LENGTH_BYTES, "big") + encoded + image_bytes
+    )
+
+
+def decode_frame(frame: bytes) -> Tuple[Dict[str, Any], memoryview]:
+    """
+    Split a binary frame into its header and a view of the image bytes.
+    The view shares the frame's buffer, so nothing is copied here.
+    """
+    view = memoryview(frame)
+    if len(view) < HEADER_LENGTH_BYTES:
+        raise FrameError("Frame too short for a header")
+
+    header_length = int.from_bytes(view[:HEADER_LENGTH_BYTES], "big")
+    if header_length > MAX_HEADER_BYTES:
+        raise FrameError(f"Header too large: {header_length} bytes")
+    image_start = HEADER_LENGTH_BYTES + header_length
+    if image_start > len(view):
+        raise FrameError("Frame ends inside the header")
+
+    try:
+        header = json.loads(view[HEADER_LENGTH_BYTES:image_start].tobytes())
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise FrameError(f"Invalid frame header: {e}")
+    if not isinstance(header, dict):
+        raise FrameError("Frame header must be a JSON object")
+    return header, view[image_start:]
+
+
+def decode_data_url(data: str) -> bytes:
+    """Image bytes from a legacy base64 data URL (or bare base64) string"""
+    _, _, encoded = data.rpartition(",")
+    return base64.b64decode(encoded)
@@ -0,0 +1,221 @@
+import csv
+import difflib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from eyes.preprocess import Box, change_thumbnail, changed_region
+
+logger = logging.getLogger(__name__)
+
+# Concurrent tesseract processes across all connections
+DEFAULT_OCR_WORKERS = 2
+OCR_TIMEOUT_SECONDS = 15
+# A text diff touching fewer words than this doesn't warrant an analysis
+DEFAULT_MIN_CHANGED_WORDS = 3
+# Below this mean word confidence (0-100) the changed region is sent as an image
+DEFAULT_MIN_CONFIDENCE = 70
+# Changed regions larger than this fraction of the screen are sent as an image
+DEFAULT_MAX_TEXT_REGION = 0.5
+# Padding around changed regions, so lines cut at the edge are read whole
+OCR_REGION_PADDING = 16
+
+WORD_PATTERN = re.compile(r"\w{2,}")
+
+
+@lru_cache(maxsize=None)
+def ocr_binary() -> Optional[str]:
+    """The tesseract executable when OCR is enabled with EYES_OCR"""
+    if os.environ.get("EYES_OCR", "").lower() not in ("1", "true", "yes"):
+        return None
+    binary = shutil.which(os.environ.get("EYES_TESSERACT", "tesseract"))
+    if binary is None:
+        logger.warning("EYES_OCR is set but tesseract was not found; OCR disabled")
+    return binary
+
+
+_ocr_slots = threading.BoundedSemaphore(
+    int(os.environ.get("EYES_OCR_WORKERS", DEFAULT_OCR_WORKERS))
+)
+
+
+@dataclass
+class TextLine:
+    box: Box
+    text: str
+    confidence: float
+
+
+def read_lines(image: Image.Image, offset=(0, 0)) -> List[TextLine]:
+    """
+    OCR one image with a tesseract subprocess and group its words into
+    lines, with boxes shifted by ``offset`` into screen coordinates.
+    """
+    buffered = BytesIO()
+    image.convert("L").save(buffered, format="PNG")
+    with _ocr_slots:
+        result = subprocess.run(
+            [ocr_binary(), "stdin", "stdout", "--psm", "3", "tsv"],
+            input=buffered.getvalue(),
+            capture_output=True,
+            timeout=OCR_TIMEOUT_SECONDS,
+            check=True,
+        )
+
+    words: Dict[tuple, list] = {}
+    rows = csv.DictReader(
+        result.stdout.decode(errors="replace").splitlines(),
+        delimiter="\t",
+        quoting=csv.QUOTE_NONE,
+    )
+    for row in rows:
+        text = (row.get("text") or "").strip()
+        if row.get("level") != "5" or not text:
+            continue
+        key = (row["block_num"], row["par_num"], row["line_num"])
+        words.setdefault(key, []).append(row)
+
+    dx, dy = offset
+    lines = []
+    for line_words in words.values():
+        left = min(int(w["left"]) for w in line_words)
+        top = min(int(w["top"]) for w in line_words)
+        right = max(int(w["left"]) + int(w["width"]) for w in line_words)
+        bottom = max(int(w["top"]) + int(w["height"]) for w in line_words)
+        confidences = [float(w["conf"]) for w in line_words if float(w["conf"]) >= 0]
+        lines.append(
+            TextLine(
+                box=(left + dx, top + dy, right + dx, bottom + dy),
+                text=" ".join(w["text"].strip() for w in line_words),
+                confidence=sum(confidences) / len(confidences) if confidences else 0.0,
+            )
+        )
+    return lines
+
+
+@dataclass
+class TextUpdate:
+    project: str
+    region: Optional[Box]
+    diff: str = ""
+    changed_words: int = 0
+    confidence: float = 0.0
+    significant: bool = False
+    # Send the diff to the model instead of the image
+    text_only: bool = False
+    lines: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _Screen:
+    thumbnail: Image.Image
+    lines: List[TextLine]
+    reported: List[str]
+
+
+def _center_inside(box: Box, region: Box) -> bool:
+    x, y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    return region[0] <= x <= region[2] and region[1] <= y <= region[3]
+
+
+def _changed_words(before: List[str], after: List[str]) -> int:
+    old = WORD_PATTERN.findall(" ".join(before).lower())
+    new = WORD_PATTERN.findall(" ".join(after).lower())
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    return sum(
+        max(i2 - i1, j2 - j1)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    )
+
+
+class ScreenTextModel:
+    """
+    Per-project text model of the screen. Each frame only the region that
+    changed since the previous frame is OCR'd; lines inside that region
+    are replaced and the result is diffed against the text last reported
+    to the vision model. Small diffs are not significant, and diffs from
+    small, confidently read regions can be sent as text instead of images.
+    """
+
+    def __init__(self):
+        self.min_changed_words = int(
+            os.environ.get("EYES_OCR_MIN_CHANGED_WORDS", DEFAULT_MIN_CHANGED_WORDS)
+        )
+        self.min_confidence = float(
+            os.environ.get("EYES_OCR_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE)
+        )
+        self.max_text_region = float(
+            os.environ.get("EYES_OCR_MAX_TEXT_REGION", DEFAULT_MAX_TEXT_REGION)
+        )
+        self._screens: Dict[str, _Screen] = {}
+
+    def update(self, project: str, image: Image.Image) -> TextUpdate:
+        """OCR the changed region; tesseract failures propagate to the caller"""
+        thumbnail = change_thumbnail(image)
+        screen = self._screens.get(project)
+        if screen is None or screen.thumbnail.size != thumbnail.size:
+            # First frame: read everything and let the vision model see it
+            lines = read_lines(image)
+            self._screens[project] = _Screen(thumbnail, lines, [])
+            return TextUpdate(
+                project=project,
+                region=(0, 0, image.width, image.height),
+                lines=[line.text for line in lines],
+                significant=True,
+            )
+
+        region = changed_region(
+            screen.thumbnail, thumbnail, image, OCR_REGION_PADDING
+        )
+        update = TextUpdate(project=project, region=region)
+        if region is not None:
+            fresh = read_lines(image.crop(region), offset=region[:2])
+            screen.lines = sorted(
+                [line for line in screen.lines if not _center_inside(line.box, region)]
+                + fresh,
+                key=lambda line: (line.box[1], line.box[0]),
+            )
+            if fresh:
+                update.confidence = sum(line.confidence for line in fresh) / len(
+                    fresh
+                )
+
+        # Advance only once the region was read, so a failed OCR run leaves
+        # the change to be read with the next frame
+        screen.thumbnail = thumbnail
+        update.lines = [line.text for line in screen.lines]
+        update.changed_words = _changed_words(screen.reported, update.lines)
+        update.significant = update.changed_words >= self.min_changed_words
+        if update.significant:
+            update.diff = "\n".join(
+                difflib.unified_diff(
+                    screen.reported, update.lines, "before", "after", lineterm="", n=2
+                )
+            )
+            area = (region[2] - region[0]) * (region[3] - region[1]) if region else 0
+            update.text_only = (
+                update.confidence >= self.min_confidence
+                and area <= self.max_text_region * image.width * image.height
+            )
+        logger.info(
+            f"Screen text for {project}: region {region}, "
+            f"{update.changed_words} changed words, confidence "
+            f"{update.confidence:.0f}, significant {update.significant}"
+        )
+        return update
+
+    def mark_reported(self, update: TextUpdate):
+        """The model has now seen this text; later diffs are against it"""
+        screen = self._screens.get(update.project)
+        if screen is not None:
+            screen.reported = update.lines
@@ -0,0 +1,230 @@
+import base64
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+logger = logging.getLogger(__name__)
+
+# Long-edge limit before the vision model would downscale the image itself
+DEFAULT_MAX_LONG_EDGE = 1568
+DEFAULT_QUALITY = 85
+DEFAULT_MIN_QUALITY = 40
+DEFAULT_TARGET_BYTES = 400 * 1024
+QUALITY_STEP = 10
+
+# Changed-region detection runs on a thumbnail of this width
+CHANGE_THUMBNAIL_WIDTH = 320
+CHANGE_PIXEL_THRESHOLD = 16
+DEFAULT_CHANGE_PADDING = 32
+
+Box = Tuple[int, int, int, int]
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def change_thumbnail(image: Image.Image) -> Image.Image:
+    """Small grayscale copy of a frame, for cheap changed-region detection"""
+    height = max(1, round(image.height * CHANGE_THUMBNAIL_WIDTH / image.width))
+    return image.convert("L").resize(
+        (CHANGE_THUMBNAIL_WIDTH, height), Image.BILINEAR, reducing_gap=2.0
+    )
+
+
+def changed_region(
+    previous: Image.Image,
+    current: Image.Image,
+    image: Image.Image,
+    padding: int = DEFAULT_CHANGE_PADDING,
+) -> Optional[Box]:
+    """
+    Bounding box, in ``image`` pixels, of what differs between two change
+    thumbnails. None when nothing changed or the thumbnails don't match.
+    """
+    if current.size != previous.size:
+        return None
+    changed = ImageChops.difference(current, previous).point(
+        lambda value: 255 if value > CHANGE_PIXEL_THRESHOLD else 0
+    )
+    box = changed.getbbox()
+    if box is None:
+        return None
+
+    scale = image.width / CHANGE_THUMBNAIL_WIDTH
+    left, top, right, bottom = box
+    return (
+        max(0, int(left * scale) - padding),
+        max(0, int(top * scale) - padding),
+        min(image.width, int(right * scale) + padding),
+        min(image.height, int(bottom * scale) + padding),
+    )
+
+
+@dataclass
+class PreprocessOptions:
+    max_long_edge: int = DEFAULT_MAX_LONG_EDGE
+    grayscale: bool = False
+    quality: int = DEFAULT_QUALITY
+    min_quality: int = DEFAULT_MIN_QUALITY
+    target_bytes: int = DEFAULT_TARGET_BYTES
+    crop_to_changes: bool = False
+    change_padding: int = DEFAULT_CHANGE_PADDING
+
+    @classmethod
+    def from_env(cls) -> "PreprocessOptions":
+        return cls(
+            max_long_edge=int(
+                os.environ.get("EYES_MAX_LONG_EDGE", DEFAULT_MAX_LONG_EDGE)
+            ),
+            grayscale=_env_flag("EYES_GRAYSCALE"),
+            quality=int(os.environ.get("EYES_JPEG_QUALITY", DEFAULT_QUALITY)),
+            min_quality=int(
+                os.environ.get("EYES_JPEG_MIN_QUALITY", DEFAULT_MIN_QUALITY)
+            ),
+            target_bytes=int(
+                os.environ.get("EYES_TARGET_BYTES", DEFAULT_TARGET_BYTES)
+            ),
+            crop_to_changes=_env_flag("EYES_CROP_TO_CHANGES"),
+            change_padding=int(
+                os.environ.get("EYES_CHANGE_PADDING", DEFAULT_CHANGE_PADDING)
+            ),
+        )
+
+
+@dataclass
+class ProcessedFrame:
+    data: bytes
+    size: Tuple[int, int]
+    quality: int
+    encode_ms: float
+    crop: Optional[Box] = None
+    media_type: str = "image/jpeg"
+
+    @property
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+
+class PreprocessStats:
+    """Payload size and encode time totals across processed frames"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.payload_bytes = 0
+        self.encode_ms = 0.0
+        self.cropped = 0
+
+    def record(self, frame: ProcessedFrame):
+        with self._lock:
+            self.frames += 1
+            self.payload_bytes += len(frame.data)
+            self.encode_ms += frame.encode_ms
+            self.cropped += 1 if frame.crop else 0
+
+    def stats(self):
+        with self._lock:
+            frames = self.frames or 1
+            return {
+                "frames": self.frames,
+                "cropped": self.cropped,
+                "avg_payload_bytes": round(self.payload_bytes / frames),
+                "avg_encode_ms": round(self.encode_ms / frames, 3),
+            }
+
+
+preprocess_stats = PreprocessStats()
+
+
+@lru_cache(maxsize=None)
+def get_preprocess_executor() -> ThreadPoolExecutor:
+    """
+    Shared pool for decoding and re-encoding screenshots. PIL releases the
+    GIL while decoding, resizing and encoding, so this keeps the event loop
+    free without a process pool.
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.environ.get("EYES_PREPROCESS_WORKERS", 2)),
+        thread_name_prefix="eyes-preprocess",
+    )
+
+
+class ScreenshotPreprocessor:
+    """
+    Turns a decoded screenshot into the payload sent to the vision model:
+    optional crop (an explicit box, or the region that changed since the
+    project's last processed frame), optional grayscale, downscale to
+    ``max_long_edge`` and JPEG re-encode, lowering quality until the
+    payload fits ``target_bytes``.
+    """
+
+    def __init__(self, options: Optional[PreprocessOptions] = None):
+        self.options = options or PreprocessOptions.from_env()
+        self._thumbnails: Dict[str, Image.Image] = {}
+
+    def process(
+        self, project: str, image: Image.Image, crop: Optional[Box] = None
+    ) -> ProcessedFrame:
+        started = time.perf_counter()
+        options = self.options
+
+        if crop is None and options.crop_to_changes:
+            crop = self._changed_region(project, image)
+        self._thumbnails[project] = change_thumbnail(image)
+        if crop is not None:
+            image = image.crop(crop)
+
+        image = image.convert("L" if options.grayscale else "RGB")
+        long_edge = max(image.size)
+        if long_edge > options.max_long_edge:
+            scale = options.max_long_edge / long_edge
+            size = (
+                max(1, round(image.width * scale)),
+                max(1, round(image.height * scale)),
+            )
+            image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+        quality = options.quality
+        data = self._encode(image, quality)
+        while len(data) > options.target_bytes and quality > options.min_quality:
+            quality = max(options.min_quality, quality - QUALITY_STEP)
+            data = self._encode(image, quality)
+
+        frame = ProcessedFrame(
+            data=data,
+            size=image.size,
+            quality=quality,
+            encode_ms=(time.perf_counter() - started) * 1000,
+            crop=crop,
+        )
+        preprocess_stats.record(frame)
+        logger.info(
+            f"Screenshot for {project}: {len(data) // 1024}KB JPEG q{quality} "
+            f"{image.size[0]}x{image.size[1]}"
+            + (f" cropped to {crop}" if crop else "")
+            + f" in {frame.encode_ms:.1f}ms"
+        )
+        return frame
+
+    def _encode(self, image: Image.Image, quality: int) -> bytes:
+        buffered = BytesIO()
+        image.save(buffered, format="JPEG", quality=quality)
+        return buffered.getvalue()
+
+    def _changed_region(self, project: str, image: Image.Image) -> Optional[Box]:
+        """Bounding box of what changed since the last frame, in full-size px"""
+        previous = self._thumbnails.get(project)
+        if previous is None:
+            return None
+        return changed_region(
+            previous, change_thumbnail(image), image, self.options.change_padding
+        )
@@ -1,3 +1,184 @@
-from django.test import TestCase
+import asyncio
+import subprocess
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from PIL import Image, ImageDraw
+
+from eyes.consumers import ScreenshotConsumer
+from eyes.dedup import FrameDeduplicator
+from eyes.ocr import ScreenTextModel, TextLine
+from eyes.work_queue import LatestWinsQueue
+
+
+def screenshot(text="", size=(320, 200), box=(40, 40, 280, 160)):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(0, size[1], 20):
+        draw.rectangle((0, row, size[0], row + 8), fill="black")
+    if text:
+        draw.rectangle(box, fill="gray")
+        draw.text((box[0] + 4, box[1] + 4), text, fill="white")
+    return image
+
+
+def png_bytes(image):
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class FrameDeduplicatorTests(SimpleTestCase):
+    def setUp(self):
+        self.dedup = FrameDeduplicator(max_distance=6)
+
+    def analyzed(self, image, project="p"):
+        decision = self.dedup.check_bytes(project, png_bytes(image))
+        decision = self.dedup.check_image(decision, image)
+        self.dedup.remember(decision)
+        return decision
+
+    def test_first_frame_is_analyzed(self):
+        image = screenshot()
+        decision = self.dedup.check_image(
+            self.dedup.check_bytes("p", png_bytes(image)), image
+        )
+        self.assertFalse(decision.skip)
+
+    def test_identical_bytes_are_skipped(self):
+        image = screenshot()
+        self.analyzed(image)
+        decision = self.dedup.check_bytes("p", png_bytes(image))
+        self.assertTrue(decision.skip)
+        self.assertEqual(decision.reason, "identical")
+
+    def test_changed_frame_is_not_skipped(self):
+        self.analyzed(screenshot())
+        image = screenshot("a new dialog")
+        decision = self.dedup.check_image(
+            self.dedup.check_bytes("p", png_bytes(image)), image
+        )
+        self.assertFalse(decision.skip)
+
+    def test_projects_are_tracked_separately(self):
+        image = screenshot()
+        self.analyzed(image, project="one")
+        self.assertFalse(self.dedup.check_bytes("two", png_bytes(image)).skip)
+
+
+
+class LatestWinsQueueTests(SimpleTestCase):
+    async def test_full_queue_drops_oldest(self):
+        queue = LatestWinsQueue(maxsize=1)
+        self.assertIsNone(queue.put("first"))
+        self.assertEqual(queue.put("second"), "first")
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(await queue.get(), "second")
+
+    async def test_queue_keeps_order_below_capacity(self):
+        queue = LatestWinsQueue(maxsize=3)
+        for item in ["a", "b", "c"]:
+            self.assertIsNone(queue.put(item))
+        self.assertEqual(queue.put("d"), "a")
+        self.assertEqual([await queue.get() for _ in range(3)], ["b", "c", "d"])
+
+    async def process(self, queue, elapsed):
+        queue.put("frame")
+        await queue.get()
+        queue.done(elapsed)
+
+    async def test_suggested_interval_follows_processing_time(self):
+        queue = LatestWinsQueue(maxsize=1)
+        self.assertIsNone(queue.suggested_interval())
+
+        await self.process(queue, 4.0)
+        self.assertEqual(queue.suggested_interval(), 6)
+
+        # One fast frame only partly pulls the smoothed time down
+        await self.process(queue, 0.0)
+        self.assertEqual(queue.suggested_interval(), 5)
+
+    async def test_suggested_interval_is_at_least_one_second(self):
+        queue = LatestWinsQueue(maxsize=1)
+        await self.process(queue, 0.01)
+        self.assertEqual(queue.suggested_interval(), 1)
+
+
+class ScreenshotConsumerTests(SimpleTestCase):
+    def setUp(self):
+        with mock.patch.dict("os.environ", {"ANTHROPIC_API_KEY": "test"}):
+            self.consumer = ScreenshotConsumer()
+        self.consumer.screen_text = None
+        self.consumer.send = mock.AsyncMock()
+
+    async def test_failed_analysis_is_not_remembered(self):
+        image_bytes = png_bytes(screenshot())
+        self.consumer.analyze_screenshot = mock.AsyncMock(
+            side_effect=RuntimeError("model unavailable")
+        )
+        await self.consumer.handle_screenshot({"project": "p"}, image_bytes)
+        self.assertIsNone(self.consumer.deduplicator._last.get("p"))
+
+        # The retry of the same frame is analyzed rather than skipped
+        self.consumer.analyze_screenshot = mock.AsyncMock(return_value="looks fine")
+        await self.consumer.handle_screenshot({"project": "p"}, image_bytes)
+        self.consumer.analyze_screenshot.assert_awaited_once()
+        self.assertIsNotNone(self.consumer.deduplicator._last.get("p"))
+
+    async def test_worker_keeps_going_after_a_failed_frame(self):
+        self.consumer.queue = LatestWinsQueue(maxsize=2)
+        self.consumer.handle_screenshot = mock.AsyncMock(
+            side_effect=[RuntimeError("decoder crashed"), None]
+        )
+        self.consumer.queue.put(({"timestamp": 1}, b"bad"))
+        self.consumer.queue.put(({"timestamp": 2}, b"good"))
+
+        worker = asyncio.create_task(self.consumer.process_queue())
+        try:
+            await asyncio.wait_for(self._wait_calls(2), 1)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        self.assertEqual(
+            [call.args[1] for call in self.consumer.handle_screenshot.await_args_list],
+            [b"bad", b"good"],
+        )
+        self.assertTrue(worker.cancelled())
+
+    async def _wait_calls(self, count):
+        while self.consumer.handle_screenshot.await_count < count:
+            await asyncio.sleep(0.01)
+
+    async def test_ocr_failure_falls_back_to_image(self):
+        self.consumer.screen_text = ScreenTextModel()
+        self.consumer.analyze_screenshot = mock.AsyncMock(return_value="looks fine")
+        with mock.patch(
+            "eyes.ocr.read_lines",
+            side_effect=subprocess.TimeoutExpired("tesseract", 15),
+        ):
+            await self.consumer.handle_screenshot(
+                {"project": "p"}, png_bytes(screenshot())
+            )
+        self.consumer.analyze_screenshot.assert_awaited_once()
+
+    async def test_failed_text_analysis_is_not_reported(self):
+        self.consumer.screen_text = ScreenTextModel()
+        first = [TextLine((0, 0, 100, 10), "def main(): pass", 95.0)]
+        changed = first + [TextLine((0, 20, 300, 30), "raise ValueError bad input", 95.0)]
+        self.consumer.analyze_screenshot = mock.AsyncMock(return_value="looks fine")
+        with mock.patch("eyes.ocr.read_lines", return_value=first):
+            await self.consumer.handle_screenshot(
+                {"project": "p"}, png_bytes(screenshot())
+            )
+
+        self.consumer.claude_client = mock.Mock(
+            ainvoke=mock.AsyncMock(side_effect=RuntimeError("model unavailable"))
+        )
+        with mock.patch("eyes.ocr.read_lines", return_value=changed):
+            await self.consumer.handle_screenshot(
+                {"project": "p"}, png_bytes(screenshot("error", box=(40, 40, 120, 60)))
+            )
+        self.consumer.claude_client.ainvoke.assert_awaited_once()
+        screen = self.consumer.screen_text._screens["p"]
+        self.assertEqual(screen.reported, ["def main(): pass"])
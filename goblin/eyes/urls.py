@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('api/metrics/', views.screenshot_metrics, name='screenshot_metrics'),
+]
@@ -1,3 +1,19 @@
 from django.shortcuts import render
+from django.http import JsonResponse
+
+from eyes.dedup import dedup_stats
+from eyes.preprocess import preprocess_stats
+from eyes.work_queue import queue_stats
 
 # Create your views here.
+
+
+def screenshot_metrics(request):
+    """Screenshot dedup, preprocess and queue counters"""
+    return JsonResponse(
+        {
+            "dedup": dedup_stats.stats(),
+            "preprocess": preprocess_stats.stats(),
+            "queue": queue_stats.stats(),
+        }
+    )
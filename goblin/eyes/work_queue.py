@@ -0,0 +1,92 @@
+import asyncio
+import math
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Frames waiting behind the one being analyzed; 1 means only the newest
+# screenshot is kept while the vision model is busy
+DEFAULT_QUEUE_SIZE = 1
+# Weight of the newest sample in the smoothed per-frame processing time
+PROCESSING_TIME_ALPHA = 0.3
+# Suggested capture interval = smoothed processing time * headroom
+INTERVAL_HEADROOM = 1.5
+
+
+class QueueStats:
+    """Enqueued vs dropped screenshot counters across connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.backpressure_signals = 0
+
+    def record_enqueued(self, dropped: bool):
+        with self._lock:
+            self.enqueued += 1
+            self.dropped += 1 if dropped else 0
+
+    def record_backpressure(self):
+        with self._lock:
+            self.backpressure_signals += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "backpressure_signals": self.backpressure_signals,
+            }
+
+
+queue_stats = QueueStats()
+
+
+class LatestWinsQueue:
+    """
+    Bounded queue feeding a single analysis worker. When the queue is full
+    the oldest pending item is dropped to make room, so the worker always
+    picks up the most recent screenshot rather than a stale backlog.
+    Tracks a smoothed per-item processing time to suggest how often the
+    client should capture.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self.maxsize = maxsize or int(
+            os.environ.get("EYES_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+        )
+        self._queue: asyncio.Queue = asyncio.Queue(self.maxsize)
+        self.processing_seconds: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def put(self, item: Any) -> Optional[Any]:
+        """Enqueue without waiting; returns the item dropped to make room"""
+        dropped = None
+        if self._queue.full():
+            dropped = self._queue.get_nowait()
+            self._queue.task_done()
+        self._queue.put_nowait(item)
+        queue_stats.record_enqueued(dropped is not None)
+        return dropped
+
+    async def get(self) -> Any:
+        return await self._queue.get()
+
+    def done(self, elapsed: float):
+        """Mark the current item processed, taking ``elapsed`` seconds"""
+        self._queue.task_done()
+        if self.processing_seconds is None:
+            self.processing_seconds = elapsed
+        else:
+            self.processing_seconds += PROCESSING_TIME_ALPHA * (
+                elapsed - self.processing_seconds
+            )
+
+    def suggested_interval(self) -> Optional[int]:
+        """Whole seconds between captures that the worker can keep up with"""
+        if self.processing_seconds is None:
+            return None
+        return max(1, math.ceil(self.processing_seconds * INTERVAL_HEADROOM))
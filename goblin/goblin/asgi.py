@@ -1,13 +1,17 @@
 # goblin/asgi.py
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'goblin.settings')
+
+# Set up Django before importing consumers, which import models
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from ears import routing as ears_routing
 from eyes import routing as eyes_routing
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'goblin.settings')
-
 websocket_patterns = []
 websocket_patterns.extend(ears_routing.websocket_urlpatterns)
 websocket_patterns.extend(eyes_routing.websocket_urlpatterns)
@@ -17,7 +21,7 @@ print("Available websocket routes:", [pattern.pattern for pattern in websocket_p
 
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(websocket_patterns)
     ),
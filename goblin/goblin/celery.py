@@ -31,7 +31,12 @@ scheduled_tasks = {
         "task": "brain.tasks.ping_brain",
         "schedule": timedelta(minutes=1),
         "options": {"queue": "shared"},
-    }
+    },
+    "refresh_order_daily_rollups": {
+        "task": "brain.tasks.refresh_order_daily_rollups",
+        "schedule": timedelta(minutes=15),
+        "options": {"queue": "shared"},
+    },
 }
 
 app.conf.beat_schedule = scheduled_tasks
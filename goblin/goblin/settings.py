@@ -109,6 +109,24 @@ DATABASES = {
     }
 }
 
+# Async connection pools (psycopg 3) used by brain.jestor.lib.database.
+# Pool sizes and statement timeouts can be overridden per connection name
+# in DATABASE_POOLS, e.g. {'default': {'max_size': 20}}
+DATABASE_POOL_ENABLED = os.environ.get("DATABASE_POOL_ENABLED", "false").lower() == "true"
+DATABASE_POOL_DEFAULTS = {
+    'min_size': int(os.environ.get("DATABASE_POOL_MIN_SIZE", 1)),
+    'max_size': int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10)),
+    'timeout': float(os.environ.get("DATABASE_POOL_TIMEOUT", 10)),
+    'statement_timeout_ms': int(os.environ.get("DATABASE_STATEMENT_TIMEOUT_MS", 15000)),
+}
+DATABASE_POOLS = {}
+
+# Queries not served by a pool are streamed from server-side cursors in
+# batches, and stop at these caps (0 disables a cap)
+DATABASE_STREAM_BATCH_SIZE = int(os.environ.get("DATABASE_STREAM_BATCH_SIZE", 1000))
+DATABASE_STREAM_MAX_ROWS = int(os.environ.get("DATABASE_STREAM_MAX_ROWS", 50000)) or None
+DATABASE_STREAM_MAX_BYTES = int(os.environ.get("DATABASE_STREAM_MAX_BYTES", 64 * 1024 * 1024)) or None
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
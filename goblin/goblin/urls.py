@@ -22,5 +22,6 @@ urlpatterns = [
     path('brain/', include('brain.urls')),
     path('mouth/', include('mouth.urls')),
     path('ears/', include('ears.urls')),
+    path('eyes/', include('eyes.urls')),
 ]
 